@@ -0,0 +1,267 @@
+"""Benchmarks for genfocusgfx and focusgfxshine on synthetic focus trees.
+
+For each size (number of focuses) a focus tree, an icon folder with an icon
+for every other focus, and a goals/goals_shine .gfx pair with half of the
+shine entries missing are generated in a temporary folder.  Each phase of
+both scripts is timed (best of --repeat runs) and measured for peak Python
+memory in a separate tracemalloc pass, so tracing does not skew the timings.
+
+Results can be saved as a baseline and later runs compared against it;
+any phase slower than the baseline by more than its threshold is reported
+as a regression and makes the script exit with status 1.
+
+usage: bench.py [-h] [--sizes N [N ...]] [--repeat N] [--baseline FILE]
+                [--save-baseline] [--threshold FRACTION] [--phase-threshold PHASE=FRACTION]
+"""
+
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import focusgfxshine
+import genfocusgfx
+from fsutil import DEFAULT_CACHE_DIR
+from pdxscript import iter_focuses, iter_sprites
+
+DEFAULT_BASELINE = os.path.join(DEFAULT_CACHE_DIR, 'bench_baseline.json')
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+FOCUS_TEMPLATE = '''\tfocus = {{
+\t\tid = BENCH_focus_{i}
+\t\ticon = GFX_goal_BENCH_focus_{i}
+\t\tprerequisite = {{ focus = BENCH_focus_{prev} }}
+\t\tx = {x}
+\t\ty = {y}
+\t\tcost = 10
+\t\t# completion reward with some nesting to skip
+\t\tcompletion_reward = {{
+\t\t\tadd_political_power = 50
+\t\t\tif = {{ limit = {{ has_war = no }} add_stability = 0.05 }}
+\t\t}}
+\t\tai_will_do = {{ factor = 1 }}
+\t}}
+'''
+
+GOAL_TEMPLATE = '''\tSpriteType = {{
+\t\tname = "GFX_goal_BENCH_focus_{i}"
+\t\ttexturefile = "gfx/interface/goals/bench/BENCH_focus_{i}.dds"
+\t}}
+
+'''
+
+
+def generate_fixture(root: str, size: int) -> Dict[str, str]:
+    """Write a synthetic mod of the given size under root and return its paths."""
+    paths = {
+        'mod_root': root,
+        'source': os.path.join(root, 'common', 'national_focus', 'bench.txt'),
+        'output': os.path.join(root, 'interface', 'bench_generated.gfx'),
+        'goals': os.path.join(root, 'interface', 'bench_goals.gfx'),
+        'goals_shine': os.path.join(root, 'interface', 'bench_goals_shine.gfx'),
+        'icons_path': 'gfx/interface/goals/bench',
+    }
+    for key in ('source', 'goals'):
+        os.makedirs(os.path.dirname(paths[key]), exist_ok=True)
+    icon_dir = os.path.join(root, paths['icons_path'])
+    os.makedirs(icon_dir, exist_ok=True)
+
+    with open(paths['source'], 'w', encoding='utf-8') as f:
+        f.write('focus_tree = {\n\tid = bench_focus\n\tcountry = { factor = 0 }\n')
+        for i in range(size):
+            f.write(FOCUS_TEMPLATE.format(i=i, prev=max(i - 1, 0), x=i % 40, y=i // 40))
+        f.write('}\n')
+
+    with open(paths['goals'], 'w', encoding='utf-8') as goals, \
+            open(paths['goals_shine'], 'w', encoding='utf-8') as shine:
+        goals.write('spriteTypes = {\n\n')
+        shine.write('spriteTypes = {\n')
+        for i in range(size):
+            goals.write(GOAL_TEMPLATE.format(i=i))
+            if i % 2:
+                shine.write(focusgfxshine.get_shine_def(f"GFX_goal_BENCH_focus_{i}",
+                                                        f"gfx/interface/goals/bench/BENCH_focus_{i}.dds"))
+                shine.write('\n')
+        goals.write('}\n')
+        shine.write('}\n')
+
+    for i in range(0, size, 2):
+        open(os.path.join(icon_dir, f"GFX_BENCH_focus_{i}.dds"), 'wb').close()
+    return paths
+
+
+def genfocusgfx_args(paths: Dict[str, str], extra: List[str] = ()):
+    parser = genfocusgfx.create_parser()
+    return parser.parse_args([
+        paths['source'], paths['output'], '-q', '--force', '--no-backup', '--no-cache',
+        '-m', paths['mod_root'], '--icons-path', paths['icons_path'], *extra
+    ])
+
+
+def phases(paths: Dict[str, str]) -> Dict[str, Callable[[], object]]:
+    """Build the benchmarked phases for a fixture; each is a no-argument callable."""
+    args = genfocusgfx_args(paths)
+    focus_ids = [f['id'] for f in iter_focuses(paths['source'])]
+    filtered = genfocusgfx.filter_focus_ids(focus_ids, args)
+
+    def icon_resolution():
+        genfocusgfx._icon_indexes.clear()
+        report = genfocusgfx.new_icon_report()
+        return [genfocusgfx.find_icon_for_focus(fid, args, report) for fid in filtered]
+
+    def fmt():
+        return [genfocusgfx.format_sprite(fid, 'gfx/interface/goals/x.dds', args) for fid in filtered]
+
+    def full_run():
+        genfocusgfx._icon_indexes.clear()
+        genfocusgfx.main(args)
+
+    def shine_sync():
+        shutil.copyfile(paths['goals_shine'], paths['goals_shine'] + '.work')
+        return focusgfxshine.sync_shine(paths['goals'], paths['goals_shine'] + '.work', log=lambda _: None)
+
+    def shine_parse():
+        with open(paths['goals_shine'], 'r') as f:
+            text = f.read()
+        return sum(1 for _ in iter_sprites(io.StringIO(text))) + sum(1 for _ in iter_sprites(paths['goals']))
+
+    return {
+        'genfocusgfx.parse': lambda: [f['id'] for f in iter_focuses(paths['source'])],
+        'genfocusgfx.filter': lambda: genfocusgfx.filter_focus_ids(focus_ids, args),
+        'genfocusgfx.icon_resolution': icon_resolution,
+        'genfocusgfx.format': fmt,
+        'genfocusgfx.total': full_run,
+        'focusgfxshine.parse': shine_parse,
+        'focusgfxshine.sync': shine_sync,
+    }
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Best wall time over `repeat` runs, then peak traced memory of one more run."""
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': best, 'peak_bytes': peak}
+
+
+def run_benchmarks(sizes: List[int], repeat: int, only: List[str] = None) -> Dict[str, Dict[str, Dict[str, float]]]:
+    results = {}
+    for size in sizes:
+        root = tempfile.mkdtemp(prefix=f"rj_bench_{size}_")
+        try:
+            print(f"Generating fixture with {size} focuses...", file=sys.stderr)
+            paths = generate_fixture(root, size)
+            results[str(size)] = {}
+            for name, func in phases(paths).items():
+                if only and not any(name.startswith(prefix) for prefix in only):
+                    continue
+                result = measure(func, repeat)
+                results[str(size)][name] = result
+                print(f"  {size:>7} {name:<30} {result['seconds'] * 1000:10.2f} ms "
+                      f"{result['peak_bytes'] / 1024 / 1024:9.2f} MiB", file=sys.stderr)
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def compare(results: Dict, baseline: Dict, threshold: float, phase_thresholds: Dict[str, float]) -> List[str]:
+    """Return a description of every phase slower than the baseline allows."""
+    regressions = []
+    for size, size_results in results.items():
+        for name, result in size_results.items():
+            base = baseline.get(size, {}).get(name)
+            if not base or not base['seconds']:
+                continue
+            limit = phase_thresholds.get(name, threshold)
+            change = result['seconds'] / base['seconds'] - 1
+            print(f"  {size:>7} {name:<30} {change:+8.1%} time "
+                  f"{(result['peak_bytes'] / base['peak_bytes'] - 1) if base['peak_bytes'] else 0:+8.1%} memory")
+            if change > limit:
+                regressions.append(f"{name} at {size} focuses: {change:+.1%} (limit {limit:+.0%})")
+    return regressions
+
+
+def parse_phase_threshold(value: str):
+    name, _, fraction = value.partition('=')
+    try:
+        return name, float(fraction)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected PHASE=FRACTION, got {value!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='bench',
+        description='Benchmark genfocusgfx and focusgfxshine on synthetic focus trees.'
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, metavar='N',
+                        help='Numbers of focuses to benchmark (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, metavar='N',
+                        help='Timed runs per phase; the best is kept (default: %(default)s)')
+    parser.add_argument('--only', nargs='+', metavar='PREFIX',
+                        help='Only run phases whose name starts with one of these prefixes')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, metavar='FILE',
+                        help='Baseline file to compare against or save to (default: .extras/.cache/bench_baseline.json)')
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, metavar='FRACTION',
+                        help='Allowed slowdown against the baseline (default: %(default)s = 25%%)')
+    parser.add_argument('--phase-threshold', type=parse_phase_threshold, action='append', default=[],
+                        metavar='PHASE=FRACTION', help='Allowed slowdown for one phase; repeatable')
+    parser.add_argument('--json', metavar='FILE', help='Also write the raw results to FILE')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.repeat, args.only)
+    document = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"Compared to baseline {args.baseline}:")
+    regressions = compare(results, baseline['results'], args.threshold, dict(args.phase_threshold))
+    if regressions:
+        print("REGRESSIONS:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
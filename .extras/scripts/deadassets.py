@@ -0,0 +1,254 @@
+"""Find textures under gfx/ that nothing in the mod references any more.
+
+Every texture (.dds, .tga, .png) under gfx/ and every sprite defined in a
+.gfx file become patterns; all script files (common/, history/, events/,
+interface/, localisation/, .gfx/.gui/.asset files and binary .mesh files)
+are then scanned once.  Asset references are always whole identifiers or
+path components, so the scan tokenizes each file with one regular
+expression and looks every token up in a hash table of all patterns: a
+single pass over the text whatever the number of assets, like an
+Aho-Corasick automaton but with the inner loop in C.  Files are scanned in
+a process pool.
+
+A texture is referenced when its name appears in a script file, or in a
+.gfx sprite that is itself used: a sprite is used when its name appears in
+a script, .gui or localisation file, also without the ``GFX_`` or
+``GFX_<category>_`` prefix that ideas, decisions and traits leave out, or
+when it is the ``_shine`` variant of a used sprite.  Division template
+icons (``GFX_div_templ_*``) are enumerated by the game and always used.  Flags count as used
+when their country or cosmetic tag appears anywhere.  With --game-root,
+files that override a game file of the same path are always kept.
+
+Matching is deliberately generous (case-insensitive, no context), so a file
+reported as unreferenced is safe to remove, but not every removable file
+is necessarily reported.
+
+usage: deadassets.py [-h] [-m MOD_ROOT] [-g GAME_ROOT] [-j N] [--sprites] [--json FILE]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from typing import Dict, List, Optional, Set, Tuple
+
+from pdxscript import ScriptError, iter_sprites
+
+TEXTURE_EXTENSIONS = ('.dds', '.tga', '.png')
+SCRIPT_EXTENSIONS = ('.txt', '.gfx', '.gui', '.yml', '.asset', '.mesh', '.anim', '.lua', '.csv')
+SKIP_DIRS = {'.git', '.extras'}
+FLAG_SUFFIXES = ('_communism', '_democratic', '_fascism', '_neutrality')
+# Sprite size variants the game looks up by name (technologies, equipment)
+SPRITE_SIZE_SUFFIXES = ('', '_small', '_medium', '_large')
+# Sprite families the game enumerates itself instead of naming them in scripts
+IMPLICIT_SPRITE_PREFIXES = ('gfx_div_templ_',)
+
+_TOKEN_RE = re.compile(rb'[a-z0-9_\-.]+')
+
+# Set in each worker by _init_worker
+_patterns: Set[bytes] = set()
+
+
+def _init_worker(patterns: Set[bytes]):
+    global _patterns
+    _patterns = patterns
+
+
+def tokens(data: bytes) -> Set[bytes]:
+    """Identifiers and path components of lower-cased text, with and without extensions.
+
+    Names may contain dots (``bra.1.dds``), so dotted tokens are looked up
+    whole, without their extension and split at every dot.
+    """
+    found = set(_TOKEN_RE.findall(data))
+    for token in [token for token in found if b'.' in token]:
+        found.add(token.rsplit(b'.', 1)[0])
+        found.update(token.split(b'.'))
+    return found
+
+
+def scan_file(path: str) -> Tuple[str, Set[bytes], List[Tuple[int, bytes]], Optional[str]]:
+    """Return (path, matched patterns, [(line, pattern)] for .gfx files, error). Runs in a worker."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read().lower()
+    except OSError as e:
+        return path, set(), [], str(e)
+    if not path.endswith('.gfx'):
+        return path, _patterns.intersection(tokens(data)), [], None
+
+    # .gfx references belong to the sprite they appear in, so keep their lines
+    hits = []
+    for line_no, line in enumerate(data.split(b'\n'), 1):
+        for token in _patterns.intersection(tokens(line)):
+            hits.append((line_no, token))
+    return path, set(), hits, None
+
+
+def texture_patterns(relpath: str) -> List[str]:
+    """Tokens that refer to a texture: its stem (or the tag of a flag) and GFX_<stem>[_size].
+
+    The GFX_ forms keep textures whose sprite is used under the texture's
+    name even if the mod does not define it (the game's definition may).
+    """
+    stem = os.path.splitext(os.path.basename(relpath))[0].lower()
+    if relpath.lower().startswith('gfx/flags/'):
+        for suffix in FLAG_SUFFIXES:
+            if stem.endswith(suffix):
+                return [stem[:-len(suffix)]]
+        return [stem]
+    return [stem] + [f"gfx_{stem}{suffix}" for suffix in SPRITE_SIZE_SUFFIXES]
+
+
+def sprite_aliases(name: str) -> List[str]:
+    """GFX_idea_foo -> gfx_idea_foo, idea_foo, foo"""
+    name = name.lower()
+    aliases = [name]
+    if name.startswith('gfx_'):
+        aliases.append(name[4:])
+        category, sep, rest = name[4:].partition('_')
+        if sep and rest:
+            aliases.append(rest)
+    return aliases
+
+
+def discover(mod_root: str) -> Tuple[List[str], List[str]]:
+    """Return (texture files under gfx/, script files) as absolute paths."""
+    textures, scripts = [], []
+    for folder, dirs, files in os.walk(mod_root):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        in_gfx = os.path.relpath(folder, mod_root).replace('\\', '/').split('/')[0] == 'gfx'
+        for name in sorted(files):
+            ext = os.path.splitext(name)[1].lower()
+            if ext in TEXTURE_EXTENSIONS and in_gfx:
+                textures.append(os.path.join(folder, name))
+            elif ext in SCRIPT_EXTENSIONS:
+                scripts.append(os.path.join(folder, name))
+    return textures, scripts
+
+
+def find_dead_assets(mod_root: str, game_root: Optional[str] = None, jobs: Optional[int] = None) -> Dict:
+    """Scan a mod and return its unreferenced textures and sprites."""
+    textures, scripts = discover(mod_root)
+    relpath = {path: os.path.relpath(path, mod_root).replace('\\', '/') for path in textures + scripts}
+
+    by_pattern = {}  # pattern -> textures it refers to
+    for path in textures:
+        for pattern in texture_patterns(relpath[path]):
+            by_pattern.setdefault(pattern, []).append(path)
+
+    # Sprite definitions, by file, in line order
+    sprites = {}  # lower-case name -> [(gfx file, line)]
+    gfx_sprites = {}  # gfx file -> [(line, lower-case name)]
+    for path in scripts:
+        if path.endswith('.gfx'):
+            try:
+                defs = [(s['line'], s['name'].lower()) for s in iter_sprites(path) if s['name']]
+            except (OSError, ScriptError) as e:
+                print(f"WARNING: {e}", file=sys.stderr)
+                defs = []
+            gfx_sprites[path] = sorted(defs)
+            for line, name in defs:
+                sprites.setdefault(name, []).append((relpath[path], line))
+
+    patterns = set(by_pattern)
+    for name in sprites:
+        patterns.update(sprite_aliases(name))
+    encoded = {pattern.encode('utf-8') for pattern in patterns}
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(encoded,)) as executor:
+            scanned = list(executor.map(scan_file, scripts, chunksize=32))
+    else:
+        _init_worker(encoded)
+        scanned = [scan_file(path) for path in scripts]
+
+    used = set()
+    gfx_hits = {}
+    for path, matched, hits, error in scanned:
+        if error:
+            print(f"WARNING: {path}: {error}", file=sys.stderr)
+        used.update(token.decode('utf-8') for token in matched)
+        if hits:
+            gfx_hits[path] = hits
+
+    def sprite_used(name: str) -> bool:
+        if name.startswith(IMPLICIT_SPRITE_PREFIXES) or any(alias in used for alias in sprite_aliases(name)):
+            return True
+        return name.endswith('_shine') and sprite_used(name[:-6])
+
+    live_sprites = {name for name in sprites if sprite_used(name)}
+
+    # References inside a .gfx file count when the sprite they belong to is used
+    from bisect import bisect_right
+    for path, hits in gfx_hits.items():
+        defs = gfx_sprites.get(path, [])
+        lines = [line for line, _ in defs]
+        for line, token in hits:
+            owner = bisect_right(lines, line) - 1
+            if owner < 0 or defs[owner][1] in live_sprites:
+                used.add(token.decode('utf-8'))
+
+    dead = []
+    for path in textures:
+        if any(pattern in used for pattern in texture_patterns(relpath[path])):
+            continue
+        if game_root and os.path.exists(os.path.join(game_root, relpath[path])):
+            continue  # overrides a game file
+        dead.append({'path': relpath[path], 'size': os.path.getsize(path)})
+    dead.sort(key=lambda entry: (-entry['size'], entry['path']))
+
+    unused_sprites = [
+        {'name': name, 'definitions': [f"{f}:{line}" for f, line in defs]}
+        for name, defs in sorted(sprites.items()) if name not in live_sprites
+    ]
+    return {
+        'textures': len(textures),
+        'scripts': len(scripts),
+        'unreferenced': dead,
+        'unreferenced_bytes': sum(entry['size'] for entry in dead),
+        'unused_sprites': unused_sprites,
+    }
+
+
+def format_size(size: int) -> str:
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='deadassets',
+        description='List textures under gfx/ that no script, .gfx or .gui file references.'
+    )
+    parser.add_argument('-m', '--mod-root', default='.', help='Mod root folder (default: %(default)s)')
+    parser.add_argument('-g', '--game-root', help='HOI4 installation; mod files overriding game files are kept')
+    parser.add_argument('-j', '--jobs', type=int, metavar='N', help='Worker processes for scanning')
+    parser.add_argument('--sprites', action='store_true', help='Also list sprites no file uses')
+    parser.add_argument('--json', metavar='FILE', help='Also write the results to FILE as JSON')
+    args = parser.parse_args()
+
+    result = find_dead_assets(args.mod_root, args.game_root, args.jobs)
+    for entry in result['unreferenced']:
+        print(f"{format_size(entry['size']):>10}  {entry['path']}")
+    if args.sprites:
+        for sprite in result['unused_sprites']:
+            print(f"unused sprite {sprite['name']} ({', '.join(sprite['definitions'])})")
+    print(f"{len(result['unreferenced'])} of {result['textures']} textures unreferenced "
+          f"({format_size(result['unreferenced_bytes'])}), {len(result['unused_sprites'])} unused sprites; "
+          f"scanned {result['scripts']} files", file=sys.stderr)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    sys.exit(1 if result['unreferenced'] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""Make-style build of focus sprite files driven by ``#!gfx:`` directives.
+
+Every focus file under common/national_focus and common/continuous_focus
+that starts with a ``#!gfx:<goals file>`` directive becomes part of a
+dependency graph:
+
+    focus file(s) -> goals .gfx -> goals_shine .gfx
+
+The goals step appends a spriteType for every ``icon = GFX_...`` the focus
+files reference that no .gfx file in the mod defines yet, when a matching
+texture exists under the icons folder.  The shine step runs focusgfxshine
+on the goals file (``RJ_goals.gfx`` -> ``RJ_goals_shine.gfx``).  Both steps
+only ever append, so hand-written entries are left alone.
+
+Input hashes of every node are recorded under .extras/.cache, so only stale
+nodes are rebuilt and an up-to-date tree exits straight away.
+
+usage: focusbuild.py [-h] [-m MOD_ROOT] [-j N] [--force] [--dry-run] [-v] [target ...]
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Set, Tuple
+
+from fsutil import AtomicWriter, cache_file, hash_bytes, hash_file, log
+from pdxscript import ScriptError, iter_focuses, read_directives
+
+FOCUS_PATTERNS = ('common/national_focus/*.txt', 'common/continuous_focus/*.txt')
+STATE_VERSION = 1
+
+
+def shine_path_for(goals: str) -> str:
+    """interface/RJ_goals.gfx -> interface/RJ_goals_shine.gfx"""
+    stem, ext = os.path.splitext(goals)
+    return f"{stem}_shine{ext or '.gfx'}"
+
+
+def discover(mod_root: str) -> Dict[str, List[str]]:
+    """Map each goals .gfx target (mod-relative) to the focus files that point at it."""
+    targets = {}
+    for pattern in FOCUS_PATTERNS:
+        for path in sorted(glob.glob(os.path.join(mod_root, pattern))):
+            gfx = read_directives(path).get('gfx')
+            if gfx:
+                source = os.path.relpath(path, mod_root).replace('\\', '/')
+                targets.setdefault(gfx[0].replace('\\', '/'), []).append(source)
+    return {target: sorted(sources) for target, sources in sorted(targets.items())}
+
+
+def build_graph(targets: Dict[str, List[str]], mod_root: str) -> List[Dict]:
+    """Create goals and shine nodes; shine nodes depend on their goals node."""
+    nodes = []
+    for goals, sources in targets.items():
+        nodes.append({'id': f"goals:{goals}", 'kind': 'goals', 'output': goals, 'sources': sources, 'deps': []})
+        shine = shine_path_for(goals)
+        if os.path.exists(os.path.join(mod_root, shine)):
+            nodes.append({'id': f"shine:{shine}", 'kind': 'shine', 'output': shine, 'goals': goals,
+                          'deps': [f"goals:{goals}"]})
+    return nodes
+
+
+def node_inputs(node: Dict, mod_root: str, env_fingerprint: str) -> Dict[str, Optional[str]]:
+    """Hash everything a node's result depends on, its own output included."""
+    def digest(path):
+        full_path = os.path.join(mod_root, path)
+        return hash_file(full_path) if os.path.exists(full_path) else None
+
+    paths = [node['output']] + (node['sources'] if node['kind'] == 'goals' else [node['goals']])
+    inputs = {path: digest(path) for path in paths}
+    if node['kind'] == 'goals':
+        inputs['<environment>'] = env_fingerprint
+    return inputs
+
+
+def environment_fingerprint(registry, icon_index: Dict[str, Dict[str, str]]) -> str:
+    """Fingerprint the defined sprites (by .gfx file hash) and the available icon files."""
+    rows = registry.db.execute('SELECT path, hash FROM files ORDER BY path').fetchall()
+    icons = sorted(name for entry in icon_index.values() for name in entry.values())
+    return hash_bytes(json.dumps([[tuple(r) for r in rows], icons]).encode('utf-8'))
+
+
+def scan_source(path: str) -> Tuple[str, List[str], Optional[str]]:
+    """Return (path, referenced sprite names in file order, error). Runs in a worker."""
+    names = []
+    try:
+        for focus in iter_focuses(path):
+            names.extend(focus['icons'])
+    except (OSError, ScriptError) as e:
+        return path, [], str(e)
+    return path, names, None
+
+
+def resolve_texture(name: str, icon_index: Dict[str, Dict[str, str]], icons_path: str) -> Optional[str]:
+    """Find the texture for a sprite name following the GFX_focus_<file> convention."""
+    from genfocusgfx import ICON_EXTENSIONS
+    stem = name[4:] if name.startswith('GFX_') else name
+    candidates = [stem] + [stem[len(prefix):] for prefix in ('focus_', 'goal_') if stem.startswith(prefix)]
+    for candidate in candidates:
+        entry = icon_index.get(candidate.lower())
+        if entry:
+            for ext in ICON_EXTENSIONS:
+                if ext in entry:
+                    return f"{icons_path.rstrip('/')}/{entry[ext]}"
+    return None
+
+
+def format_goal_sprite(name: str, texture: str) -> str:
+    return f'\tSpriteType = {{\n\t\tname = "{name}"\n\t\ttexturefile = "{texture}"\n\t}}\n\n'
+
+
+def build_goals(node: Dict, referenced: Dict[str, List[str]], defined: Set[str],
+                icon_index: Dict[str, Dict[str, str]], args) -> Set[str]:
+    """Append missing goal sprites to a goals file; return the names added."""
+    from focusgfxshine import find_closing_brace
+
+    output = os.path.join(args.mod_root, node['output'])
+    missing = {}
+    unresolved = []
+    for source in node['sources']:
+        for name in referenced.get(source, []):
+            if name in defined or name in missing or not name.startswith('GFX_'):
+                continue
+            texture = resolve_texture(name, icon_index, args.icons_path)
+            if texture:
+                missing[name] = texture
+            elif name not in unresolved:
+                unresolved.append(name)
+
+    if unresolved:
+        log(f"  {len(unresolved)} icons referenced by {node['output']} sources are not defined in the mod "
+            f"and have no matching texture (vanilla sprites or missing icons)", args, 2)
+        for name in unresolved:
+            log(f"    {name}", args, 3)
+
+    if not missing:
+        log(f"  {node['output']}: no missing sprites", args, 2)
+        return set()
+
+    for name, texture in missing.items():
+        log(f"  {node['output']}: adding {name} -> {texture}", args)
+
+    if not args.dry_run:
+        if os.path.exists(output):
+            with open(output, 'r', encoding='utf-8') as f:
+                text = f.read()
+        else:
+            text = 'spriteTypes = {\n}\n'
+        idx = find_closing_brace(text)
+        head = text[:idx] if text[:idx].endswith('\n') else text[:idx] + '\n'
+        with AtomicWriter(output, 'w', encoding='utf-8') as f:
+            f.write(head + ''.join(format_goal_sprite(n, t) for n, t in missing.items()) + text[idx:])
+    return set(missing)
+
+
+def build_shine(node: Dict, args) -> int:
+    """Run the shine synchronizer for a shine node."""
+    from focusgfxshine import sync_shine
+    lines = []
+    added = sync_shine(os.path.join(args.mod_root, node['goals']), os.path.join(args.mod_root, node['output']),
+                       log=lines.append, dry_run=args.dry_run)
+    for line in lines:
+        log(f"  {line}", args, 3)
+    if added:
+        log(f"  {node['output']}: {'would add' if args.dry_run else 'added'} {added} shine entries", args)
+    return added
+
+
+def load_state(path: str) -> Dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return state.get('nodes', {}) if state.get('version') == STATE_VERSION else {}
+
+
+def save_state(path: str, nodes: Dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': STATE_VERSION, 'nodes': nodes}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def stale_nodes(nodes: List[Dict], state: Dict, current: Dict[str, Dict], force: bool) -> List[str]:
+    """Return ids of nodes that must be rebuilt, including dependents of stale nodes."""
+    stale = []
+    for node in nodes:  # nodes are in dependency order
+        if force or state.get(node['id']) != current[node['id']] or any(dep in stale for dep in node['deps']):
+            stale.append(node['id'])
+    return stale
+
+
+def run(args) -> int:
+    from genfocusgfx import build_icon_index
+    from spriteindex import SpriteRegistry, default_db_path
+
+    mod_root = args.mod_root
+    state_path = cache_file('focusbuild', mod_root, '.json', args.cache_dir)
+
+    targets = discover(mod_root)
+    if args.targets:
+        wanted = {t.replace('\\', '/') for t in args.targets}
+        targets = {t: s for t, s in targets.items() if t in wanted or shine_path_for(t) in wanted}
+    if not targets:
+        log("No focus files with a #!gfx: directive found", args, 0)
+        return 1
+
+    nodes = build_graph(targets, mod_root)
+    for node in nodes:
+        log(f"{node['id']} <- {', '.join(node.get('sources') or [node['goals']])}", args, 2)
+
+    registry = SpriteRegistry(mod_root, default_db_path(mod_root, args.cache_dir))
+    try:
+        registry.update()
+        icon_index = build_icon_index(os.path.join(mod_root, args.icons_path), recursive=True)
+        env = environment_fingerprint(registry, icon_index)
+        current = {node['id']: node_inputs(node, mod_root, env) for node in nodes}
+        state = load_state(state_path)
+        stale = stale_nodes(nodes, state, current, args.force)
+
+        if not stale:
+            log("Everything is up to date", args)
+            return 0
+
+        # Level 1: parse the sources of stale goals nodes in parallel
+        stale_goals = [n for n in nodes if n['id'] in stale and n['kind'] == 'goals']
+        sources = sorted({s for n in stale_goals for s in n['sources']})
+        referenced = {}
+        if sources:
+            paths = [os.path.join(mod_root, s) for s in sources]
+            jobs = args.jobs or min(len(paths), os.cpu_count() or 1)
+            if jobs > 1:
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=jobs) as executor:
+                    scanned = list(executor.map(scan_source, paths))
+            else:
+                scanned = [scan_source(p) for p in paths]
+            for source, (_, names, error) in zip(sources, scanned):
+                if error:
+                    log(f"ERROR: {error}", args, 0)
+                    return 1
+                referenced[source] = names
+
+        # Level 2: goals nodes, in a fixed order so a sprite is only added once
+        defined = registry.names()
+        if args.game_root:
+            with SpriteRegistry(args.game_root, default_db_path(args.game_root, args.cache_dir)) as game_registry:
+                game_registry.update()
+                defined |= game_registry.names()
+        for node in stale_goals:
+            log(f"Building {node['output']}", args)
+            defined |= build_goals(node, referenced, defined, icon_index, args)
+
+        # Level 3: shine nodes are independent of each other
+        stale_shine = [n for n in nodes if n['id'] in stale and n['kind'] == 'shine']
+        if stale_shine:
+            from concurrent.futures import ThreadPoolExecutor
+            for node in stale_shine:
+                log(f"Building {node['output']}", args)
+            with ThreadPoolExecutor(max_workers=max(1, min(len(stale_shine), args.jobs or 4))) as executor:
+                list(executor.map(lambda n: build_shine(n, args), stale_shine))
+
+        if not args.dry_run:
+            # Record inputs as they are after our own writes
+            registry.update()
+            env = environment_fingerprint(registry, icon_index)
+            state = {node['id']: node_inputs(node, mod_root, env) for node in nodes}
+            save_state(state_path, state)
+        log(f"{'Would rebuild' if args.dry_run else 'Rebuilt'} {len(stale)} of {len(nodes)} nodes", args)
+        return 0
+    finally:
+        registry.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='focusbuild',
+        description='Bring focus sprite files up to date from the #!gfx: directives in focus trees.'
+    )
+    parser.add_argument('targets', nargs='*', metavar='target',
+                        help='Only build these goals/shine .gfx files (mod-relative); default: all')
+    parser.add_argument('-m', '--mod-root', default='.', help='Mod root folder (default: %(default)s)')
+    parser.add_argument('-g', '--game-root', help='HOI4 installation; its sprites count as defined')
+    parser.add_argument('--icons-path', default='gfx/interface/goals',
+                        help='Folder searched (recursively) for focus icons (default: %(default)s)')
+    parser.add_argument('-j', '--jobs', type=int, metavar='N', help='Worker processes for parsing')
+    parser.add_argument('--cache-dir', metavar='PATH', help='Directory for build state')
+    parser.add_argument('-B', '--force', action='store_true', help='Rebuild every node')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='Show what would change without writing')
+    parser.add_argument('-v', '--verbose', action='count', default=0, help='More output (-vv for details)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Only print errors')
+    args = parser.parse_args()
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
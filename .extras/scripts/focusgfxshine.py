@@ -1,6 +1,9 @@
 #!/usr/bin/python
 import argparse
-import re
+import io
+
+from fsutil import AtomicWriter
+from pdxscript import iter_sprites
 
 #############################
 ###
@@ -12,7 +15,7 @@ import re
 ### The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
 ### THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 ###
-### usage: focusgfxshine.py [-h] goals goals_shine
+### usage: focusgfxshine.py [-h] [--registry] [-m MOD_ROOT] goals goals_shine
 ###
 ### Given a goals GFX file, add all missing shine entries to the goals_shine GFX file.
 ###
@@ -22,6 +25,9 @@ import re
 ###
 ### optional arguments:
 ###   -h, --help   show this help message and exit
+###   --registry   also treat shine sprites defined in any other interface/*.gfx file as present
+###   -m MOD_ROOT, --mod-root MOD_ROOT
+###                mod root used with --registry (default: .)
 ###
 #############################
 
@@ -66,6 +72,18 @@ def get_shine_def(name, path):
     )
 
 
+def find_closing_brace(text):
+    """Return the index of the last "}" outside a comment, or 0 if there is none."""
+    end = len(text)
+    while end > 0:
+        start = text.rfind("\n", 0, end) + 1
+        idx = text[start:end].split("#", 1)[0].rfind("}")
+        if idx != -1:
+            return start + idx
+        end = start - 1
+    return 0
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Given a goals GFX file, add all missing shine entries to the goals_shine GFX file."
@@ -74,57 +92,80 @@ def main():
     parser.add_argument(
         "goals_shine", metavar="goals_shine", help="Name of the goals_shine file"
     )
-
-    args = parser.parse_args()
-
-    goal_regex = re.compile(
-        r"name\s*=\s*\"([^\"]+)?\"(?:[^\}]*?)texturefile\s*=\s*\"([^\"]+)?\"",  re.MULTILINE | re.DOTALL | re.IGNORECASE
-    )
-    goal_name_regex = re.compile(
-        r"name\s*=\s*\"([^\"]+)?\"",  re.MULTILINE | re.DOTALL | re.IGNORECASE
-    )
-    comments_regex = re.compile(
-        r"#*$"
+    parser.add_argument(
+        "--registry",
+        action="store_true",
+        help="Also treat shine sprites defined in any other interface/*.gfx file as present",
     )
-
-    print(f"Reading {args.goals_shine}...")
-    with open(args.goals_shine, "r") as f:
-        goals_shine = f.read()
-
-    goals_shine_matches = goal_name_regex.findall(
-        comments_regex.sub(goals_shine, '')
+    parser.add_argument(
+        "-m",
+        "--mod-root",
+        default=".",
+        help="Mod root used with --registry (default: %(default)s)",
     )
-    goals_shine_matches = set(goals_shine_matches)
 
-    last_bracket_idx = 0
+    args = parser.parse_args()
 
-    for i in range(len(goals_shine) - 1, -1, -1):
-        if goals_shine[i] == "}":
-            last_bracket_idx = abs(i)
-            break
+    known_names = None
+    if args.registry:
+        from spriteindex import SpriteRegistry
 
-    goals_shine_split = [goals_shine[:last_bracket_idx], goals_shine[last_bracket_idx:]]
+        print("Updating sprite registry...")
+        with SpriteRegistry(args.mod_root) as registry:
+            registry.update()
+            known_names = registry.names()
 
-    print(f"Reading {args.goals}...")
-    with open(args.goals, "r") as f:
-        goals = f.read()
+    sync_shine(args.goals, args.goals_shine, known_names)
 
-    goals_matches = goal_regex.findall(
-        comments_regex.sub(goals, '')
-    )
-    goals_matches = {
-        k: v for k, v in goals_matches if not f"{k}_shine" in goals_shine_matches
-    }
 
-    print(f"Found {len(goals_matches)} missing shine entries...")
+def sync_shine(goals_path, goals_shine_path, known_names=None, log=print, dry_run=False):
+    """Append shine entries missing from goals_shine_path; return how many were added.
 
-    for k, v in goals_matches.items():
-        print(f'"{k}" not found in "{args.goals_shine}", adding as "{k}_shine"...')
-        goals_shine_split.insert(1, get_shine_def(k, v))
+    Names in known_names count as already defined.  The file is only
+    written when something is missing.
+    """
+    log(f"Reading {goals_shine_path}...")
+    with open(goals_shine_path, "r") as f:
+        goals_shine = f.read()
 
-    print(f"Saving modified {args.goals_shine}...")
-    with open(args.goals_shine, "w") as f:
-        f.write("\n".join(goals_shine_split))
+    goals_shine_names = {
+        sprite["name"] for sprite in iter_sprites(io.StringIO(goals_shine))
+    }
+    if known_names:
+        goals_shine_names |= set(known_names)
+
+    log(f"Reading {goals_path}...")
+    # Missing entries keep the order of the goals file; the first definition of a name wins
+    missing = {}
+    for sprite in iter_sprites(goals_path):
+        name, texture = sprite["name"], sprite["texturefile"]
+        if name and texture and f"{name}_shine" not in goals_shine_names:
+            missing.setdefault(name, texture)
+
+    log(f"Found {len(missing)} missing shine entries...")
+
+    if not missing:
+        log(f"{goals_shine_path} is up to date, not modifying it.")
+        return 0
+
+    for k in missing:
+        log(f'"{k}" not found in "{goals_shine_path}", adding as "{k}_shine"...')
+
+    if dry_run:
+        return len(missing)
+
+    last_bracket_idx = find_closing_brace(goals_shine)
+    new_entries = "\n".join(get_shine_def(k, v) for k, v in missing.items())
+
+    log(f"Saving modified {goals_shine_path}...")
+    # Written through a temporary file so an interrupted run never truncates it
+    with AtomicWriter(goals_shine_path, "w") as f:
+        f.write(
+            "\n".join(
+                [goals_shine[:last_bracket_idx], new_entries, goals_shine[last_bracket_idx:]]
+            )
+        )
+    return len(missing)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,271 @@
+"""Check the prerequisite graphs of the focus trees and compute their pacing.
+
+Each tree is turned into adjacency arrays in one pass over its focuses:
+focuses are numbered, and every ``prerequisite = { ... }`` block becomes a
+group of parent indices (a focus needs one focus of each group).  On those
+arrays, in time linear in the number of focuses and links:
+
+- dangling prerequisites and mutually_exclusive ids that are not in the tree,
+- mutual exclusions that are only declared on one side,
+- prerequisite cycles (Kahn's algorithm, then one cycle is traced per
+  strongly connected leftover),
+- focuses that can never be taken: a prerequisite group without a takeable
+  focus, or two single-focus groups that exclude each other.
+
+The earliest completion day of a focus is its own duration (cost * 7 days,
+DEFAULT_COST when unset) plus, over its groups, the latest of the earliest
+focus of each group, computed in topological order.  This is the length of
+the focus's critical chain, a lower bound as the game runs one focus at a
+time; the tree's critical path is the chain ending in its latest focus.
+
+usage: focusgraph.py [-h] [-m MOD_ROOT] [-j N] [--cache-dir PATH] [--no-cache]
+                     [--days] [--json FILE] [-v] [-q] [tree ...]
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from focustrees import cache_path_for, load_trees
+from fsutil import log
+
+DAYS_PER_COST = 7
+DEFAULT_COST = 10
+
+
+class FocusGraph:
+    """Prerequisite and mutual-exclusion links of one tree as index arrays.
+
+    ``groups[i]`` lists the prerequisite groups of focus i as lists of
+    parent indices, ``children`` is the reverse adjacency in CSR form
+    (``children_start[i]:children_start[i + 1]`` slices ``children_index``)
+    and ``exclusive[i]`` lists the indices focus i excludes.
+    """
+
+    def __init__(self, focuses: Dict[str, Dict]):
+        self.ids = list(focuses)
+        self.index = {focus_id: i for i, focus_id in enumerate(self.ids)}
+        self.records = list(focuses.values())
+        self.problems = []
+        self.groups: List[List[List[int]]] = []
+        self.exclusive: List[List[int]] = []
+        self.duration: List[float] = []
+        edges = []
+
+        for i, focus in enumerate(self.records):
+            groups = []
+            for group in focus['prerequisite']:
+                members = []
+                for parent in group:
+                    j = self.index.get(parent)
+                    if j is None:
+                        self.problems.append({'type': 'dangling_prerequisite', 'focus': focus['id'], 'target': parent})
+                    else:
+                        members.append(j)
+                        edges.append((j, i))
+                if group:
+                    groups.append(members)  # may be empty if every member dangles
+            self.groups.append(groups)
+
+            exclusive = []
+            for other in focus['mutually_exclusive']:
+                j = self.index.get(other)
+                if j is None:
+                    self.problems.append({'type': 'dangling_exclusive', 'focus': focus['id'], 'target': other})
+                else:
+                    exclusive.append(j)
+            self.exclusive.append(exclusive)
+
+            cost = focus['cost'] if isinstance(focus['cost'], (int, float)) else DEFAULT_COST
+            self.duration.append(cost * DAYS_PER_COST)
+
+        # Children in CSR form, by counting sort on the parent index
+        self.children_start = [0] * (len(self.ids) + 1)
+        for parent, _ in edges:
+            self.children_start[parent + 1] += 1
+        for i in range(len(self.ids)):
+            self.children_start[i + 1] += self.children_start[i]
+        fill = self.children_start[:-1]
+        self.children_index = [0] * len(edges)
+        for parent, child in edges:
+            self.children_index[fill[parent]] = child
+            fill[parent] += 1
+
+    def children(self, i: int) -> List[int]:
+        return self.children_index[self.children_start[i]:self.children_start[i + 1]]
+
+    def parents(self, i: int) -> List[int]:
+        return [j for group in self.groups[i] for j in group]
+
+    def topological_order(self) -> Tuple[List[int], List[int]]:
+        """Return (focuses in topological order, focuses on or behind a cycle) with Kahn's algorithm."""
+        indegree = [len(self.parents(i)) for i in range(len(self.ids))]
+        order = [i for i, degree in enumerate(indegree) if degree == 0]
+        for i in order:  # order grows while it is walked
+            for child in self.children(i):
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    order.append(child)
+        done = set(order)
+        return order, [i for i in range(len(self.ids)) if i not in done]
+
+    def find_cycles(self, blocked: List[int]) -> List[List[str]]:
+        """Trace one cycle through each group of focuses Kahn's algorithm could not order."""
+        remaining = set(blocked)
+        cycles = []
+        while remaining:
+            # Walking to blocked parents must loop, since every blocked focus has one
+            path, seen = [], {}
+            i = min(remaining)
+            while i not in seen:
+                seen[i] = len(path)
+                path.append(i)
+                i = next(j for j in self.parents(i) if j in remaining)
+            cycle = path[seen[i]:]
+            cycles.append([self.ids[j] for j in reversed(cycle)])
+            # Drop the cycle and everything only blocked by it
+            stack = list(cycle)
+            while stack:
+                j = stack.pop()
+                if j in remaining:
+                    remaining.discard(j)
+                    stack.extend(child for child in self.children(j) if child in remaining)
+        return cycles
+
+    def check(self) -> List[Dict]:
+        """Dangling ids, one-sided exclusions, cycles and focuses that can never be taken."""
+        problems = list(self.problems)
+        for i, exclusive in enumerate(self.exclusive):
+            for j in exclusive:
+                if i not in self.exclusive[j]:
+                    problems.append({'type': 'asymmetric_exclusive', 'focus': self.ids[i], 'target': self.ids[j]})
+
+        order, blocked = self.topological_order()
+        for cycle in self.find_cycles(blocked):
+            problems.append({'type': 'cycle', 'focus': cycle[0], 'cycle': cycle})
+
+        takeable = [True] * len(self.ids)
+        for i in blocked:
+            takeable[i] = False
+        for i in order:
+            groups = self.groups[i]
+            if any(not any(takeable[j] for j in group) for group in groups):
+                takeable[i] = False
+                problems.append({'type': 'unreachable', 'focus': self.ids[i],
+                                 'reason': 'a prerequisite group has no focus that can be taken'})
+                continue
+            required = {group[0] for group in groups if len(group) == 1}
+            conflict = next(((a, b) for a in required for b in self.exclusive[a] if b in required), None)
+            if conflict:
+                takeable[i] = False
+                problems.append({'type': 'unreachable', 'focus': self.ids[i],
+                                 'reason': f"requires both {self.ids[conflict[0]]} and {self.ids[conflict[1]]}, "
+                                           f"which are mutually exclusive"})
+        return problems
+
+    def earliest_days(self) -> Tuple[List[Optional[float]], List[Optional[int]]]:
+        """Return (earliest completion day, critical parent) per focus; None on cycles."""
+        order, _ = self.topological_order()
+        days: List[Optional[float]] = [None] * len(self.ids)
+        via: List[Optional[int]] = [None] * len(self.ids)
+        for i in order:
+            start = 0
+            for group in self.groups[i]:
+                options = [j for j in group if days[j] is not None]
+                if not options:
+                    continue
+                first = min(options, key=days.__getitem__)
+                if via[i] is None or days[first] > start:
+                    start, via[i] = days[first], first
+            days[i] = start + self.duration[i]
+        return days, via
+
+    def critical_path(self) -> Tuple[float, List[str]]:
+        """(days, focus ids) of the longest chain of prerequisites in the tree."""
+        days, via = self.earliest_days()
+        reachable = [i for i, day in enumerate(days) if day is not None]
+        if not reachable:
+            return 0, []
+        i = max(reachable, key=days.__getitem__)
+        total = days[i]
+        path = []
+        while i is not None:
+            path.append(self.ids[i])
+            i = via[i]
+        return total, path[::-1]
+
+
+def describe(problem: Dict) -> str:
+    kind = problem['type']
+    if kind == 'dangling_prerequisite':
+        return f"{problem['focus']} requires unknown focus {problem['target']}"
+    if kind == 'dangling_exclusive':
+        return f"{problem['focus']} is mutually exclusive with unknown focus {problem['target']}"
+    if kind == 'asymmetric_exclusive':
+        return f"{problem['focus']} excludes {problem['target']}, but not the other way round"
+    if kind == 'cycle':
+        return f"prerequisite cycle: {' -> '.join(problem['cycle'] + problem['cycle'][:1])}"
+    return f"{problem['focus']} can never be taken: {problem['reason']}"
+
+
+def run(args) -> int:
+    start = time.perf_counter()
+    cache_path = '' if args.no_cache else cache_path_for(args.mod_root, args.cache_dir)
+    trees, errors = load_trees(args.mod_root, cache_path, args.jobs)
+    for error in errors:
+        log(f"WARNING: {error}", args, 0)
+    if args.trees:
+        trees = [tree for tree in trees if tree['id'] in args.trees]
+
+    report = {}
+    total = 0
+    for tree in trees:
+        graph = FocusGraph(tree['focuses'])
+        problems = graph.check()
+        for problem in problems:
+            focus = tree['focuses'].get(problem['focus'])
+            problem['location'] = f"{focus['file']}:{focus['line']}" if focus else tree['file']
+        days, path = graph.critical_path()
+        report[tree['id']] = {'problems': problems, 'critical_path': {'days': days, 'focuses': path}}
+        total += len(problems)
+
+        log(f"{tree['id']}: {len(graph.ids)} focuses, critical path {days:g} days over {len(path)} focuses", args)
+        for problem in problems:
+            log(f"  {problem['location']}: {describe(problem)}", args)
+        log(f"  {' -> '.join(path)}", args, 2)
+        if args.days:
+            earliest, _ = graph.earliest_days()
+            report[tree['id']]['earliest_days'] = dict(zip(graph.ids, earliest))
+            for focus_id, day in sorted(zip(graph.ids, earliest), key=lambda item: (item[1] is None, item[1] or 0)):
+                log(f"  {'-' if day is None else format(day, 'g'):>6}  {focus_id}", args)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    log(f"{len(trees)} trees checked in {time.perf_counter() - start:.2f}s: {total} problems",
+        args, 0 if total else 1)
+    return 1 if total or errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='focusgraph',
+        description='Check focus prerequisites and exclusions and report critical-path completion times.'
+    )
+    parser.add_argument('trees', nargs='*', metavar='tree', help='Focus tree ids to check (default: all)')
+    parser.add_argument('-m', '--mod-root', default='.', help='Mod root folder (default: %(default)s)')
+    parser.add_argument('-j', '--jobs', type=int, metavar='N', help='Worker processes for parsing')
+    parser.add_argument('--cache-dir', metavar='PATH', help='Directory for the focus tree cache')
+    parser.add_argument('--no-cache', action='store_true', help='Re-read every focus file')
+    parser.add_argument('--days', action='store_true', help='List the earliest completion day of every focus')
+    parser.add_argument('--json', metavar='FILE', help='Also write problems and pacing per tree to FILE as JSON')
+    parser.add_argument('-v', '--verbose', action='count', default=0, help='More output (-v shows critical paths)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Only print errors')
+    args = parser.parse_args()
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,723 @@
+"""Language server for focus files and .gfx sprite files, over stdio.
+
+Keeps an in-memory index of the mod while an editor is open on it:
+
+- the sprite names defined in every interface/*.gfx file, seeded from the
+  sprite registry (see spriteindex.py) and, with --game-root, the game's,
+- the texture files under gfx/ of the mod (and the game),
+- the focus ids of every file in common/national_focus and
+  common/continuous_focus, with their locations.
+
+Open documents replace their file's entry in the index as they are edited,
+and diagnostics are published for them after every change:
+
+- icons referencing a GFX_ sprite no .gfx file defines, with the icon file
+  genfocusgfx.py would use for the focus,
+- focus ids defined more than once across the focus files,
+- sprites whose texturefile does not exist and sprite names defined twice
+  in the same .gfx file.
+
+Completions are offered for sprite names after ``icon =`` and ``value =``.
+
+Documents are synchronized in full on every change, but only re-parsed in
+part: the text is split where focus (or spriteType) blocks begin, which is
+a string search rather than a parse, and only blocks whose text is not in
+the document's cache are scanned, so an edit costs the split plus the
+block being typed in.  Run with -v to log the time of every update.
+
+In VS Code any generic LSP client extension can start the server, with
+``python .extras/scripts/focuslsp.py -m ${workspaceFolder}`` as the command
+and the paradox/plaintext language ids of .txt and .gfx files.
+
+usage: focuslsp.py [-h] [-m MOD_ROOT] [-g GAME_ROOT] [-v]
+"""
+
+import argparse
+import bisect
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote, urlparse
+
+from genfocusgfx import FocusGfxGenerator
+from spriteindex import SpriteRegistry, texture_key
+
+FOCUS_DIRS = ('common/national_focus', 'common/continuous_focus')
+TEXTURE_DIR = 'gfx'
+TEXTURE_EXTENSIONS = ('.dds', '.tga', '.png')
+COMPLETION_LIMIT = 500
+RELATED_LIMIT = 5
+
+# LSP constants
+TEXT_DOCUMENT_SYNC_FULL = 1
+SEVERITY_ERROR, SEVERITY_WARNING, SEVERITY_INFORMATION, SEVERITY_HINT = 1, 2, 3, 4
+COMPLETION_KIND_VALUE = 12
+METHOD_NOT_FOUND = -32601
+INTERNAL_ERROR = -32603
+SERVER_NOT_INITIALIZED = -32002
+
+# Block starts: a line opening a focus (or sprite) block.  The patterns only
+# find candidates; split_blocks checks that nothing but a prefix of the key
+# precedes them on their line.
+FOCUS_BLOCK = re.compile(r'focus[ \t]*=[ \t]*\{')
+FOCUS_BLOCK_PREFIXES = ('', 'shared_', 'joint_')
+SPRITE_BLOCK = re.compile(r'type[ \t]*=[ \t]*\{', re.IGNORECASE)
+
+FOCUS_TOKEN = re.compile(
+    r'#[^\n]*|"(?:[^"\\\n]|\\.)*"'
+    r'|\b(focus|shared_focus|joint_focus|id|icon|value)[ \t]*=[ \t]*(\{|"[^"\n]*"|[^\s{}#"]+)')
+SPRITE_TOKEN = re.compile(
+    r'#[^\n]*|\b(name|texturefile)[ \t]*=[ \t]*("[^"\n]*"|[^\s{}#"]+)', re.IGNORECASE)
+COMPLETION_CONTEXT = re.compile(r'\b(?:icon|value)[ \t]*=[ \t]*"?(\w*)$')
+
+
+def log(message: str, args, level: int = 1):
+    """Log to stderr, stdout being the protocol channel (1 = normal, 2 = -v)."""
+    if args.verbose + 1 >= level:
+        print(message, file=sys.stderr, flush=True)
+
+
+def uri_to_path(uri: str) -> str:
+    parsed = urlparse(uri)
+    path = unquote(parsed.path)
+    if os.name == 'nt' and re.match(r'/[A-Za-z]:', path):
+        path = path[1:]
+    return os.path.abspath(path)
+
+
+def path_to_uri(path: str) -> str:
+    path = os.path.abspath(path).replace('\\', '/')
+    if not path.startswith('/'):
+        path = '/' + path
+    return 'file://' + quote(path)
+
+
+def utf16_length(text: str) -> int:
+    """Length of text in UTF-16 code units, the unit of LSP columns."""
+    if text.isascii():
+        return len(text)
+    return len(text.encode('utf-16-le')) // 2
+
+
+def char_index(line: str, column: int) -> int:
+    """Index into line of an LSP (UTF-16) column."""
+    if line.isascii():
+        return min(column, len(line))
+    units = 0
+    for i, char in enumerate(line):
+        if units >= column:
+            return i
+        units += 2 if ord(char) > 0xFFFF else 1
+    return len(line)
+
+
+def unquote_value(value: str) -> str:
+    return value[1:-1] if value.startswith('"') else value
+
+
+def split_blocks(text: str, pattern, prefixes=None) -> List[int]:
+    """Offsets where top-level blocks matched by pattern begin, always including 0.
+
+    A match counts if it is preceded on its line only by whitespace and one
+    of prefixes (any word when prefixes is None), and the block begins at
+    the start of that line.  Nesting is not checked: a block is only a unit
+    of re-scanning, so splitting a construct in two costs nothing but
+    having two cache entries.
+    """
+    starts = [0]
+    for match in pattern.finditer(text):
+        line_start = text.rfind('\n', 0, match.start()) + 1
+        prefix = text[line_start:match.start()].lstrip(' \t')
+        if (prefix in prefixes) if prefixes is not None else (not prefix or prefix.isidentifier()):
+            if line_start > starts[-1]:
+                starts.append(line_start)
+    return starts
+
+
+def scan_focus_block(text: str) -> List[Dict]:
+    """Focus ids and icons of a block of a focus file.
+
+    Returns {'id', 'line', 'column', 'icons': [(name, line, column)]} records
+    with lines relative to the block.  ``id`` and ``icon`` count directly
+    inside a focus block, ``value`` inside an icon block; braces in
+    comments and strings are skipped by the token pattern.
+    """
+    focuses = []
+    stack = []  # (kind, depth the block's contents are at)
+    depth = 0
+    last = 0
+    line = 0
+    for match in FOCUS_TOKEN.finditer(text):
+        start = match.start()
+        depth += text.count('{', last, start) - text.count('}', last, start)
+        line += text.count('\n', last, start)
+        last = match.end()
+        while stack and depth < stack[-1][1]:
+            stack.pop()
+        key = match.group(1)
+        if key is None:  # comment or string
+            continue
+        value = match.group(2)
+        if value == '{':
+            depth += 1
+            if key in ('focus', 'shared_focus', 'joint_focus'):
+                stack.append(('focus', depth))
+                focuses.append({'id': None, 'line': line, 'column': 0, 'icons': []})
+            elif key == 'icon' and stack and stack[-1] == ('focus', depth - 1):
+                stack.append(('icon', depth))
+            continue
+        if not stack or depth != stack[-1][1]:
+            continue
+        column = utf16_length(text[text.rfind('\n', 0, match.start(2)) + 1:match.start(2)])
+        kind = stack[-1][0]
+        if kind == 'focus' and key == 'id' and focuses[-1]['id'] is None:
+            focuses[-1].update(id=unquote_value(value), line=line, column=column)
+        elif (kind == 'focus' and key == 'icon') or (kind == 'icon' and key == 'value'):
+            focuses[-1]['icons'].append((unquote_value(value), line, column))
+    return [focus for focus in focuses if focus['id'] or focus['icons']]
+
+
+def scan_sprite_block(text: str) -> List[Dict]:
+    """Sprites of a block of a .gfx file as {'name', 'line', 'column', 'texture', 'texture_line',
+    'texture_column'} records, lines relative to the block."""
+    sprites = []
+    line = 0
+    last = 0
+    for match in SPRITE_TOKEN.finditer(text):
+        line += text.count('\n', last, match.start())
+        last = match.end()
+        key = match.group(1)
+        if key is None:
+            continue
+        value = unquote_value(match.group(2))
+        column = utf16_length(text[text.rfind('\n', 0, match.start(2)) + 1:match.start(2)])
+        if key.lower() == 'name':
+            sprites.append({'name': value, 'line': line, 'column': column,
+                            'texture': None, 'texture_line': line, 'texture_column': column})
+        elif sprites and sprites[-1]['texture'] is None:
+            sprites[-1].update(texture=value, texture_line=line, texture_column=column)
+    return sprites
+
+
+class Document:
+    """An open file, its text split into blocks with their scan results.
+
+    ``blocks`` holds (offset, first line, text, records) per block.  Scan
+    results are cached by block text, so after an edit only the blocks
+    that changed are scanned again; the cache keeps what the last version
+    used.
+    """
+
+    def __init__(self, uri: str, path: str, kind: str):
+        self.uri = uri
+        self.path = path
+        self.kind = kind  # 'focus' or 'gfx'
+        self.text = ''
+        self.version = None
+        self.blocks: List[Tuple[int, int, str, List[Dict]]] = []
+        self._cache: Dict[str, List[Dict]] = {}
+
+    def update(self, text: str, version=None) -> int:
+        """Replace the text and return the number of blocks that had to be scanned."""
+        if self.kind == 'focus':
+            starts = split_blocks(text, FOCUS_BLOCK, FOCUS_BLOCK_PREFIXES)
+            scan = scan_focus_block
+        else:
+            starts = split_blocks(text, SPRITE_BLOCK)
+            scan = scan_sprite_block
+        cache = {}
+        blocks = []
+        scanned = 0
+        line = 0
+        starts.append(len(text))
+        for offset, end in zip(starts, starts[1:]):
+            chunk = text[offset:end]
+            records = self._cache.get(chunk)
+            if records is None:
+                records = scan(chunk)
+                scanned += 1
+            cache[chunk] = records
+            blocks.append((offset, line, chunk, records))
+            line += chunk.count('\n')
+        self.text = text
+        self.version = version
+        self.blocks = blocks
+        self._cache = cache
+        return scanned
+
+    def records(self) -> Iterator[Tuple[int, Dict]]:
+        """(first line of the block, record) for every record of the document."""
+        for _, line, _, records in self.blocks:
+            for record in records:
+                yield line, record
+
+    def line_text(self, line: int) -> str:
+        """The text of a line, found through the block it is in."""
+        i = bisect.bisect_right([block[1] for block in self.blocks], line) - 1
+        if i < 0:
+            return ''
+        _, first_line, chunk, _ = self.blocks[i]
+        start = 0
+        for _ in range(line - first_line):
+            start = chunk.find('\n', start) + 1
+            if start == 0:
+                return ''
+        end = chunk.find('\n', start)
+        return chunk[start:] if end < 0 else chunk[start:end]
+
+
+def read_focus_locations(path: str) -> List[Tuple[str, int, int]]:
+    """(focus id, line, column) of every focus in a focus file on disk."""
+    with open(path, encoding='utf-8-sig', errors='replace') as f:
+        document = Document('', path, 'focus')
+        document.update(f.read())
+    return [(record['id'], line + record['line'], record['column'])
+            for line, record in document.records() if record['id']]
+
+
+def scan_textures(root: str) -> set:
+    """Normalized paths (as texture_key makes them) of the texture files under root/gfx."""
+    textures = set()
+    base = os.path.join(root, TEXTURE_DIR)
+    for dirpath, _, filenames in os.walk(base):
+        rel_dir = os.path.relpath(dirpath, root).replace('\\', '/')
+        for filename in filenames:
+            if filename.lower().endswith(TEXTURE_EXTENSIONS):
+                textures.add(f"{rel_dir}/{filename}".lower())
+    return textures
+
+
+class ModIndex:
+    """Sprite names, textures and focus ids of a mod, updated file by file."""
+
+    def __init__(self, mod_root: str, game_root: Optional[str] = None):
+        self.mod_root = os.path.abspath(mod_root)
+        self.game_root = os.path.abspath(game_root) if game_root else None
+        self.sprite_files: Dict[str, List[str]] = {}
+        self.sprite_counts = Counter()
+        self.game_sprites = set()
+        self.textures = set()
+        self.game_textures = set()
+        self.focus_files: Dict[str, List[Tuple[str, int, int]]] = {}
+        self.focus_locations: Dict[str, List[Tuple[str, int, int]]] = {}
+        self._sorted_names = None
+        self.icons = FocusGfxGenerator(self.mod_root)
+
+    def relpath(self, path: str) -> str:
+        return os.path.relpath(path, self.mod_root).replace('\\', '/')
+
+    def load(self):
+        """Build the whole index from disk."""
+        with SpriteRegistry(self.mod_root) as registry:
+            registry.update()
+            for path, names in registry.names_by_file().items():
+                self.set_sprites(path, names)
+        if self.game_root:
+            with SpriteRegistry(self.game_root) as registry:
+                registry.update()
+                self.game_sprites = registry.names()
+            self.game_textures = scan_textures(self.game_root)
+        self.textures = scan_textures(self.mod_root)
+        for focus_dir in FOCUS_DIRS:
+            directory = os.path.join(self.mod_root, focus_dir)
+            if not os.path.isdir(directory):
+                continue
+            for name in sorted(os.listdir(directory)):
+                if name.endswith('.txt'):
+                    path = os.path.join(directory, name)
+                    self.set_focuses(self.relpath(path), read_focus_locations(path))
+
+    def set_sprites(self, path: str, names: List[str]) -> bool:
+        """Replace the sprite names of a .gfx file; True if the set of names changed."""
+        old = self.sprite_files.get(path, [])
+        if old == names:
+            return False
+        self.sprite_counts.subtract(old)
+        self.sprite_counts.update(names)
+        self.sprite_counts += Counter()  # drop names no file defines anymore
+        if names:
+            self.sprite_files[path] = names
+        else:
+            self.sprite_files.pop(path, None)
+        changed = set(old) != set(names)
+        if changed:
+            self._sorted_names = None
+        return changed
+
+    def set_focuses(self, path: str, locations: List[Tuple[str, int, int]]):
+        """Replace the focus ids defined in a focus file."""
+        for focus_id, _, _ in self.focus_files.get(path, []):
+            entries = [entry for entry in self.focus_locations.get(focus_id, []) if entry[0] != path]
+            if entries:
+                self.focus_locations[focus_id] = entries
+            else:
+                self.focus_locations.pop(focus_id, None)
+        if locations:
+            self.focus_files[path] = locations
+        else:
+            self.focus_files.pop(path, None)
+        for focus_id, line, column in locations:
+            self.focus_locations.setdefault(focus_id, []).append((path, line, column))
+
+    def is_sprite(self, name: str) -> bool:
+        return name in self.sprite_counts or name in self.game_sprites
+
+    def is_texture(self, texture: str) -> bool:
+        key = texture_key(texture)
+        return key in self.textures or key in self.game_textures
+
+    def sprite_names(self) -> List[Tuple[str, str]]:
+        """(lowercased name, name) of every known sprite, sorted for prefix search."""
+        if self._sorted_names is None:
+            names = set(self.sprite_counts) | self.game_sprites
+            self._sorted_names = sorted((name.lower(), name) for name in names)
+        return self._sorted_names
+
+    def complete(self, prefix: str) -> Tuple[List[str], bool]:
+        """Sprite names starting with prefix (ignoring case), and whether the list was cut."""
+        names = self.sprite_names()
+        key = prefix.lower()
+        i = bisect.bisect_left(names, (key, ''))
+        found = []
+        while i < len(names) and names[i][0].startswith(key):
+            if len(found) == COMPLETION_LIMIT:
+                return found, True
+            found.append(names[i][1])
+            i += 1
+        return found, False
+
+
+def diagnostic(line: int, column: int, length: int, severity: int, message: str, **extra) -> Dict:
+    result = {
+        'range': {'start': {'line': line, 'character': column},
+                  'end': {'line': line, 'character': column + length}},
+        'severity': severity,
+        'source': 'focuslsp',
+        'message': message,
+    }
+    result.update(extra)
+    return result
+
+
+class Server:
+    """JSON-RPC message loop and the handlers of the supported LSP methods."""
+
+    def __init__(self, args, reader, writer):
+        self.args = args
+        self.reader = reader
+        self.writer = writer
+        self.index: Optional[ModIndex] = None
+        self.documents: Dict[str, Document] = {}
+        self.shutdown_requested = False
+        self.handlers = {
+            'initialize': self.initialize,
+            'initialized': lambda params: None,
+            'shutdown': self.shutdown,
+            'textDocument/didOpen': self.did_open,
+            'textDocument/didChange': self.did_change,
+            'textDocument/didSave': self.did_save,
+            'textDocument/didClose': self.did_close,
+            'textDocument/completion': self.completion,
+            'workspace/didChangeWatchedFiles': self.did_change_watched_files,
+        }
+
+    # Transport
+
+    def read_message(self) -> Optional[Dict]:
+        """Read one Content-Length framed message; None at the end of the input."""
+        length = None
+        while True:
+            header = self.reader.readline()
+            if not header:
+                return None
+            header = header.strip()
+            if not header:
+                break
+            name, _, value = header.decode('ascii').partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+        if length is None:
+            raise ValueError('message without Content-Length')
+        return json.loads(self.reader.read(length).decode('utf-8'))
+
+    def send(self, message: Dict):
+        message['jsonrpc'] = '2.0'
+        body = json.dumps(message, separators=(',', ':')).encode('utf-8')
+        self.writer.write(b'Content-Length: %d\r\n\r\n' % len(body) + body)
+        self.writer.flush()
+
+    def notify(self, method: str, params: Dict):
+        self.send({'method': method, 'params': params})
+
+    def serve(self) -> int:
+        """Handle messages until exit; returns the exit code the protocol asks for."""
+        while True:
+            message = self.read_message()
+            if message is None or message.get('method') == 'exit':
+                return 0 if self.shutdown_requested else 1
+            self.dispatch(message)
+
+    def dispatch(self, message: Dict):
+        method = message.get('method')
+        request_id = message.get('id')
+        if method is None:
+            return  # a response to something we never send
+        handler = self.handlers.get(method)
+        if handler is None:
+            if request_id is not None:
+                self.send({'id': request_id, 'error': {'code': METHOD_NOT_FOUND, 'message': f"{method} not supported"}})
+            return
+        if self.index is None and method != 'initialize':
+            if request_id is not None:
+                self.send({'id': request_id, 'error': {'code': SERVER_NOT_INITIALIZED, 'message': 'not initialized'}})
+            return
+        try:
+            result = handler(message.get('params') or {})
+        except Exception as e:  # keep serving; the editor shows the error
+            log(f"ERROR: {method}: {e!r}", self.args, 0)
+            if request_id is not None:
+                self.send({'id': request_id, 'error': {'code': INTERNAL_ERROR, 'message': str(e)}})
+            return
+        if request_id is not None:
+            self.send({'id': request_id, 'result': result})
+
+    # Lifecycle
+
+    def initialize(self, params: Dict) -> Dict:
+        mod_root = self.args.mod_root
+        if mod_root is None:
+            root_uri = params.get('rootUri')
+            mod_root = uri_to_path(root_uri) if root_uri else (params.get('rootPath') or '.')
+        start = time.perf_counter()
+        self.index = ModIndex(mod_root, self.args.game_root)
+        self.index.load()
+        log(f"Indexed {len(self.index.sprite_counts)} sprites, {len(self.index.focus_locations)} focus ids "
+            f"and {len(self.index.textures)} textures of {self.index.mod_root} "
+            f"in {(time.perf_counter() - start) * 1000:.0f} ms", self.args)
+        return {
+            'capabilities': {
+                'textDocumentSync': {'openClose': True, 'change': TEXT_DOCUMENT_SYNC_FULL, 'save': True},
+                'completionProvider': {'triggerCharacters': ['_']},
+            },
+            'serverInfo': {'name': 'focuslsp'},
+        }
+
+    def shutdown(self, params: Dict):
+        self.shutdown_requested = True
+        return None
+
+    # Documents
+
+    def document_kind(self, path: str) -> Optional[str]:
+        relpath = self.index.relpath(path)
+        if relpath.lower().endswith('.gfx'):
+            return 'gfx'
+        if relpath.endswith('.txt') and relpath.startswith(tuple(f"{d}/" for d in FOCUS_DIRS)):
+            return 'focus'
+        return None
+
+    def did_open(self, params: Dict):
+        item = params['textDocument']
+        path = uri_to_path(item['uri'])
+        kind = self.document_kind(path)
+        if kind is None:
+            return
+        document = Document(item['uri'], path, kind)
+        self.documents[item['uri']] = document
+        self.update(document, item['text'], item.get('version'))
+
+    def did_change(self, params: Dict):
+        document = self.documents.get(params['textDocument']['uri'])
+        if document is None or not params['contentChanges']:
+            return
+        self.update(document, params['contentChanges'][-1]['text'], params['textDocument'].get('version'))
+
+    def did_save(self, params: Dict):
+        document = self.documents.get(params['textDocument']['uri'])
+        if document is not None and 'text' in params:
+            self.update(document, params['text'], document.version)
+
+    def did_close(self, params: Dict):
+        document = self.documents.pop(params['textDocument']['uri'], None)
+        if document is None:
+            return
+        self.reload_file(document.path)  # the index goes back to what is on disk
+        self.notify('textDocument/publishDiagnostics', {'uri': document.uri, 'diagnostics': []})
+
+    def did_change_watched_files(self, params: Dict):
+        """Files changed outside the editor: re-read the ones not open."""
+        open_paths = {document.path for document in self.documents.values()}
+        for change in params.get('changes', []):
+            path = uri_to_path(change['uri'])
+            if path not in open_paths and self.document_kind(path):
+                self.reload_file(path)
+            elif path.lower().endswith(TEXTURE_EXTENSIONS):
+                self.index.textures = scan_textures(self.index.mod_root)
+                self.publish_all('gfx')
+
+    def reload_file(self, path: str):
+        relpath = self.index.relpath(path)
+        kind = self.document_kind(path)
+        if kind == 'focus':
+            self.index.set_focuses(relpath, read_focus_locations(path) if os.path.isfile(path) else [])
+            self.publish_all('focus')
+        elif kind == 'gfx':
+            names = []
+            if os.path.isfile(path):
+                with open(path, encoding='utf-8-sig', errors='replace') as f:
+                    document = Document('', path, 'gfx')
+                    document.update(f.read())
+                names = [record['name'] for _, record in document.records()]
+            if self.index.set_sprites(relpath, names):
+                self.publish_all('focus')
+
+    def update(self, document: Document, text: str, version=None):
+        """Re-scan a document, update the index from it and publish its diagnostics."""
+        start = time.perf_counter()
+        scanned = document.update(text, version)
+        relpath = self.index.relpath(document.path)
+        others = []
+        if document.kind == 'focus':
+            before = self.focus_ids_of(document)
+            locations = [(record['id'], line + record['line'], record['column'])
+                         for line, record in document.records() if record['id']]
+            self.index.set_focuses(relpath, locations)
+            # Open focus files sharing an added or removed id gained or lost a duplicate
+            changed_ids = before.symmetric_difference(self.focus_ids_of(document))
+            if changed_ids:
+                others = [other for other in self.documents.values() if other.kind == 'focus'
+                          and other is not document and not changed_ids.isdisjoint(self.focus_ids_of(other))]
+        else:
+            names = [record['name'] for _, record in document.records()]
+            if self.index.set_sprites(relpath, names):
+                others = [other for other in self.documents.values() if other.kind == 'focus']
+        self.publish(document)
+        for other in others:
+            self.publish(other)
+        log(f"{relpath}: {len(document.blocks)} blocks, {scanned} scanned, {len(others)} other documents, "
+            f"{(time.perf_counter() - start) * 1000:.1f} ms", self.args, 2)
+
+    def focus_ids_of(self, document: Document) -> set:
+        return {focus_id for focus_id, _, _ in self.index.focus_files.get(self.index.relpath(document.path), [])}
+
+    def publish_all(self, kind: str):
+        for document in self.documents.values():
+            if document.kind == kind:
+                self.publish(document)
+
+    def publish(self, document: Document):
+        if document.kind == 'focus':
+            diagnostics = self.focus_diagnostics(document)
+        else:
+            diagnostics = self.sprite_diagnostics(document)
+        params = {'uri': document.uri, 'diagnostics': diagnostics}
+        if document.version is not None:
+            params['version'] = document.version
+        self.notify('textDocument/publishDiagnostics', params)
+
+    # Diagnostics
+
+    def focus_diagnostics(self, document: Document) -> List[Dict]:
+        index = self.index
+        relpath = index.relpath(document.path)
+        # Without the game's sprites most vanilla icons look undefined, so only hint at them
+        severity = SEVERITY_WARNING if index.game_root else SEVERITY_HINT
+        diagnostics = []
+        for first_line, record in document.records():
+            focus_id = record['id']
+            for name, line, column in record['icons']:
+                if not name.startswith('GFX_') or index.is_sprite(name):
+                    continue
+                message = f"Sprite {name} is not defined in any .gfx file"
+                if focus_id:
+                    icon_path, found = index.icons.resolve_icon(focus_id)
+                    if found:
+                        message += f"; genfocusgfx.py would use {icon_path} for GFX_{focus_id}"
+                    else:
+                        message += f"; no icon found for {focus_id} in {index.icons.args.icons_path}"
+                diagnostics.append(diagnostic(first_line + line, column, utf16_length(name), severity, message))
+
+            locations = index.focus_locations.get(focus_id) if focus_id else None
+            if locations and len(locations) > 1:
+                line = first_line + record['line']
+                others = [entry for entry in locations if entry[:2] != (relpath, line)]
+                related = [{'location': {'uri': path_to_uri(os.path.join(index.mod_root, path)),
+                                         'range': {'start': {'line': other_line, 'character': other_column},
+                                                   'end': {'line': other_line,
+                                                           'character': other_column + utf16_length(focus_id)}}},
+                            'message': f"{focus_id} is also defined here"}
+                           for path, other_line, other_column in others[:RELATED_LIMIT]]
+                where = ', '.join(f"{path}:{other_line + 1}" for path, other_line, _ in others[:RELATED_LIMIT])
+                diagnostics.append(diagnostic(line, record['column'], utf16_length(focus_id), SEVERITY_ERROR,
+                                              f"Focus id {focus_id} is defined {len(locations)} times ({where})",
+                                              relatedInformation=related))
+        return diagnostics
+
+    def sprite_diagnostics(self, document: Document) -> List[Dict]:
+        index = self.index
+        severity = SEVERITY_WARNING if index.game_root else SEVERITY_INFORMATION
+        seen = {}
+        diagnostics = []
+        for first_line, record in document.records():
+            name = record['name']
+            line = first_line + record['line']
+            if name in seen:
+                diagnostics.append(diagnostic(line, record['column'], utf16_length(name), SEVERITY_WARNING,
+                                              f"Sprite {name} is already defined on line {seen[name] + 1}"))
+            else:
+                seen[name] = line
+            texture = record['texture']
+            if texture is None:
+                diagnostics.append(diagnostic(line, record['column'], utf16_length(name), SEVERITY_WARNING,
+                                              f"Sprite {name} has no texturefile"))
+            elif not index.is_texture(texture):
+                where = 'the mod or the game' if index.game_root else 'the mod'
+                diagnostics.append(diagnostic(first_line + record['texture_line'], record['texture_column'],
+                                              utf16_length(texture), severity,
+                                              f"Texture {texture} does not exist in {where}"))
+        return diagnostics
+
+    # Completion
+
+    def completion(self, params: Dict) -> Optional[Dict]:
+        document = self.documents.get(params['textDocument']['uri'])
+        if document is None:
+            return None
+        line, column = params['position']['line'], params['position']['character']
+        text = document.line_text(line)
+        prefix_text = text[:char_index(text, column)]
+        match = COMPLETION_CONTEXT.search(prefix_text)
+        if match is None:
+            return None
+        prefix = match.group(1)
+        names, incomplete = self.index.complete(prefix)
+        start = column - utf16_length(prefix)
+        edit_range = {'start': {'line': line, 'character': start}, 'end': {'line': line, 'character': column}}
+        return {
+            'isIncomplete': incomplete,
+            'items': [{'label': name, 'kind': COMPLETION_KIND_VALUE, 'textEdit': {'range': edit_range, 'newText': name}}
+                      for name in names],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='focuslsp',
+        description='Language server (stdio) with sprite and focus diagnostics and sprite name completion.'
+    )
+    parser.add_argument('-m', '--mod-root', help='Mod root folder (default: the workspace root from the editor)')
+    parser.add_argument('-g', '--game-root', metavar='PATH',
+                        help='Game install folder, so vanilla sprites and textures are known')
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+                        help='More output on stderr (-v logs every update with its time)')
+    args = parser.parse_args()
+    server = Server(args, sys.stdin.buffer, sys.stdout.buffer)
+    sys.exit(server.serve())
+
+
+if __name__ == "__main__":
+    main()
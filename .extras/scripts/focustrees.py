@@ -0,0 +1,168 @@
+"""Focus trees of a mod, loaded once for the tree checkers.
+
+Every focus tree in common/national_focus is read with iter_focus_file into
+a tree record whose ``focuses`` map focus ids to compact focus records
+(position, offsets, cost, prerequisites and mutual exclusions).  Shared
+focuses a tree includes with ``shared_focus = <id>`` are added to it
+together with the shared focuses that follow from them.  Costs given as a
+scripted constant (``cost = @tier_1``) are replaced by the constant's value.
+
+Files are parsed in a process pool and their records cached by mtime and
+size under .extras/.cache, so only changed files are parsed again.
+"""
+
+import glob
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from fsutil import AtomicWriter, cache_file
+from pdxscript import ScriptError, iter_focus_file, to_number
+
+FOCUS_PATTERN = 'common/national_focus/*.txt'
+CACHE_VERSION = 2
+
+FOCUS_FIELDS = ('id', 'kind', 'x', 'y', 'relative_position_id', 'offset', 'cost',
+                'prerequisite', 'mutually_exclusive', 'allow_branch', 'line')
+
+_CONSTANT_RE = re.compile(r'^[ \t]*(@\w+)[ \t]*=[ \t]*(-?[0-9.]+)', re.MULTILINE)
+
+
+def _resolve_constants(path: str, focuses: List[Dict]):
+    """Replace ``cost = @name`` by the value of the file's ``@name = ...`` definition."""
+    if not any(isinstance(focus['cost'], str) for focus in focuses):
+        return
+    with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        constants = {name: to_number(value) for name, value in _CONSTANT_RE.findall(f.read())}
+    for focus in focuses:
+        if isinstance(focus['cost'], str):
+            focus['cost'] = constants.get(focus['cost'], focus['cost'])
+
+
+def scan_focus_file(path: str) -> Tuple[List[Dict], List[Dict], Optional[str]]:
+    """Return ([tree records], [shared focus records], error) for a focus file. Runs in a worker."""
+    trees, shared = [], []
+    focuses = []
+    try:
+        for record in iter_focus_file(path):
+            if record['kind'] == 'focus_tree':
+                trees.append({'id': record['id'], 'line': record['line'], 'shared_focus': record['shared_focus'],
+                              'focuses': focuses})
+                focuses = []
+            elif record['kind'] == 'focus':
+                focuses.append({field: record[field] for field in FOCUS_FIELDS})
+            elif record['kind'] in ('shared_focus', 'joint_focus'):
+                shared.append({field: record[field] for field in FOCUS_FIELDS})
+        _resolve_constants(path, [focus for tree in trees for focus in tree['focuses']] + shared)
+    except (OSError, ScriptError) as e:
+        return [], [], str(e)
+    return trees, shared, None
+
+
+def cache_path_for(mod_root: str, cache_dir: Optional[str] = None) -> str:
+    return cache_file('focustrees', mod_root, '.json', cache_dir)
+
+
+def _load_cache(path: str) -> Dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache.get('files', {}) if cache.get('version') == CACHE_VERSION else {}
+
+
+def scan_files(mod_root: str, cache_path: Optional[str] = None, jobs: Optional[int] = None
+               ) -> Tuple[Dict[str, Tuple[List[Dict], List[Dict], Optional[str]]], int]:
+    """Scan every focus file, reusing cached results; returns ({relpath: result}, files parsed).
+
+    An empty cache_path disables the cache.
+    """
+    if cache_path is None:
+        cache_path = cache_path_for(mod_root)
+    entries = _load_cache(cache_path) if cache_path else {}
+    results = {}
+    stale = []
+    for path in sorted(glob.glob(os.path.join(mod_root, FOCUS_PATTERN))):
+        relpath = os.path.relpath(path, mod_root).replace('\\', '/')
+        st = os.stat(path)
+        entry = entries.get(relpath)
+        if entry and entry['stat'] == [st.st_mtime_ns, st.st_size]:
+            results[relpath] = tuple(entry['result'])
+        else:
+            stale.append((path, relpath, [st.st_mtime_ns, st.st_size]))
+
+    jobs = jobs or min(len(stale), os.cpu_count() or 1)
+    if jobs > 1 and len(stale) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            fresh = list(executor.map(scan_focus_file, [path for path, _, _ in stale]))
+    else:
+        fresh = [scan_focus_file(path) for path, _, _ in stale]
+    for (_, relpath, stat), result in zip(stale, fresh):
+        results[relpath] = result
+
+    if cache_path and (stale or len(entries) != len(results)):
+        files = {relpath: {'stat': stat, 'result': list(result)}
+                 for (_, relpath, stat), result in zip(stale, fresh) if result[-1] is None}
+        files.update((relpath, entry) for relpath, entry in entries.items()
+                     if relpath in results and relpath not in files)
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        with AtomicWriter(cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'files': files}, f, separators=(',', ':'))
+    return results, len(stale)
+
+
+def shared_closure(roots: List[str], shared: Dict[str, Dict]) -> List[str]:
+    """Shared focus ids a tree includes: the roots and every shared focus requiring an included one."""
+    children = {}
+    for focus in shared.values():
+        for group in focus['prerequisite']:
+            for parent in group:
+                children.setdefault(parent, []).append(focus['id'])
+    included = []
+    seen = set()
+    stack = [root for root in reversed(roots) if root in shared]
+    while stack:
+        focus_id = stack.pop()
+        if focus_id in seen:
+            continue
+        seen.add(focus_id)
+        included.append(focus_id)
+        stack.extend(reversed(children.get(focus_id, [])))
+    return included
+
+
+def load_trees(mod_root: str = '.', cache_path: Optional[str] = None, jobs: Optional[int] = None
+               ) -> Tuple[List[Dict], List[str]]:
+    """Return ([tree records], [errors]) for every focus tree of a mod.
+
+    Tree records have ``id``, ``file``, ``line`` and ``focuses``, an ordered
+    {focus id: record} map; each focus record carries its ``file``.  Focuses
+    defined again under an id the tree already has are listed in ``duplicates``.
+    """
+    scanned, _ = scan_files(mod_root, cache_path, jobs)
+    errors = []
+    shared = {}
+    for relpath, (_, shared_focuses, error) in scanned.items():
+        if error:
+            errors.append(f"{relpath}: {error}")
+        for focus in shared_focuses:
+            shared.setdefault(focus['id'], dict(focus, file=relpath))
+
+    trees = []
+    for relpath, (file_trees, _, _) in scanned.items():
+        for tree in file_trees:
+            focuses = {}
+            duplicates = []
+            for focus in tree['focuses']:
+                if focus['id'] in focuses:
+                    duplicates.append(dict(focus, file=relpath))
+                else:
+                    focuses[focus['id']] = dict(focus, file=relpath)
+            for focus_id in shared_closure(tree['shared_focus'], shared):
+                focuses.setdefault(focus_id, shared[focus_id])
+            trees.append({'id': tree['id'], 'file': relpath, 'line': tree['line'], 'focuses': focuses,
+                          'duplicates': duplicates})
+    return trees, errors
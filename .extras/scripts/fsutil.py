@@ -0,0 +1,206 @@
+"""Filesystem and command-line helpers shared by the .extras scripts."""
+
+import hashlib
+import mmap
+import os
+import sys
+
+# Digest used wherever a hash only detects changes (caches, indexes, outputs)
+DEFAULT_DIGEST = 'blake2b'
+DIGEST_SIZE = 16
+
+CHUNK_SIZE = 1 << 20
+MMAP_THRESHOLD = 4 << 20
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '.cache')
+
+
+def new_hasher(algorithm: str = DEFAULT_DIGEST):
+    """Create a hasher; BLAKE2 digests are truncated to DIGEST_SIZE bytes."""
+    if algorithm in ('blake2b', 'blake2s'):
+        return getattr(hashlib, algorithm)(digest_size=DIGEST_SIZE)
+    return hashlib.new(algorithm)
+
+
+def hash_bytes(data: bytes, algorithm: str = DEFAULT_DIGEST) -> str:
+    """Hash an in-memory buffer."""
+    hasher = new_hasher(algorithm)
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+def hash_file(filepath, algorithm: str = DEFAULT_DIGEST) -> str:
+    """Hash a file without loading it into memory.
+
+    Large files are hashed over an mmap, smaller ones in fixed-size chunks
+    read into a reused buffer.
+    """
+    hasher = new_hasher(algorithm)
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                hasher.update(mm)
+        else:
+            buf = bytearray(min(CHUNK_SIZE, max(size, 1)))
+            view = memoryview(buf)
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                hasher.update(view[:n])
+    return hasher.hexdigest()
+
+
+LINK_MODES = ('auto', 'reflink', 'hardlink', 'copy')
+
+# Linux FICLONE ioctl: share the source's extents copy-on-write (btrfs, XFS, ...)
+_FICLONE = 0x40049409
+
+
+def _reflink(src, dst):
+    import fcntl
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.remove(dst)
+            raise
+
+
+def link_or_copy(src, dst, mode: str = 'auto') -> str:
+    """Create dst with the contents of src, sharing storage where possible.
+
+    In 'auto' mode a reflink is tried first, then a hardlink, then a plain
+    copy.  An existing dst is replaced.  Returns the method that was used.
+    """
+    import shutil
+    if os.path.lexists(dst):
+        os.remove(dst)
+
+    if mode in ('auto', 'reflink'):
+        try:
+            _reflink(src, dst)
+            return 'reflink'
+        except (ImportError, OSError):
+            if mode == 'reflink':
+                raise
+    if mode in ('auto', 'hardlink'):
+        try:
+            os.link(src, dst)
+            return 'hardlink'
+        except OSError:
+            if mode == 'hardlink':
+                raise
+    shutil.copy2(src, dst)
+    return 'copy'
+
+
+def backup_file(path, backup_path) -> str:
+    """Keep the current contents of path as backup_path without copying them.
+
+    A hardlink is made where possible, so path stays in place until it is
+    replaced; otherwise path is renamed.  Returns the method that was used.
+    """
+    if os.path.lexists(backup_path):
+        os.remove(backup_path)
+    try:
+        os.link(path, backup_path)
+        return 'hardlink'
+    except OSError:
+        os.rename(path, backup_path)
+        return 'rename'
+
+
+def files_equal(path_a, path_b) -> bool:
+    """Compare two files by size, then by content hash."""
+    try:
+        if os.path.getsize(path_a) != os.path.getsize(path_b):
+            return False
+    except OSError:
+        return False
+    return hash_file(path_a) == hash_file(path_b)
+
+
+class AtomicWriter:
+    """Write a file through a temporary file that only replaces it if it changed.
+
+    Use as a context manager; the stream is written to a temporary file in
+    the target's folder.  On a clean exit the temporary file is compared
+    with the existing file by hash: if they match it is discarded and the
+    target (and its mtime) is left alone, otherwise an optional backup is
+    made with backup_file() and the temporary file is moved over the target
+    with os.replace().  On an exception the target is never touched.
+
+    After the block, ``changed`` tells whether the target was replaced.
+    """
+
+    def __init__(self, path, mode: str = 'w', encoding=None, newline=None, buffering: int = -1,
+                 backup_path=None):
+        self.path = os.fspath(path)
+        self.mode = mode
+        self.encoding = encoding
+        self.newline = newline
+        self.buffering = buffering
+        self.backup_path = backup_path
+        self.tmp_path = None
+        self.changed = False
+        self.backup_method = None
+
+    def __enter__(self):
+        import tempfile
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=folder, prefix=f".{os.path.basename(self.path)}.", suffix='.tmp')
+        try:
+            self.file = os.fdopen(fd, self.mode, buffering=self.buffering, encoding=self.encoding,
+                                  newline=self.newline)
+        except Exception:
+            os.close(fd)
+            os.remove(self.tmp_path)
+            raise
+        return self.file
+
+    def __exit__(self, exc_type, exc, tb):
+        self.file.close()
+        if exc_type is not None:
+            os.remove(self.tmp_path)
+            return False
+
+        if files_equal(self.tmp_path, self.path):
+            os.remove(self.tmp_path)
+            return False
+
+        try:
+            # mkstemp creates 0600 files; keep the target's mode or the usual default
+            if os.path.exists(self.path):
+                mode = os.stat(self.path).st_mode & 0o7777
+                if self.backup_path:
+                    self.backup_method = backup_file(self.path, self.backup_path)
+            else:
+                umask = os.umask(0)
+                os.umask(umask)
+                mode = 0o666 & ~umask
+            os.chmod(self.tmp_path, mode)
+            os.replace(self.tmp_path, self.path)
+        except Exception:
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+            raise
+        self.changed = True
+        return False
+
+
+def cache_file(tool: str, root: str, extension: str, cache_dir=None) -> str:
+    """Cache file of a tool for one mod (or game) root, under cache_dir or .extras/.cache."""
+    name = hash_bytes(os.path.abspath(root).encode('utf-8'))[:12]
+    return os.path.join(cache_dir or DEFAULT_CACHE_DIR, f"{tool}-{name}{extension}")
+
+
+def log(message: str, args, level: int = 1):
+    """Print a message if verbosity allows (0 = always, 1 = normal, 2 = -v)."""
+    if level == 0:
+        print(message, file=sys.stderr)
+    elif not args.quiet and args.verbose + 1 >= level:
+        print(message)
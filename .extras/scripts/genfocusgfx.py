@@ -1,16 +1,18 @@
 ## Created by anvilpepe (quilki)
 
 
-import re
 import os
 import argparse
+import glob
+import io
 import sys
-import hashlib
 import time
-import shutil
 from datetime import datetime
-from pathlib import Path
-from typing import List, Set, Optional, Dict, Tuple
+from typing import Callable, List, Set, Optional, Dict, Tuple
+
+from fsutil import DEFAULT_CACHE_DIR, LINK_MODES, AtomicWriter, hash_bytes, hash_file, link_or_copy, new_hasher
+from pdxscript import ScriptError, iter_focuses
+import tracing
 
 def create_parser():
     """Create and configure the argument parser for genfocusgfx."""
@@ -30,6 +32,12 @@ EXAMPLES:
   Filter specific focuses:
     genfocusgfx focus_tree.txt output.gfx --focus-ids focus1 focus2 focus3
   
+  Process every focus tree in a directory:
+    genfocusgfx common/national_focus interface/goals/ --jobs 4
+  
+  Regenerate on save while editing:
+    genfocusgfx focus_tree.txt output.gfx --force --watch
+  
   Dry run for testing:
     genfocusgfx focus_tree.txt output.gfx --dry-run -vv
         """
@@ -38,12 +46,17 @@ EXAMPLES:
     # ========== POSITIONAL ARGUMENTS ==========
     parser.add_argument(
         'source',
-        type=lambda x: validate_file_path(parser, x),
-        help='Input file containing focus definitions (required)'
+        type=lambda x: validate_source_path(parser, x),
+        help='''Input file containing focus definitions (required).
+    May also be a directory or a quoted glob pattern to
+    process several focus files in one run.'''
     )
     parser.add_argument(
         'output', 
-        help='Output file for generated graphics configuration (required)'
+        help='''Output file for generated graphics configuration (required).
+    With several sources, an existing directory (or a path
+    ending in /) gets one <source>.gfx per source; any other
+    path receives all sprites merged in source order.'''
     )
 
     # ========== GENERAL OPTIONS ==========
@@ -73,6 +86,23 @@ EXAMPLES:
     Shows what would be created/changed.'''
     )
     
+    general_group.add_argument(
+        '--preview',
+        type=int,
+        default=20,
+        metavar='N',
+        help='Number of sprites shown per output in a dry run (default: %(default)s)'
+    )
+    
+    general_group.add_argument(
+        '-j', '--jobs',
+        type=int,
+        metavar='N',
+        help='''Number of worker processes for batch runs.
+    Default: one per source file, up to the CPU count.
+    Output is identical regardless of the number of workers.'''
+    )
+    
     general_group.add_argument(
         '--version',
         action='version',
@@ -80,6 +110,22 @@ EXAMPLES:
         help='Display version information and exit'
     )
 
+    general_group.add_argument(
+        '-w', '--watch',
+        action='store_true',
+        help='''Keep running and regenerate affected outputs whenever
+    a source, the icons folder or an output file changes.'''
+    )
+    
+    general_group.add_argument(
+        '--watch-interval',
+        type=float,
+        default=0.05,
+        metavar='SECONDS',
+        help='''Polling and debounce interval for --watch.
+    Default: %(default)s'''
+    )
+
     # ========== IMAGE HANDLING ==========
     image_group = parser.add_argument_group('IMAGE CONFIGURATION')
     
@@ -96,6 +142,17 @@ EXAMPLES:
         action='store_true',
         help='Generate placeholder images for missing focus icons'
     )
+    
+    image_group.add_argument(
+        '--placeholder-link',
+        choices=LINK_MODES,
+        default='auto',
+        help='''How placeholders share the default image's data.
+    auto tries reflink, then hardlink, then copy.
+    Hardlinked placeholders are the same file as the default
+    image: replace them with a new file, do not edit in place.
+    Default: %(default)s'''
+    )
 
     # ========== PATH CONFIGURATION ==========
     path_group = parser.add_argument_group('PATH CONFIGURATION')
@@ -195,9 +252,28 @@ EXAMPLES:
     
     workflow_group.add_argument(
         '--report-format',
-        choices=['txt', 'json', 'csv', 'md'],
+        choices=['txt', 'json', 'jsonl', 'csv', 'md'],
         default='txt',
-        help='Format for report file (default: %(default)s)'
+        help='''Format for report file (default: %(default)s).
+    jsonl writes one JSON record per focus as outputs are written.
+    csv keeps one row per focus; totals, phase timings and counters
+    go to <report>.metrics.csv next to it.'''
+    )
+    
+    workflow_group.add_argument(
+        '--trace',
+        type=str,
+        metavar='FILE',
+        help='''Record spans per file and phase and save them to FILE as Chrome trace JSON.
+    Open in chrome://tracing or ui.perfetto.dev.'''
+    )
+    
+    workflow_group.add_argument(
+        '--profile',
+        type=str,
+        metavar='FILE',
+        help='''Profile source processing with cProfile and save the stats to FILE.
+    Sources are processed in this process (implies --jobs 1). View with: python -m pstats FILE'''
     )
     
     workflow_group.add_argument(
@@ -226,9 +302,55 @@ EXAMPLES:
         help='Disable all safety checks (NOT RECOMMENDED)'
     )
 
+    # ========== BUILD CACHE ==========
+    cache_group = parser.add_argument_group('BUILD CACHE')
+    
+    cache_group.add_argument(
+        '--cache-dir',
+        type=str,
+        metavar='PATH',
+        help='''Directory for the incremental build cache.
+    Default: .extras/.cache next to the scripts folder'''
+    )
+    
+    cache_mode_group = cache_group.add_mutually_exclusive_group()
+    
+    cache_mode_group.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Neither read nor write the build cache'
+    )
+    
+    cache_mode_group.add_argument(
+        '--rebuild',
+        action='store_true',
+        help='Ignore cached results and regenerate everything (refreshes the cache)'
+    )
+    
+    cache_group.add_argument(
+        '--prune-cache',
+        action='store_true',
+        help='Evict cache entries of deleted source files (also done whenever a new source is cached)'
+    )
+
     # ========== VALIDATION ==========
     validation_group = parser.add_argument_group('VALIDATION')
     
+    validation_group.add_argument(
+        '--check-registry',
+        action='store_true',
+        help='''Warn when a generated GFX_ name is already defined in
+    another interface/*.gfx file under --mod-root (or the
+    current folder), using the sprite registry.'''
+    )
+    
+    validation_group.add_argument(
+        '--check-textures',
+        action='store_true',
+        help='''Check the headers of found icons (size, pixel format, mipmaps)
+    against the goal-icon conventions and list invalid ones in the report.'''
+    )
+    
     validation_group.add_argument(
         '--strict',
         action='store_true',
@@ -245,147 +367,383 @@ def validate_file_path(parser, path):
     return path
 
 
-def log_message(level: int, message: str, args):
-    """Log messages based on verbosity level."""
-    if args.quiet:
+def validate_source_path(parser, path):
+    """Validate that a source file or directory exists, or a glob matches something."""
+    if glob.has_magic(path) and not os.path.exists(path):
+        if not glob.glob(path, recursive=True):
+            parser.error(f"No files match: {path}")
+        return path
+    return validate_file_path(parser, path)
+
+
+# Verbosity needed for each log level: errors, warnings, info, debug, trace
+LOG_LEVELS = [(0, 'ERROR'), (1, 'WARNING'), (1, 'INFO'), (2, 'DEBUG'), (3, 'TRACE')]
+
+
+# Warnings and errors logged while processing a source, kept with its cache entry
+_captured_warnings: Optional[List[Tuple[int, str]]] = None
+
+
+def capture_warnings(warnings: Optional[List]) -> Optional[List]:
+    """Also record warnings and errors in warnings; returns the previous target."""
+    global _captured_warnings
+    previous, _captured_warnings = _captured_warnings, warnings
+    return previous
+
+
+def log_enabled(level: int, args) -> bool:
+    """Whether log_message would print at this level."""
+    return not args.quiet and args.verbose >= LOG_LEVELS[level][0]
+
+
+def log_message(level: int, message: str, args, *message_args):
+    """Log messages based on verbosity level.
+    
+    With message_args, message is a %-format string that is only formatted
+    when the level is enabled, so hot paths can log without paying for it.
+    Warnings and errors are formatted anyway while they are being captured.
+    """
+    if _captured_warnings is not None and level <= 1:
+        if message_args:
+            message, message_args = message % message_args, ()
+        _captured_warnings.append((level, message))
+    if args.quiet or args.verbose < LOG_LEVELS[level][0]:
         return
     
+    if message_args:
+        message = message % message_args
     if level == 0:  # Always show errors
         print(f"ERROR: {message}", file=sys.stderr)
-    elif level == 1 and args.verbose >= 1:  # Warnings at -v
-        print(f"WARNING: {message}")
-    elif level == 2 and args.verbose >= 1:  # Info at -v
-        print(f"INFO: {message}")
-    elif level == 3 and args.verbose >= 2:  # Debug at -vv
-        print(f"DEBUG: {message}")
-    elif level == 4 and args.verbose >= 3:  # Trace at -vvv
-        print(f"TRACE: {message}")
+    else:
+        print(f"{LOG_LEVELS[level][1]}: {message}")
+
+
+# Output is formatted while it is written: 'format' is the part of 'write' spent rendering sprites
+PHASES = ['cache', 'read', 'parse', 'filter', 'icon_resolution', 'placeholders', 'format', 'write', 'report']
+COUNTERS = ['stat_calls', 'open_calls', 'bytes_read', 'bytes_written']
+
+# Metrics that filesystem counters in this process are added to
+_metrics: Optional[Dict] = None
+_audit_hook_installed = False
+# Timers running in this process; opens outside them (the report file, most imports) are not counted
+_timers_running = 0
+# Files opened by a lazy import inside a Timer, which are not the phase's own I/O
+_MODULE_SUFFIXES = ('.py', '.pyc', '.so', '.pyd')
+
+
+def new_metrics() -> Dict:
+    """Create empty per-phase timings and filesystem counters."""
+    return {
+        'phases': {phase: {'seconds': 0.0, 'calls': 0} for phase in PHASES},
+        'counters': dict.fromkeys(COUNTERS, 0)
+    }
+
+
+def merge_metrics(into: Dict, other: Dict):
+    """Add the timings and counters of other into into."""
+    for phase, data in other['phases'].items():
+        into['phases'][phase]['seconds'] += data['seconds']
+        into['phases'][phase]['calls'] += data['calls']
+    for counter, value in other['counters'].items():
+        into['counters'][counter] += value
+
+
+def _audit_hook(event: str, event_args):
+    if _metrics is None or not _timers_running:  # cost two checks per audited event outside phases
+        return
+    if event == 'open' and str(event_args[0]).endswith(_MODULE_SUFFIXES):
+        return
+    if event in ('open', 'os.scandir', 'os.listdir'):
+        _metrics['counters']['open_calls'] += 1
+
+
+def install_audit_hook():
+    """Count opens for the active metrics.
+    
+    Audit hooks cannot be removed, so only the command line (and its worker
+    processes) installs one; library users of this module get no hook and
+    an open_calls counter of 0.
+    """
+    global _audit_hook_installed
+    if not _audit_hook_installed:
+        sys.addaudithook(_audit_hook)
+        _audit_hook_installed = True
+
+
+def activate_metrics(metrics: Optional[Dict]) -> Optional[Dict]:
+    """Route filesystem counters of this process to metrics; returns the previous target."""
+    global _metrics
+    previous, _metrics = _metrics, metrics
+    return previous
+
+
+def count(counter: str, amount: int = 1):
+    """Increment a filesystem counter of the active metrics."""
+    if _metrics is not None:
+        _metrics['counters'][counter] += amount
+
+
+def path_exists(path: str) -> bool:
+    """os.path.exists, counted as a stat call."""
+    count('stat_calls')
+    return os.path.exists(path)
+
+
+class Timer:
+    """Context manager adding its wall time to one phase of a metrics dict.
+    
+    While tracing is active the phase is also recorded as a trace span.
+    """
+    
+    __slots__ = ('name', 'phase', 'start', 'span_args')
+    
+    def __init__(self, metrics: Dict, phase: str, **span_args):
+        self.name = phase
+        self.phase = metrics['phases'][phase]
+        self.span_args = span_args
+    
+    def __enter__(self):
+        global _timers_running
+        _timers_running += 1
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        global _timers_running
+        end = time.perf_counter()
+        _timers_running -= 1
+        self.phase['seconds'] += end - self.start
+        self.phase['calls'] += 1
+        tracer = tracing.active()
+        if tracer is not None:
+            tracer.complete(self.name, self.start * 1e6, end * 1e6, 'phase', self.span_args or None)
+
+
+class MeteredReader:
+    """Line iterator over a source file that times reads and counts bytes.
+
+    Lets the streaming parser's time be split into read and parse phases.
+    """
+    
+    BATCH_SIZE = 64 * 1024
+    
+    def __init__(self, path: str, metrics: Dict):
+        self.name = path
+        self.metrics = metrics
+        if _audit_hook_installed:  # reads are timed by hand, not in a Timer, so the hook skips this open
+            self.metrics['counters']['open_calls'] += 1
+        self.raw = open(path, 'rb')
+        self.text = io.TextIOWrapper(self.raw, encoding='utf-8-sig', errors='replace')
+    
+    def __iter__(self):
+        read = self.metrics['phases']['read']
+        while True:
+            # Lines are fetched in batches so timing them stays cheap
+            start = time.perf_counter()
+            lines = self.text.readlines(self.BATCH_SIZE)
+            read['seconds'] += time.perf_counter() - start
+            if not lines:
+                return
+            yield from lines
+    
+    def close(self):
+        self.metrics['counters']['bytes_read'] += self.raw.tell()
+        self.metrics['phases']['read']['calls'] += 1
+        self.text.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
 
 
 def get_file_hash(filepath: str) -> str:
-    """Calculate MD5 hash of a file."""
-    hasher = hashlib.md5()
-    with open(filepath, 'rb') as f:
-        buf = f.read()
-        hasher.update(buf)
-    return hasher.hexdigest()
+    """Calculate MD5 hash of a file for the versioned output header."""
+    return hash_file(filepath, 'md5')
+
+
+ICON_EXTENSIONS = ['.dds', '.tga', '.png']
+
+# Icon directory indexes, built once per directory and process
+_icon_indexes: Dict[str, Dict[str, Dict[str, str]]] = {}
+
+
+def _scan_icon_files(icon_dir: str, recursive: bool, prefix: str = '') -> List[str]:
+    names = []
+    try:
+        entries = sorted(os.scandir(icon_dir), key=lambda entry: entry.name)
+    except OSError:
+        return names
+    for entry in entries:
+        if entry.is_file():
+            names.append(prefix + entry.name)
+        elif recursive and entry.is_dir():
+            names.extend(_scan_icon_files(entry.path, recursive, f"{prefix}{entry.name}/"))
+    return names
+
+
+def build_icon_index(icon_dir: str, recursive: bool = False) -> Dict[str, Dict[str, str]]:
+    """Scan an icon directory once into {lowercase stem: {extension: file name}}.
+
+    Keys are lowercased because HOI4 resolves texture paths case-insensitively.
+    With recursive=True, subfolders are scanned too and file names are
+    relative to icon_dir; files higher up the tree take precedence.
+    """
+    index = {}
+    names = _scan_icon_files(icon_dir, recursive)
+    names.sort(key=lambda name: name.count('/'))
+    
+    for name in names:
+        stem, ext = os.path.splitext(name.rsplit('/', 1)[-1])
+        ext = ext.lower()
+        if ext in ICON_EXTENSIONS:
+            index.setdefault(stem.lower(), {}).setdefault(ext, name)
+    return index
+
+
+def get_icon_index(args) -> Dict[str, Dict[str, str]]:
+    """Return the (cached) icon index for the configured icons directory."""
+    if not (args.mod_root and args.icons_path):
+        return {}
+    icon_dir = os.path.join(args.mod_root, args.icons_path)
+    if icon_dir not in _icon_indexes:
+        _icon_indexes[icon_dir] = build_icon_index(icon_dir)
+        log_message(3, "Indexed %d icons in %s", args, len(_icon_indexes[icon_dir]), icon_dir)
+    return _icon_indexes[icon_dir]
+
+
+def icon_naming_patterns(focus_id: str) -> List[str]:
+    """Icon file name stems tried for a focus, in order of preference."""
+    return [
+        focus_id,  # direct match
+        f"GFX_{focus_id}",  # GFX_prefix
+        f"goal_{focus_id.lower()}",  # goal_prefix (common pattern)
+        f"GFX_goal_{focus_id}"  # GFX_goal_prefix
+    ]
 
 
 def find_icon_for_focus(focus_id: str, args, icon_report: Dict) -> Tuple[str, bool]:
     """Find the appropriate icon path for a focus. Returns (icon_path, icon_found)."""
-    icon_found = False
-    icon_path = args.default_image
+    naming_patterns = icon_naming_patterns(focus_id)
     
     # Check mod root for custom icon
     if args.mod_root and args.icons_path:
         mod_icon_path = os.path.join(args.mod_root, args.icons_path)
+        icon_index = get_icon_index(args)
         
         # Try different naming conventions and extensions
-        naming_patterns = [
-            focus_id,  # direct match
-            f"GFX_{focus_id}",  # GFX_prefix
-            f"goal_{focus_id.lower()}",  # goal_prefix (common pattern)
-            f"GFX_goal_{focus_id}"  # GFX_goal_prefix
-        ]
-        
-        possible_extensions = ['.dds', '.tga', '.png']
-        
         for pattern in naming_patterns:
-            for ext in possible_extensions:
-                icon_file = os.path.join(mod_icon_path, f"{pattern}{ext}")
-                if os.path.exists(icon_file):
-                    relative_path = os.path.relpath(icon_file, args.mod_root)
-                    icon_path = relative_path.replace('\\', '/')
-                    icon_found = True
-                    
-                    # Record found icon in report
-                    if focus_id not in icon_report['found_icons']:
-                        icon_report['found_icons'][focus_id] = []
-                    icon_report['found_icons'][focus_id].append({
-                        'pattern': pattern,
-                        'extension': ext,
-                        'full_path': icon_file,
-                        'relative_path': icon_path
-                    })
-                    
-                    log_message(3, f"Found icon for {focus_id}: {icon_path}", args)
-                    return icon_path, icon_found
+            candidates = icon_index.get(pattern.lower())
+            if not candidates:
+                continue
+            for ext in ICON_EXTENSIONS:
+                if ext not in candidates:
+                    continue
+                icon_file = os.path.join(mod_icon_path, candidates[ext])
+                relative_path = os.path.relpath(icon_file, args.mod_root)
+                icon_path = relative_path.replace('\\', '/')
+                
+                # Record found icon in report
+                if focus_id not in icon_report['found_icons']:
+                    icon_report['found_icons'][focus_id] = []
+                icon_report['found_icons'][focus_id].append({
+                    'pattern': pattern,
+                    'extension': ext,
+                    'full_path': icon_file,
+                    'relative_path': icon_path
+                })
+                
+                log_message(3, "Found icon for %s: %s", args, focus_id, icon_path)
+                return icon_path, True
     
     # Record missing icon in report
-    if not icon_found:
-        if focus_id not in icon_report['missing_icons']:
-            icon_report['missing_icons'][focus_id] = {
-                'patterns_tried': naming_patterns,
-                'extensions_tried': possible_extensions,
-                'icon_path': args.icons_path
-            }
-    
-    return icon_path, icon_found
+    if focus_id not in icon_report['missing_icons']:
+        icon_report['missing_icons'][focus_id] = {
+            'patterns_tried': naming_patterns,
+            'extensions_tried': ICON_EXTENSIONS,
+            'icon_path': args.icons_path
+        }
+    
+    return args.default_image, False
 
 
-def clone_default_image_as_placeholder(focus_id: str, default_image_path: str, mod_root: str, icons_path: str, args) -> Optional[str]:
-    """Clone the default image as a placeholder named GFX_{focus_id}.dds."""
-    try:
-        # Find the actual default image file
-        default_image_full_path = find_default_image_file(default_image_path, args)
-        if not default_image_full_path:
-            log_message(1, f"Cannot find default image: {default_image_path}", args)
-            return None
-        
-        # Determine the extension from the default image
-        _, ext = os.path.splitext(default_image_full_path)
-        if not ext:
-            ext = '.dds'  # Default to .dds if no extension
-        
-        # Create the placeholder filename
-        placeholder_filename = f"GFX_{focus_id}{ext}"
-        
-        # Create the destination path
-        dest_dir = os.path.join(mod_root, icons_path)
-        dest_path = os.path.join(dest_dir, placeholder_filename)
-        
-        # Ensure destination directory exists
-        os.makedirs(dest_dir, exist_ok=True)
-        
-        if not check_overwrite(dest_path, args):
-            log_message(2, "Didn't create a placeholder since file already existed")
+def create_placeholders(focus_ids: List[str], args) -> Dict[str, Dict]:
+    """Create GFX_{focus_id} placeholders for focuses without an icon.
 
-        # Copy the default image to create the placeholder
-        shutil.copy2(default_image_full_path, dest_path)
+    The default image is resolved once and each placeholder is reflinked or
+    hardlinked to it where the filesystem allows, falling back to a copy.
+    Returns report entries keyed by focus ID for the placeholders created.
+    """
+    created = {}
+    if not focus_ids:
+        return created
+    
+    default_image_full_path = find_default_image_file(args.default_image, args)
+    if not default_image_full_path:
+        log_message(1, f"Cannot find default image: {args.default_image}", args)
+        return created
+    
+    # Determine the extension from the default image
+    _, ext = os.path.splitext(default_image_full_path)
+    if not ext:
+        ext = '.dds'  # Default to .dds if no extension
+    
+    # Ensure destination directory exists
+    dest_dir = os.path.join(args.mod_root, args.icons_path)
+    os.makedirs(dest_dir, exist_ok=True)
+    count('stat_calls')
+    image_size = os.path.getsize(default_image_full_path)
+    
+    for focus_id in focus_ids:
+        dest_path = os.path.join(dest_dir, f"GFX_{focus_id}{ext}")
         
-        # Calculate relative path for Paradox format
-        relative_path = os.path.relpath(dest_path, mod_root)
-        relative_path = relative_path.replace('\\', '/')
+        if not check_overwrite(dest_path, args):
+            log_message(2, "Didn't create a placeholder for %s since %s already exists", args, focus_id, dest_path)
+            continue
         
-        log_message(2, f"Created placeholder GFX_{focus_id}{ext} from default image", args)
-        return relative_path
+        try:
+            method = link_or_copy(default_image_full_path, dest_path, args.placeholder_link)
+        except OSError as e:
+            log_message(1, f"Failed to create placeholder for {focus_id}: {e}", args)
+            continue
         
-    except Exception as e:
-        log_message(1, f"Failed to create placeholder for {focus_id}: {e}", args)
-        return None
+        # Calculate relative path for Paradox format
+        relative_path = os.path.relpath(dest_path, args.mod_root).replace('\\', '/')
+        created[focus_id] = {
+            'icon_path': relative_path,
+            'source_image': args.default_image,
+            'method': method,
+            'bytes_saved': 0 if method == 'copy' else image_size
+        }
+        log_message(2, "Created placeholder GFX_%s%s from default image (%s)", args, focus_id, ext, method)
+    
+    saved = sum(info['bytes_saved'] for info in created.values())
+    log_message(2, f"Created {len(created)} placeholders, {saved} bytes saved by linking", args)
+    return created
 
 
 def find_default_image_file(default_image_path: str, args) -> Optional[str]:
     """Find the actual file for the default image path."""
     # Check if it's an absolute path
     if os.path.isabs(default_image_path):
-        if os.path.exists(default_image_path):
+        if path_exists(default_image_path):
             return default_image_path
     
     # Check in game root
     if args.game_root:
         game_path = os.path.join(args.game_root, default_image_path)
-        if os.path.exists(game_path):
+        if path_exists(game_path):
             return game_path
     
     # Check in mod root
     if args.mod_root:
         mod_path = os.path.join(args.mod_root, default_image_path)
-        if os.path.exists(mod_path):
+        if path_exists(mod_path):
             return mod_path
     
     # Check relative to current directory
-    if os.path.exists(default_image_path):
+    if path_exists(default_image_path):
         return default_image_path
     
     return None
@@ -421,80 +779,135 @@ def filter_focus_ids(focus_ids: List[str], args) -> List[str]:
     return sorted(list(filtered))
 
 
+# Sprite layouts per --output-format. A tab stands for one indentation unit,
+# $FOCUS and $ICON for the focus ID and icon path.
+SPRITE_TEMPLATES = {
+    'compact': (
+        '\tspriteType = { name = GFX_$FOCUS texturefile = $ICON }\n'
+        ' spriteType = { name = GFX_$FOCUS_shine texturefile = $ICON }\n'
+    ),
+    'pretty': (
+        '\tspriteType = {\n'
+        '\t    name = GFX_$FOCUS\n'
+        '\t    texturefile = $ICON\n'
+        '\t}\n'
+        '\tspriteType = {\n'
+        '\t    name = GFX_$FOCUS_shine\n'
+        '\t    texturefile = $ICON\n'
+        '\t}\n'
+    ),
+    'standard': (
+        '\tspriteType = {\n'
+        '\t    name = GFX_$FOCUS\n'
+        '\t    texturefile = $ICON\n'
+        '\t}\n'
+        '\tspriteType = {\n'
+        '\t\tname = GFX_$FOCUS_shine\n'
+        '\t\ttexturefile = $ICON\n'
+        '\t\tanimation = {\n'
+        '\t\t\tanimationmaskfile = $ICON\n'
+        '\t\t\tanimationtexturefile = gfx/interface/goals/shine_overlay.dds\n'
+        '\t\t\tanimationrotation = -90.0\n'
+        '\t\t\tanimationlooping = no\n'
+        '\t\t\tanimationtime = 0.75\n'
+        '\t\t\tanimationdelay = 0\n'
+        '\t\t\tanimationblendmode = "add"\n'
+        '\t\t\tanimationtype = "scrolling"\n'
+        '\t\t\tanimationrotationoffset = { x = 0.0 y = 0.0 }\n'
+        '\t\t\tanimationtexturescale = { x = 1.0 y = 1.0 }\n'
+        '\t\t}\n'
+        '\t\tanimation = {\n'
+        '\t\t\tanimationmaskfile = $ICON\n'
+        '\t\t\tanimationtexturefile = gfx/interface/goals/shine_overlay.dds\n'
+        '\t\t\tanimationrotation = 90.0\n'
+        '\t\t\tanimationlooping = no\n'
+        '\t\t\tanimationtime = 0.75\n'
+        '\t\t\tanimationdelay = 0\n'
+        '\t\t\tanimationblendmode = "add"\n'
+        '\t\t\tanimationtype = "scrolling"\n'
+        '\t\t\tanimationrotationoffset = { x = 0.0 y = 0.0 }\n'
+        '\t\t\tanimationtexturescale = { x = 1.0 y = 1.0 }\n'
+        '\t\t}\n'
+        '\t\tlegacy_lazy_load = no\n'
+        '\t}\n'
+    ),
+}
+
+WRITE_BUFFER_SIZE = 1 << 16
+# Sprites rendered per timed batch, so the format phase costs two clock reads per batch
+FORMAT_BATCH_SIZE = 256
+
+# Compiled templates by (output format, indent, indent level)
+_sprite_templates: Dict[Tuple[str, int, int], Callable[[str, str], str]] = {}
+
+
+def get_sprite_template(output_format: str, indent: int, indent_level: int = 1) -> Callable[[str, str], str]:
+    """Return a function rendering one sprite pair from (focus_id, icon_path).
+
+    Templates are compiled to a str.format call once per combination, so
+    rendering a sprite is a single formatting call.
+    """
+    key = (output_format, indent, indent_level)
+    template = _sprite_templates.get(key)
+    if template is None:
+        text = SPRITE_TEMPLATES.get(output_format, SPRITE_TEMPLATES['standard'])
+        text = text.replace('{', '{{').replace('}', '}}')
+        text = text.replace('\t', ' ' * (indent * indent_level))
+        text = text.replace('$FOCUS', '{0}').replace('$ICON', '{1}')
+        template = _sprite_templates[key] = text.format
+    return template
+
+
 def format_sprite(focus_id: str, icon_path: str, args, indent_level: int = 1) -> str:
     """Format a single sprite definition."""
-    indent = ' ' * (args.indent * indent_level)
-    
-    if args.output_format == 'compact':
-        return f'{indent}spriteType = {{ name = GFX_{focus_id} texturefile = {icon_path} }}\n spriteType = {{ name = GFX_{focus_id}_shine texturefile = {icon_path} }}\n'
-    elif args.output_format == 'pretty':
-        lines = [
-            f'{indent}spriteType = {{',
-            f'{indent}    name = GFX_{focus_id}',
-            f'{indent}    texturefile = {icon_path}',
-            f'{indent}}}'
-        ] + [
-            f'{indent}spriteType = {{',
-            f'{indent}    name = GFX_{focus_id}_shine',
-            f'{indent}    texturefile = {icon_path}',
-            f'{indent}}}'
-        ]
-        return '\n'.join(lines) + '\n'
-    else:  # standard format
-        lines = [
-            f'{indent}spriteType = {{',
-            f'{indent}    name = GFX_{focus_id}',
-            f'{indent}    texturefile = {icon_path}',
-            f'{indent}}}'
-        ] + [
-            f'{indent}spriteType = {{',
-            f'{indent}{indent}name = GFX_{focus_id}_shine',
-            f'{indent}{indent}texturefile = {icon_path}',
-            f'{indent}{indent}animation = {{',
-            f'{indent}{indent}{indent}animationmaskfile = {icon_path}',
-            f'{indent}{indent}{indent}animationtexturefile = gfx/interface/goals/shine_overlay.dds',
-            f'{indent}{indent}{indent}animationrotation = -90.0',
-            f'{indent}{indent}{indent}animationlooping = no',
-            f'{indent}{indent}{indent}animationtime = 0.75',
-            f'{indent}{indent}{indent}animationdelay = 0',
-            f'{indent}{indent}{indent}animationblendmode = "add"',
-            f'{indent}{indent}{indent}animationtype = "scrolling"',
-            f'{indent}{indent}{indent}animationrotationoffset = {{ x = 0.0 y = 0.0 }}',
-            f'{indent}{indent}{indent}animationtexturescale = {{ x = 1.0 y = 1.0 }}',
-            f'{indent}{indent}}}',
-            f'{indent}{indent}animation = {{',
-            f'{indent}{indent}{indent}animationmaskfile = {icon_path}',
-            f'{indent}{indent}{indent}animationtexturefile = gfx/interface/goals/shine_overlay.dds',
-            f'{indent}{indent}{indent}animationrotation = 90.0',
-            f'{indent}{indent}{indent}animationlooping = no',
-            f'{indent}{indent}{indent}animationtime = 0.75',
-            f'{indent}{indent}{indent}animationdelay = 0',
-            f'{indent}{indent}{indent}animationblendmode = "add"',
-            f'{indent}{indent}{indent}animationtype = "scrolling"',
-            f'{indent}{indent}{indent}animationrotationoffset = {{ x = 0.0 y = 0.0 }}',
-            f'{indent}{indent}{indent}animationtexturescale = {{ x = 1.0 y = 1.0 }}',
-            f'{indent}{indent}}}',
-            f'{indent}{indent}legacy_lazy_load = no',
-            f'{indent}}}'
-        ]
-        return '\n'.join(lines) + '\n'
-
-
-def generate_header(args, source_hash: str) -> str:
-    """Generate versioned output header."""
+    return get_sprite_template(args.output_format, args.indent, indent_level)(focus_id, icon_path)
+
+
+def write_sprites(stream, sprites: List[Tuple[str, str]], args, header: str = '',
+                  limit: Optional[int] = None) -> int:
+    """Stream a spriteTypes block for (focus_id, icon_path) pairs to a text stream.
+
+    With a limit, only that many sprites are written and the rest are
+    summarized in a comment.  Returns the number of sprites written.
+    """
+    render = get_sprite_template(args.output_format, args.indent)
+    write = stream.write
+    shown = sprites if limit is None else sprites[:limit]
+    format_phase = _metrics['phases']['format'] if _metrics is not None else None
+    write(header)
+    write('spriteTypes = {\n')
+    for start in range(0, len(shown), FORMAT_BATCH_SIZE):
+        batch_start = time.perf_counter()
+        text = ''.join([render(focus_id, icon_path) for focus_id, icon_path in shown[start:start + FORMAT_BATCH_SIZE]])
+        if format_phase is not None:
+            format_phase['seconds'] += time.perf_counter() - batch_start
+            format_phase['calls'] += 1
+        write(text)
+    if len(shown) < len(sprites):
+        write(f"    # ... {len(sprites) - len(shown)} more sprites\n")
+    write('}\n')
+    return len(shown)
+
+
+def generate_header(sources: List[Tuple[str, str]]) -> str:
+    """Generate versioned output header for (source file, source hash) pairs."""
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     lines = [
         '# Generated by genfocusgfx',
         f'# Timestamp: {timestamp}',
-        f'# Source hash: {source_hash}',
-        f'# Source file: {os.path.basename(args.source)}',
+    ]
+    for source, source_hash in sources:
+        lines.append(f'# Source hash: {source_hash}')
+        lines.append(f'# Source file: {os.path.basename(source)}')
+    lines += [
         '#',
         ''
     ]
     return '\n'.join(lines)
 
 
-def generate_report(focus_ids: List[str], args, start_time: float, icon_report: Dict) -> Dict:
+def generate_report(focus_ids: List[str], args, start_time: float, icon_report: Dict,
+                    metrics: Optional[Dict] = None) -> Dict:
     """Generate report data including icon status."""
     end_time = time.time()
     duration = end_time - start_time
@@ -509,11 +922,21 @@ def generate_report(focus_ids: List[str], args, start_time: float, icon_report:
         'icon_statistics': {
             'total_found': len(icon_report['found_icons']),
             'total_missing': len(icon_report['missing_icons']),
-            'total_placeholders_created': len(icon_report['placeholders_created'])
+            'total_placeholders_created': len(icon_report['placeholders_created']),
+            'total_invalid': len(icon_report.get('invalid_icons', {})),
+            'placeholder_bytes_saved': sum(
+                info.get('bytes_saved', 0) for info in icon_report['placeholders_created'].values()
+            )
         },
         'found_icons': icon_report['found_icons'],
         'missing_icons': icon_report['missing_icons'],
         'placeholders_created': icon_report['placeholders_created'],
+        'invalid_icons': icon_report.get('invalid_icons', {}),
+        'phases': {
+            phase: {'seconds': round(data['seconds'], 6), 'calls': data['calls']}
+            for phase, data in metrics['phases'].items()
+        } if metrics else {},
+        'counters': dict(metrics['counters']) if metrics else {},
         'arguments': vars(args)
     }
     
@@ -521,154 +944,242 @@ def generate_report(focus_ids: List[str], args, start_time: float, icon_report:
 
 
 def save_report(report: Dict, args):
-    """Save report to file in requested format with detailed icon information."""
+    """Save a complete report document as JSON."""
     if not args.report:
         return
     
+    import json
     report_path = args.report
     os.makedirs(os.path.dirname(report_path) if os.path.dirname(report_path) else '.', exist_ok=True)
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+
+
+def focus_report_entries(sprites: List[Tuple[str, str]], icon_report: Dict):
+    """Yield (focus_id, status, icon_path, notes, details) for each written sprite."""
+    for focus_id, icon_path in sprites:
+        if focus_id in icon_report['placeholders_created']:
+            info = icon_report['placeholders_created'][focus_id]
+            yield (focus_id, 'PLACEHOLDER_CREATED', info['icon_path'],
+                   f"Cloned from default image ({info.get('method', 'copy')})", info)
+        elif focus_id in icon_report['missing_icons']:
+            info = icon_report['missing_icons'][focus_id]
+            yield focus_id, 'MISSING', icon_path, f"Tried {len(info['patterns_tried'])} patterns", info
+        elif focus_id in icon_report.get('invalid_icons', {}):
+            info = icon_report['invalid_icons'][focus_id]
+            yield focus_id, 'INVALID_ICON', info['icon_path'], '; '.join(info['problems']), info
+        elif focus_id in icon_report['found_icons']:
+            info = icon_report['found_icons'][focus_id][0]
+            yield focus_id, 'FOUND', info['relative_path'], f"Pattern: {info['pattern']}", info
+        else:
+            yield focus_id, 'UNKNOWN', icon_path, '', {}
+
+
+def format_patterns(patterns: List[str], shown: int = 3) -> str:
+    """The first naming patterns tried for a missing icon, and how many more there were."""
+    text = ', '.join(patterns[:shown])
+    if len(patterns) > shown:
+        text += f" ... (+{len(patterns) - shown} more)"
+    return text
+
+
+def metrics_report_path(report_path: str) -> str:
+    """Where the csv format writes totals, phase timings and counters."""
+    return f"{os.path.splitext(report_path)[0]}.metrics.csv"
+
+
+class ReportWriter:
+    """Writes the --report file while outputs are generated.
+    
+    Per-focus entries are written and flushed after each output, so a
+    partial report survives an interrupted run; totals, phase timings and
+    counters follow when the run completes.  The json format is a single
+    document and is still written at the end.
+    """
+    
+    def __init__(self, args, start_time: float):
+        self.args = args
+        self.format = args.report_format
+        self.start_time = start_time
+        self.focus_count = 0
+        self.focus_ids = []  # only kept for the json document
+        self.f = None
+        self.csv = None
+        if self.format == 'json':
+            return
+        
+        report_path = args.report
+        os.makedirs(os.path.dirname(report_path) if os.path.dirname(report_path) else '.', exist_ok=True)
+        self.f = open(report_path, 'w', newline='' if self.format == 'csv' else None)
+        f = self.f
+        timestamp = datetime.now().isoformat()
+        
+        if self.format == 'jsonl':
+            self._write_record({
+                'type': 'run',
+                'timestamp': timestamp,
+                'source_file': args.source,
+                'output_file': args.output,
+                'arguments': vars(args)
+            })
+        elif self.format == 'csv':
+            import csv
+            self.csv = csv.writer(f)
+            self.csv.writerow(['Focus ID', 'Status', 'Icon Path', 'Notes'])
+        elif self.format == 'md':
+            f.write(f"# genfocusgfx Report\n\n")
+            f.write(f"**Timestamp**: {timestamp}\n")
+            f.write(f"**Source**: {args.source}\n")
+            f.write(f"**Output**: {args.output}\n\n")
+        else:  # txt format (default)
+            f.write(f"genfocusgfx Report\n")
+            f.write(f"=" * 60 + "\n\n")
+            f.write(f"Timestamp: {timestamp}\n")
+            f.write(f"Source: {args.source}\n")
+            f.write(f"Output: {args.output}\n\n")
+        f.flush()
     
-    if args.report_format == 'json':
+    def _write_record(self, record: Dict):
         import json
-        with open(report_path, 'w') as f:
-            json.dump(report, f, indent=2, default=str)
-    
-    elif args.report_format == 'csv':
-        import csv
-        with open(report_path, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Focus ID', 'Status', 'Icon Path', 'Notes'])
-            
-            # Write found icons
-            for focus_id, icons in report['found_icons'].items():
-                for icon_info in icons:
-                    writer.writerow([focus_id, 'FOUND', icon_info['relative_path'], f"Pattern: {icon_info['pattern']}"])
-            
-            # Write missing icons
-            for focus_id, info in report['missing_icons'].items():
-                writer.writerow([focus_id, 'MISSING', '', f"Tried {len(info['patterns_tried'])} patterns"])
-            
-            # Write placeholders created
-            for focus_id, info in report['placeholders_created'].items():
-                writer.writerow([focus_id, 'PLACEHOLDER_CREATED', info['icon_path'], 'Cloned from default image'])
-    
-    elif args.report_format == 'md':
-        with open(report_path, 'w') as f:
-            f.write(f"# genfocusgfx Report\n\n")
-            f.write(f"**Timestamp**: {report['timestamp']}\n")
-            f.write(f"**Duration**: {report['duration_seconds']} seconds\n")
-            f.write(f"**Source**: {report['source_file']}\n")
-            f.write(f"**Output**: {report['output_file']}\n")
-            f.write(f"**Total Focuses**: {report['total_focuses']}\n\n")
-            
-            # Icon Statistics
+        self.f.write(json.dumps(record, default=str))
+        self.f.write('\n')
+    
+    def add_output(self, output: str, sprites: List[Tuple[str, str]], icon_report: Dict):
+        """Write the entries of every focus written to one output file."""
+        self.focus_count += len(sprites)
+        if self.format == 'json':
+            self.focus_ids.extend(focus_id for focus_id, _ in sprites)
+            return
+        
+        f = self.f
+        entries = focus_report_entries(sprites, icon_report)
+        if self.format == 'jsonl':
+            for focus_id, status, icon_path, _, details in entries:
+                self._write_record({
+                    'type': 'focus', 'focus_id': focus_id, 'output': output,
+                    'status': status, 'icon_path': icon_path, 'details': details
+                })
+        elif self.format == 'csv':
+            for focus_id, status, icon_path, notes, _ in entries:
+                self.csv.writerow([focus_id, status, icon_path, notes])
+        elif self.format == 'md':
+            f.write(f"## {output}\n\n")
+            f.write("| Focus ID | Status | Icon Path | Notes |\n")
+            f.write("|----------|--------|-----------|-------|\n")
+            for focus_id, status, icon_path, notes, _ in entries:
+                f.write(f"| `{focus_id}` | {status} | `{icon_path}` | {notes} |\n")
+            f.write("\n")
+        else:
+            f.write(f"{output}:\n")
+            f.write("-" * 40 + "\n")
+            for focus_id, status, icon_path, notes, _ in entries:
+                f.write(f"  {focus_id}: {status} {icon_path}")
+                f.write(f" ({notes})\n" if notes else "\n")
+            f.write("\n")
+        f.flush()
+    
+    def close(self, icon_report: Dict, metrics: Dict):
+        """Write run totals and close the report.
+        
+        The 'report' phase covers writing the focus entries and is complete
+        before the totals are built, so the totals section itself is the
+        only report time it leaves out.
+        """
+        report = generate_report(self.focus_ids, self.args, self.start_time, icon_report, metrics)
+        if self.format == 'json':
+            save_report(report, self.args)
+            return
+        
+        stats = report['icon_statistics']
+        f = self.f
+        if self.format == 'jsonl':
+            self._write_record({
+                'type': 'summary',
+                'duration_seconds': report['duration_seconds'],
+                'total_focuses': self.focus_count,
+                'icon_statistics': stats,
+                'phases': report['phases'],
+                'counters': report['counters']
+            })
+        elif self.format == 'csv':
+            # A table of its own, so the report stays one row per focus
+            import csv
+            with open(metrics_report_path(self.args.report), 'w', newline='') as metrics_file:
+                writer = csv.writer(metrics_file)
+                writer.writerow(['Type', 'Name', 'Value', 'Calls'])
+                writer.writerow(['STAT', 'total_focuses', self.focus_count, ''])
+                for name, value in stats.items():
+                    writer.writerow(['STAT', name, value, ''])
+                for phase, data in report['phases'].items():
+                    writer.writerow(['PHASE', phase, f"{data['seconds']:.6f}", data['calls']])
+                for counter, value in report['counters'].items():
+                    writer.writerow(['COUNTER', counter, value, ''])
+        elif self.format == 'md':
             f.write("## Icon Statistics\n\n")
-            stats = report['icon_statistics']
+            f.write(f"- **Duration**: {report['duration_seconds']} seconds\n")
+            f.write(f"- **Total Focuses**: {self.focus_count}\n")
             f.write(f"- **Icons Found**: {stats['total_found']}\n")
             f.write(f"- **Icons Missing**: {stats['total_missing']}\n")
-            f.write(f"- **Placeholders Created**: {stats['total_placeholders_created']}\n\n")
+            f.write(f"- **Placeholders Created**: {stats['total_placeholders_created']}\n")
+            f.write(f"- **Invalid Icons**: {stats['total_invalid']}\n")
+            f.write(f"- **Placeholder Bytes Saved**: {stats['placeholder_bytes_saved']}\n\n")
             
-            # Missing Icons Section
             if report['missing_icons']:
                 f.write("## Missing Icons\n\n")
-                f.write("| Focus ID | Patterns Tried |\n")
-                f.write("|----------|----------------|\n")
+                f.write("| Focus ID | Search Path | Patterns Tried |\n")
+                f.write("|----------|-------------|----------------|\n")
                 for focus_id, info in report['missing_icons'].items():
-                    patterns = ", ".join(info['patterns_tried'][:3])  # Show first 3 patterns
-                    if len(info['patterns_tried']) > 3:
-                        patterns += f" ... (+{len(info['patterns_tried']) - 3} more)"
-                    f.write(f"| `{focus_id}` | {patterns} |\n")
-                f.write("\n")
-            
-            # Found Icons Section
-            if report['found_icons']:
-                f.write("## Found Icons\n\n")
-                f.write("| Focus ID | Icon Path | Pattern |\n")
-                f.write("|----------|-----------|---------|\n")
-                for focus_id, icons in report['found_icons'].items():
-                    for icon_info in icons:
-                        f.write(f"| `{focus_id}` | `{icon_info['relative_path']}` | {icon_info['pattern']} |\n")
+                    f.write(f"| `{focus_id}` | `{info['icon_path']}` | {format_patterns(info['patterns_tried'])} |\n")
                 f.write("\n")
             
-            # Placeholders Created Section
-            if report['placeholders_created']:
-                f.write("## Placeholders Created\n\n")
-                f.write("| Focus ID | Placeholder Path |\n")
-                f.write("|----------|------------------|\n")
-                for focus_id, info in report['placeholders_created'].items():
-                    f.write(f"| `{focus_id}` | `{info['icon_path']}` |\n")
-                f.write("\n")
-    
-    else:  # txt format (default)
-        with open(report_path, 'w') as f:
-            f.write(f"genfocusgfx Report\n")
-            f.write(f"=" * 60 + "\n\n")
-            f.write(f"Timestamp: {report['timestamp']}\n")
-            f.write(f"Duration: {report['duration_seconds']} seconds\n")
-            f.write(f"Source: {report['source_file']}\n")
-            f.write(f"Output: {report['output_file']}\n")
-            f.write(f"Total Focuses: {report['total_focuses']}\n\n")
-            
-            # Icon Statistics
+            f.write("## Phase Timings\n\n")
+            f.write("| Phase | Seconds | Calls |\n")
+            f.write("|-------|---------|-------|\n")
+            for phase, data in report['phases'].items():
+                f.write(f"| {phase} | {data['seconds']:.4f} | {data['calls']} |\n")
+            f.write("\n")
+            f.write("| Counter | Value |\n")
+            f.write("|---------|-------|\n")
+            for counter, value in report['counters'].items():
+                f.write(f"| {counter} | {value} |\n")
+            f.write("\n")
+        else:
             f.write("ICON STATISTICS:\n")
             f.write("-" * 40 + "\n")
-            stats = report['icon_statistics']
+            f.write(f"Duration: {report['duration_seconds']} seconds\n")
+            f.write(f"Total Focuses: {self.focus_count}\n")
             f.write(f"Icons Found: {stats['total_found']}\n")
             f.write(f"Icons Missing: {stats['total_missing']}\n")
-            f.write(f"Placeholders Created: {stats['total_placeholders_created']}\n\n")
+            f.write(f"Placeholders Created: {stats['total_placeholders_created']}\n")
+            f.write(f"Invalid Icons: {stats['total_invalid']}\n")
+            f.write(f"Placeholder Bytes Saved: {stats['placeholder_bytes_saved']}\n\n")
             
-            # Missing Icons Section
             if report['missing_icons']:
                 f.write("MISSING ICONS:\n")
                 f.write("-" * 40 + "\n")
                 for focus_id, info in report['missing_icons'].items():
                     f.write(f"  {focus_id}:\n")
                     f.write(f"    Search path: {info['icon_path']}\n")
-                    f.write(f"    Patterns tried: {', '.join(info['patterns_tried'][:3])}")
-                    if len(info['patterns_tried']) > 3:
-                        f.write(f" ... (+{len(info['patterns_tried']) - 3} more)")
-                    f.write("\n")
-                f.write("\n")
-            
-            # Found Icons Section
-            if report['found_icons']:
-                f.write("FOUND ICONS:\n")
-                f.write("-" * 40 + "\n")
-                for focus_id, icons in report['found_icons'].items():
-                    f.write(f"  {focus_id}:\n")
-                    for icon_info in icons:
-                        f.write(f"    Pattern: {icon_info['pattern']}\n")
-                        f.write(f"    Path: {icon_info['relative_path']}\n")
-                f.write("\n")
-            
-            # Placeholders Created Section
-            if report['placeholders_created']:
-                f.write("PLACEHOLDERS CREATED:\n")
-                f.write("-" * 40 + "\n")
-                for focus_id, info in report['placeholders_created'].items():
-                    f.write(f"  {focus_id}: {info['icon_path']}\n")
+                    f.write(f"    Patterns tried: {format_patterns(info['patterns_tried'])}\n")
                 f.write("\n")
             
+            f.write("PHASE TIMINGS:\n")
+            f.write("-" * 40 + "\n")
+            for phase, data in report['phases'].items():
+                f.write(f"  {phase:<16} {data['seconds'] * 1000:10.2f} ms  ({data['calls']} calls)\n")
+            f.write("\n")
+            f.write("COUNTERS:\n")
+            f.write("-" * 40 + "\n")
+            for counter, value in report['counters'].items():
+                f.write(f"  {counter:<16} {value:>12}\n")
+            f.write("\n")
             f.write("=" * 60 + "\n")
-
-
-def create_backup(filepath: str, args):
-    """Create backup of existing file."""
-    if args.no_backup or not os.path.exists(filepath):
-        return
-    
-    backup_path = f"{filepath}.backup"
-    try:
-        import shutil
-        shutil.copy2(filepath, backup_path)
-        log_message(2, f"Created backup: {backup_path}", args)
-    except Exception as e:
-        log_message(1, f"Failed to create backup: {e}", args)
+        f.close()
 
 
 def check_overwrite(filepath: str, args) -> bool:
     """Check if we should overwrite an existing file."""
-    if not os.path.exists(filepath):
+    if not path_exists(filepath):
         return True
     
     if args.force:
@@ -683,103 +1194,792 @@ def check_overwrite(filepath: str, args) -> bool:
     return False
 
 
-def main(args):
-    """Main processing function."""
-    start_time = time.time()
+CACHE_VERSION = 4
+
+# Arguments that change the resolved sprites, or the placeholders created, for a given source
+# (formatting happens when writing, so --output-format/--indent are not included)
+CACHED_OPTIONS = [
+    'mod_root', 'game_root', 'icons_path', 'default_image', 'focus_ids', 'exclude_ids',
+    'prefix', 'suffix', 'versioned_output', 'generate_placeholder', 'dry_run'
+]
+
+
+def get_cache_dir(args) -> str:
+    """Directory holding genfocusgfx build cache entries."""
+    return os.path.join(args.cache_dir or DEFAULT_CACHE_DIR, 'genfocusgfx')
+
+
+def get_cache_path(source: str, args) -> str:
+    """Cache entry path for a source; one entry per source keeps stale keys out."""
+    name = hash_bytes(os.path.abspath(source).encode('utf-8'))
+    return os.path.join(get_cache_dir(args), f"{name}.json")
+
+
+# Maps cache entry file names to their sources, so pruning never opens the entries
+CACHE_INDEX = 'index.json'
+
+
+def icon_index_fingerprint(icon_index: Dict[str, Dict[str, str]]) -> str:
+    """Fingerprint the icon file names an index was built from."""
+    hasher = new_hasher()
+    for stem in sorted(icon_index):
+        for name in sorted(icon_index[stem].values()):
+            hasher.update(name.encode('utf-8'))
+            hasher.update(b'\0')
+    return hasher.hexdigest()
+
+
+def cache_key(source: str, args) -> str:
+    """Key a source's generated sprites on its content, the icon index and options."""
+    import json
+    options = {name: getattr(args, name) for name in CACHED_OPTIONS}
+    key_data = json.dumps([
+        CACHE_VERSION,
+        hash_file(source),
+        icon_index_fingerprint(get_icon_index(args)),
+        options
+    ], sort_keys=True)
+    return hash_bytes(key_data.encode('utf-8'))
+
+
+def load_cached_result(source: str, key: str, args) -> Optional[Dict]:
+    """Return the cached process_source result for a key, or None."""
+    import json
+    try:
+        with open(get_cache_path(source, args), 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if entry.get('key') != key:
+        return None
+    result = entry['result']
+    result['source'] = source
+    result['sprites'] = [tuple(sprite) for sprite in result['sprites']]
+    result['metrics'] = new_metrics()
+    # Repeat what parsing the source printed
+    for level, message in result['warnings']:
+        log_message(level, message, args)
+    return result
+
+
+def store_cached_result(source: str, key: str, result: Dict, args) -> bool:
+    """Store a process_source result, replacing any older entry for the source; True if stored."""
+    import json
+    # Results with side effects or errors must be recomputed on the next run
+    if result['error'] or result['icon_report']['placeholders_created']:
+        return False
+    path = get_cache_path(source, args)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            cached = {name: value for name, value in result.items() if name not in ('metrics', 'trace_events')}
+            json.dump({'key': key, 'result': cached}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        log_message(1, f"Failed to write cache entry for {source}: {e}", args)
+        return False
+    return True
+
+
+def update_cache_index(sources: List[str], args):
+    """Add the entries stored for sources to the cache index.
+    
+    The cache is only pruned when this adds a source or with --prune-cache,
+    so a run whose sources are all cached never reads the index.
+    """
+    import json
+    index_path = os.path.join(get_cache_dir(args), CACHE_INDEX)
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+    
+    changed = False
+    for source in sources:
+        name = os.path.basename(get_cache_path(source, args))
+        if index.get(name) != os.path.abspath(source):
+            index[name] = os.path.abspath(source)
+            changed = True
+    if not changed and not args.prune_cache:
+        return
+    
+    changed = prune_cache(index, args) or changed
+    if changed:
+        try:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            writer = AtomicWriter(index_path, 'w', encoding='utf-8')
+            with writer as f:
+                json.dump(index, f, sort_keys=True)
+        except OSError as e:
+            log_message(1, f"Failed to write cache index: {e}", args)
+
+
+def prune_cache(index: Dict[str, str], args) -> bool:
+    """Evict cache entries whose source no longer exists or that are not indexed.
     
-    # Initialize icon report
-    icon_report = {
+    Evicted entries are removed from index; returns True if any were.
+    """
+    cache_dir = get_cache_dir(args)
+    try:
+        names = [name for name in os.listdir(cache_dir) if name.endswith('.json') and name != CACHE_INDEX]
+    except OSError:
+        names = []
+    stale = [name for name, source in index.items() if not os.path.exists(source)]
+    stale += [name for name in names if name not in index]
+    for name in stale:
+        index.pop(name, None)
+        try:
+            os.remove(os.path.join(cache_dir, name))
+            log_message(3, f"Evicted stale cache entry {name}", args)
+        except OSError:
+            pass
+    return bool(stale)
+
+
+# Sprite registries, kept open per mod root for the lifetime of the process
+_registries: Dict[str, object] = {}
+
+
+def get_registry(args):
+    """Return the (cached) sprite registry for the mod root, brought up to date."""
+    from spriteindex import SpriteRegistry, default_db_path
+    mod_root = os.path.abspath(args.mod_root or '.')
+    if mod_root not in _registries:
+        _registries[mod_root] = SpriteRegistry(mod_root, default_db_path(mod_root, args.cache_dir))
+    registry = _registries[mod_root]
+    registry.update()
+    return registry
+
+
+def check_registry(output: str, focus_ids: List[str], args) -> Dict[str, List[Dict]]:
+    """Warn about generated sprite names already defined in another .gfx file."""
+    names = [name for focus_id in focus_ids for name in (f"GFX_{focus_id}", f"GFX_{focus_id}_shine")]
+    conflicts = get_registry(args).defined_in(names, exclude_path=output)
+    for name, definitions in conflicts.items():
+        where = ', '.join(f"{d['path']}:{d['line']}" for d in definitions)
+        log_message(1, f"{name} written to {output} is already defined in {where}", args)
+    if conflicts and args.strict:
+        log_message(0, f"{len(conflicts)} generated sprites are already defined elsewhere", args)
+        sys.exit(1)
+    return conflicts
+
+
+def check_textures(results: Dict[str, Dict], args) -> int:
+    """Validate the headers of every found icon and record invalid ones in the results.
+    
+    Returns the number of invalid icons.
+    """
+    from texcheck import TextureChecker, cache_path_for
+    
+    icons = {}  # full path -> [(result, focus_id)]
+    for result in results.values():
+        result['icon_report'].setdefault('invalid_icons', {})
+        for focus_id, found in result['icon_report']['found_icons'].items():
+            icons.setdefault(found[0]['full_path'], []).append((result, focus_id))
+    if not icons:
+        return 0
+    
+    mod_root = args.mod_root or '.'
+    cache_path = '' if args.no_cache else cache_path_for(mod_root, args.cache_dir)
+    checker = TextureChecker(mod_root, cache_path, args.jobs)
+    checked = checker.check(list(icons))
+    checker.save()
+    
+    invalid = 0
+    for full_path, users in icons.items():
+        info = checked[checker.relpath(full_path)]
+        if not info['problems']:
+            continue
+        invalid += 1
+        for result, focus_id in users:
+            result['icon_report']['invalid_icons'][focus_id] = {
+                'icon_path': checker.relpath(full_path),
+                'problems': info['problems']
+            }
+        log_message(1, "Invalid icon %s: %s", args, checker.relpath(full_path), '; '.join(info['problems']))
+    return invalid
+
+
+def new_icon_report() -> Dict:
+    """Create an empty icon report."""
+    return {
         'found_icons': {},
         'missing_icons': {},
-        'placeholders_created': {}
+        'placeholders_created': {},
+        'invalid_icons': {}
     }
+
+
+def expand_sources(source: str) -> List[str]:
+    """Expand a source file, directory or glob pattern into a sorted file list."""
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source) if name.endswith('.txt')]
+    elif glob.has_magic(source):
+        paths = glob.glob(source, recursive=True)
+    else:
+        return [source]
+    return sorted((p for p in paths if os.path.isfile(p)), key=lambda p: p.replace('\\', '/').lower())
+
+
+def plan_outputs(sources: List[str], args) -> List[Tuple[str, List[str]]]:
+    """Map sources to output files as (output, sources) pairs in a fixed order.
+
+    A single source, or an output that is not a directory, gets one merged
+    output file.  With several sources and a directory output, each source
+    is written to <output>/<source stem>.gfx.
+    """
+    is_dir = os.path.isdir(args.output) or args.output.endswith(('/', os.sep))
+    if len(sources) == 1 or not is_dir:
+        return [(args.output, sources)]
+    return [
+        (os.path.join(args.output, os.path.splitext(os.path.basename(source))[0] + '.gfx'), [source])
+        for source in sources
+    ]
+
+
+def process_source(source: str, args) -> Dict:
+    """Parse one focus file and render its sprite definitions.
+
+    Runs in a worker process in batch mode, so it only returns plain data and
+    leaves writing outputs and reports to the caller.
+    """
+    result = {
+        'source': source,
+        'focus_ids': [],
+        'sprites': [],
+        'icon_report': new_icon_report(),
+        'source_hash': '',
+        'error': None,
+        'warnings': [],
+        'metrics': new_metrics()
+    }
+    previous_metrics = activate_metrics(result['metrics'])
+    previous_warnings = capture_warnings(result['warnings'])
+    # Workers trace into their own tracer and return its events with the result
+    # (a forked worker inherits the parent's tracer, which is never read back)
+    parent_tracer = tracing.active()
+    in_worker = parent_tracer is None or parent_tracer.pid != os.getpid()
+    tracer = tracing.Tracer() if args.trace and in_worker else None
+    previous_tracer = tracing.activate(tracer) if tracer else None
+    try:
+        with tracing.span('process_source', 'file', source=source):
+            return _process_source(source, args, result)
+    finally:
+        activate_metrics(previous_metrics)
+        capture_warnings(previous_warnings)
+        if tracer:
+            tracing.activate(previous_tracer)
+            result['trace_events'] = tracer.events
+
+
+def _process_source(source: str, args, result: Dict) -> Dict:
+    icon_report = result['icon_report']
+    metrics = result['metrics']
     
     # Parse focus IDs from source file
-    log_message(2, f"Reading focus definitions from {args.source}", args)
+    log_message(2, f"Reading focus definitions from {source}", args)
     
     try:
-        with open(args.source, 'r', encoding='utf-8-sig') as f:
-            content = f.read()
-        
-        # Find all focus IDs using regex
-        focus_matches = re.findall(r'focus\s*=\s*{\s*id\s*=\s*(\w+)', content, re.DOTALL)
+        focus_matches = []
+        start = time.perf_counter()
+        read_before = metrics['phases']['read']['seconds']
+        with tracing.span('parse', 'phase', source=source), MeteredReader(source, metrics) as reader:
+            for focus in iter_focuses(reader):
+                if not focus['id']:
+                    log_message(1, "Focus without an id at %s:%d", args, source, focus['line'])
+                    continue
+                focus_matches.append(focus['id'])
+        parse = metrics['phases']['parse']
+        parse['seconds'] += time.perf_counter() - start - (metrics['phases']['read']['seconds'] - read_before)
+        parse['calls'] += 1
         
         if not focus_matches:
-            log_message(0, "No focus IDs found in source file", args)
-            if args.strict:
-                sys.exit(1)
-            return
+            log_message(0, f"No focus IDs found in source file {source}", args)
+            return result
         
-        log_message(2, f"Found {len(focus_matches)} focus IDs", args)
+        log_message(2, f"Found {len(focus_matches)} focus IDs in {source}", args)
         
-    except Exception as e:
-        log_message(0, f"Error reading source file: {e}", args)
-        sys.exit(1)
+    except (OSError, ScriptError) as e:
+        result['error'] = f"Error reading source file: {e}"
+        return result
     
     # Apply filtering
-    focus_ids = filter_focus_ids(focus_matches, args)
+    with Timer(metrics, 'filter'):
+        focus_ids = filter_focus_ids(focus_matches, args)
+    result['focus_ids'] = focus_ids
     
     if not focus_ids:
-        log_message(1, "No focus IDs match the specified filters", args)
-        if args.strict:
-            sys.exit(1)
-        return
+        log_message(1, f"No focus IDs in {source} match the specified filters", args)
+        return result
     
     log_message(2, f"Processing {len(focus_ids)} focus IDs after filtering", args)
     
-    # Check if we can overwrite output file
-    if not check_overwrite(args.output, args):
+    # Calculate source hash for versioned output
+    if args.versioned_output:
+        with Timer(metrics, 'read'):
+            result['source_hash'] = get_file_hash(source)
+    
+    # Find appropriate icons
+    icon_paths = {}
+    missing = []
+    with Timer(metrics, 'icon_resolution', focuses=len(focus_ids)):
+        for focus_id in focus_ids:
+            icon_path, icon_found = find_icon_for_focus(focus_id, args, icon_report)
+            icon_paths[focus_id] = icon_path
+            if not icon_found:
+                missing.append(focus_id)
+    
+    # Generate placeholders in one batch if requested
+    if missing and args.generate_placeholder and args.mod_root and args.icons_path and not args.dry_run:
+        with Timer(metrics, 'placeholders', focuses=len(missing)):
+            created = create_placeholders(missing, args)
+        icon_report['placeholders_created'].update(created)
+        for focus_id, info in created.items():
+            icon_paths[focus_id] = info['icon_path']
+    
+    # Sprites are formatted when the output is written
+    result['sprites'] = [(focus_id, icon_paths[focus_id]) for focus_id in focus_ids]
+    if log_enabled(3, args):
+        for focus_id in focus_ids:
+            log_message(3, "Processed focus: %s -> %s", args, focus_id, icon_paths[focus_id])
+    
+    return result
+
+
+def run_sources(sources: List[str], args) -> Dict[str, Dict]:
+    """Process all sources, spreading them over a process pool when jobs > 1.
+
+    Sources with a valid build cache entry are answered from the cache and
+    never reach the pool.
+    """
+    results = {}
+    cache_keys = {}
+    cache_metrics = new_metrics()
+    
+    if not args.no_cache:
+        with Timer(cache_metrics, 'cache'):
+            for source in sources:
+                cache_keys[source] = cache_key(source, args)
+                if not args.rebuild:
+                    cached = load_cached_result(source, cache_keys[source], args)
+                    if cached is not None:
+                        log_message(3, "Using cached sprites for %s", args, source)
+                        results[source] = cached
+    
+    pending = [source for source in sources if source not in results]
+    stored = []
+    if pending:
+        jobs = args.jobs or min(len(pending), os.cpu_count() or 1)
+        if args.interactive or args.profile:
+            jobs = 1  # prompts cannot be answered and workers are not profiled
+        
+        if args.profile:
+            import cProfile
+            profiler = cProfile.Profile()
+            fresh = profiler.runcall(lambda: [process_source(source, args) for source in pending])
+            profiler.dump_stats(args.profile)
+            log_message(2, f"Profile written to {args.profile} (view with: python -m pstats {args.profile})", args)
+        elif jobs <= 1 or len(pending) == 1:
+            fresh = [process_source(source, args) for source in pending]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            log_message(2, f"Processing {len(pending)} source files with {jobs} workers", args)
+            initializer = install_audit_hook if _audit_hook_installed else None
+            with ProcessPoolExecutor(max_workers=jobs, initializer=initializer) as executor:
+                fresh = list(executor.map(process_source, pending, [args] * len(pending)))
+        
+        tracer = tracing.active()
+        if tracer is not None:
+            for result in fresh:
+                tracer.merge(result.pop('trace_events', []))
+        
+        with Timer(cache_metrics, 'cache'):
+            for source, result in zip(pending, fresh):
+                results[source] = result
+                if source in cache_keys and store_cached_result(source, cache_keys[source], result, args):
+                    stored.append(source)
+    
+    if stored or (args.prune_cache and not args.no_cache):
+        with Timer(cache_metrics, 'cache'):
+            update_cache_index(stored, args)
+    
+    # Cache time is accounted to the first source
+    if sources:
+        merge_metrics(results[sources[0]]['metrics'], cache_metrics)
+    
+    if not args.no_cache:
+        log_message(2, f"{len(sources) - len(pending)} of {len(sources)} source files were up to date in the cache", args)
+    return {source: results[source] for source in sources}
+
+
+def merge_results(output: str, results: List[Dict], args) -> Tuple[str, List[Tuple[str, str]], Dict]:
+    """Merge per-source results into a header, (focus_id, icon_path) pairs and an icon report.
+
+    Sources are merged in the given order; a focus ID defined by more than
+    one source is kept from the first one.
+    """
+    icon_report = new_icon_report()
+    sprites = []
+    seen = set()
+    
+    header = ''
+    if args.versioned_output:
+        header = generate_header([(r['source'], r['source_hash']) for r in results])
+    
+    for result in results:
+        for focus_id, icon_path in result['sprites']:
+            if focus_id in seen:
+                log_message(1, f"Duplicate focus ID {focus_id} in {result['source']} (already written to {output})", args)
+                continue
+            seen.add(focus_id)
+            sprites.append((focus_id, icon_path))
+        for section, entries in result['icon_report'].items():
+            for focus_id, info in entries.items():
+                icon_report[section].setdefault(focus_id, info)
+    
+    return header, sprites, icon_report
+
+
+def default_options() -> Dict:
+    """The CLI's option defaults by destination name, without the positional arguments."""
+    # The current directory is always a valid source, so parsing cannot fail
+    options = vars(create_parser().parse_args([os.curdir, os.devnull]))
+    del options['source'], options['output']
+    return options
+
+
+class FocusGfxGenerator:
+    """Library API for generating focus sprites from a long-lived process.
+    
+    Options are the CLI's long option names with underscores (icons_path,
+    output_format, prefix, generate_placeholder, ...) and default as on the
+    command line, except that the instance is quiet and keeps its caches in
+    memory instead of .extras/.cache.  Focus IDs of parsed files are kept
+    by mtime and size, resolved icons until the icons directory changes,
+    and the mod's sprite registry stays open, so editor integrations and
+    batch scripts can reuse one warm instance:
+    
+        generator = FocusGfxGenerator('.', icons_path='gfx/interface/goals')
+        text = generator.generate('common/national_focus/usa.txt')
+        icon_path, found = generator.resolve_icon('USA_focus')
+    """
+    
+    def __init__(self, mod_root: Optional[str] = None, **options):
+        values = default_options()
+        unknown = sorted(set(options) - set(values))
+        if unknown:
+            raise TypeError(f"Unknown options: {', '.join(unknown)}")
+        values.update(quiet=True, no_cache=True)
+        values.update(options)
+        values['mod_root'] = mod_root
+        self.args = argparse.Namespace(**values)
+        self.icon_report = new_icon_report()
+        self._focus_ids: Dict[str, Tuple[Tuple[int, int], List[str]]] = {}
+        self._icons: Dict[str, Tuple[str, bool]] = {}
+        self._icons_stat = None
+    
+    def focus_ids(self, source: str, text: Optional[str] = None) -> List[str]:
+        """Focus IDs defined in a focus file, or in text (e.g. an unsaved editor buffer)."""
+        if text is not None:
+            stream = io.StringIO(text)
+            stream.name = source
+            return [focus['id'] for focus in iter_focuses(stream) if focus['id']]
+        
+        st = os.stat(source)
+        key = os.path.abspath(source)
+        cached = self._focus_ids.get(key)
+        if cached and cached[0] == (st.st_mtime_ns, st.st_size):
+            return cached[1]
+        ids = [focus['id'] for focus in iter_focuses(source) if focus['id']]
+        self._focus_ids[key] = ((st.st_mtime_ns, st.st_size), ids)
+        return ids
+    
+    def _refresh_icons(self):
+        """Forget resolved icons, and the report on them, when the icons directory has changed."""
+        if not (self.args.mod_root and self.args.icons_path):
+            return
+        icon_dir = os.path.join(self.args.mod_root, self.args.icons_path)
+        try:
+            st = os.stat(icon_dir)
+            stat = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stat = None
+        if stat != self._icons_stat:
+            self._icons_stat = stat
+            self._icons.clear()
+            self.icon_report = new_icon_report()
+            _icon_indexes.pop(icon_dir, None)
+    
+    def resolve_icon(self, focus_id: str) -> Tuple[str, bool]:
+        """Return (icon path, found) for a focus; the default image if no icon matches."""
+        self._refresh_icons()
+        resolved = self._icons.get(focus_id)
+        if resolved is None:
+            resolved = self._icons[focus_id] = find_icon_for_focus(focus_id, self.args, self.icon_report)
+        return resolved
+    
+    def sprites(self, source: str, text: Optional[str] = None) -> List[Tuple[str, str]]:
+        """(focus_id, icon_path) pairs for the filtered focuses of a source."""
+        focus_ids = filter_focus_ids(self.focus_ids(source, text), self.args)
+        self._refresh_icons()
+        icon_paths = {}
+        missing = []
+        for focus_id in focus_ids:
+            icon_paths[focus_id], found = self.resolve_icon(focus_id)
+            if not found:
+                missing.append(focus_id)
+        
+        if missing and self.args.generate_placeholder and self.args.mod_root and self.args.icons_path:
+            created = create_placeholders(missing, self.args)
+            self.icon_report['placeholders_created'].update(created)
+            for focus_id, info in created.items():
+                icon_paths[focus_id] = info['icon_path']
+                self._icons[focus_id] = (info['icon_path'], True)
+        return [(focus_id, icon_paths[focus_id]) for focus_id in focus_ids]
+    
+    def generate(self, source: str, text: Optional[str] = None) -> str:
+        """Render the spriteTypes block for a focus file (or its text) and return it."""
+        sprites = self.sprites(source, text)
+        header = ''
+        if self.args.versioned_output:
+            if text is None:
+                source_hash = get_file_hash(source)
+            else:
+                source_hash = hash_bytes(text.encode('utf-8'), 'md5')
+            header = generate_header([(source, source_hash)])
+        stream = io.StringIO()
+        write_sprites(stream, sprites, self.args, header)
+        return stream.getvalue()
+    
+    @property
+    def registry(self):
+        """The mod's sprite registry, brought up to date with the .gfx files."""
+        return get_registry(self.args)
+    
+    def conflicts(self, focus_ids: List[str], output: Optional[str] = None) -> Dict[str, List[Dict]]:
+        """Definitions of the sprites generated for focus_ids in .gfx files other than output."""
+        names = [name for focus_id in focus_ids for name in (f"GFX_{focus_id}", f"GFX_{focus_id}_shine")]
+        return self.registry.defined_in(names, exclude_path=output)
+
+
+def main(args):
+    """Main processing function."""
+    start_time = time.time()
+    
+    sources = expand_sources(args.source)
+    if not sources:
+        log_message(0, f"No source files match {args.source}", args)
         sys.exit(1)
     
-    # Create backup if needed
-    if not args.dry_run:
-        create_backup(args.output, args)
+    outputs = plan_outputs(sources, args)
     
-    # Calculate source hash for versioned output
-    source_hash = get_file_hash(args.source) if args.versioned_output else ""
+    # Check if we can overwrite output files
+    for output, _ in outputs:
+        if not check_overwrite(output, args):
+            sys.exit(1)
     
-    # Generate output content
-    output_lines = []
+    build(outputs, args, start_time)
     
-    if args.versioned_output:
-        output_lines.append(generate_header(args, source_hash))
+    if args.watch:
+        watch(args)
+
+
+def watch_state(args) -> Tuple[List[Tuple[str, List[str]]], Dict[str, Optional[Tuple[int, int]]], Optional[int]]:
+    """Snapshot the output plan, source/output stats and the icons directory mtime."""
+    def stat_key(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
     
-    output_lines.append('spriteTypes = {\n')
+    outputs = plan_outputs(expand_sources(args.source), args)
+    stats = {}
+    for output, sources in outputs:
+        stats[output] = stat_key(output)
+        for source in sources:
+            stats[source] = stat_key(source)
     
-    for focus_id in focus_ids:
-        # Find appropriate icon
-        icon_path, icon_found = find_icon_for_focus(focus_id, args, icon_report)
+    icons_stat = None
+    if args.mod_root and args.icons_path:
+        icons_stat = stat_key(os.path.join(args.mod_root, args.icons_path))
+    return outputs, stats, icons_stat
+
+
+def watch(args):
+    """Poll sources, the icons directory and outputs, rebuilding affected outputs on change.
+
+    Bursts of saves are debounced: a rebuild starts once nothing has changed
+    for one polling interval.  The interpreter, icon index and build cache
+    stay warm between rebuilds.
+    """
+    interval = args.watch_interval
+    if not args.quiet:
+        print(f"Watching {args.source} for changes (Ctrl+C to stop)", flush=True)
+    
+    state = watch_state(args)
+    try:
+        while True:
+            time.sleep(interval)
+            current = watch_state(args)
+            if current == state:
+                continue
+            
+            # Debounce: wait until the files stop changing
+            while True:
+                time.sleep(interval)
+                settled = watch_state(args)
+                if settled == current:
+                    break
+                current = settled
+            
+            start_time = time.time()
+            old_outputs, old_stats, old_icons = state
+            outputs, stats, icons = current
+            
+            if icons != old_icons:
+                _icon_indexes.clear()
+                affected = outputs
+            else:
+                old_plan = dict(old_outputs)
+                affected = [
+                    (output, sources) for output, sources in outputs
+                    if old_plan.get(output) != sources
+                    or any(stats[path] != old_stats.get(path) for path in [output] + sources)
+                ]
+            
+            if affected:
+                log_message(2, f"Change detected, rebuilding {len(affected)} output(s)", args)
+                try:
+                    build(affected, args, start_time)
+                except (SystemExit, Exception) as e:
+                    # A file saved mid-write or with a syntax error must not stop the watcher
+                    reason = '' if isinstance(e, SystemExit) else f": {e}"
+                    log_message(0, f"[{datetime.now().strftime('%H:%M:%S')}] Rebuild failed{reason}, "
+                                   f"waiting for the next change", args)
+                    state = watch_state(args)
+                    continue
+                if not args.quiet:
+                    print(f"[{datetime.now().strftime('%H:%M:%S')}] Rebuilt {', '.join(o for o, _ in affected)} "
+                          f"in {(time.time() - start_time) * 1000:.0f} ms", flush=True)
+            
+            # Snapshot after our own writes so they do not trigger another rebuild
+            state = watch_state(args)
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+
+
+def build(outputs: List[Tuple[str, List[str]]], args, start_time: float):
+    """Generate the given outputs from their sources and write reports."""
+    if not args.trace:
+        _build(outputs, args, start_time)
+        return
+    
+    tracer = tracing.Tracer()
+    previous = tracing.activate(tracer)
+    try:
+        with tracing.span('build', 'run', outputs=len(outputs)):
+            _build(outputs, args, start_time)
+    finally:
+        tracing.activate(previous)
+        tracer.export(args.trace, 'genfocusgfx')
+        log_message(2, f"Trace written to {args.trace} (open in chrome://tracing or ui.perfetto.dev)", args)
+
+
+def _build(outputs: List[Tuple[str, List[str]]], args, start_time: float):
+    sources = [source for _, output_sources in outputs for source in output_sources]
+    results = run_sources(sources, args)
+    
+    errors = [r['error'] for r in results.values() if r['error']]
+    for error in errors:
+        log_message(0, error, args)
+    if errors:
+        sys.exit(1)
+    
+    if args.check_textures:
+        with tracing.span('check_textures', 'phase'):
+            invalid = check_textures(results, args)
+        if invalid and args.strict:
+            log_message(0, f"{invalid} icons do not follow the goal-icon conventions", args)
+            sys.exit(1)
+    
+    total_focuses = 0
+    all_icon_report = new_icon_report()
+    metrics = new_metrics()
+    for result in results.values():
+        merge_metrics(metrics, result['metrics'])
+    
+    report_writer = None
+    if args.report and not args.dry_run:
+        try:
+            report_writer = ReportWriter(args, start_time)
+        except OSError as e:
+            log_message(0, f"Error writing report: {e}", args)
+            sys.exit(1)
+    
+    for output, output_sources in outputs:
+        header, sprites, icon_report = merge_results(output, [results[s] for s in output_sources], args)
+        focus_ids = [focus_id for focus_id, _ in sprites]
+        total_focuses += len(focus_ids)
+        for section, entries in icon_report.items():
+            all_icon_report[section].update(entries)
         
-        # Generate placeholder if requested and icon not found
-        if not icon_found and args.generate_placeholder and args.mod_root and args.icons_path:
-            new_icon_path = clone_default_image_as_placeholder(
-                focus_id, args.default_image, args.mod_root, args.icons_path, args
-            )
-            if new_icon_path:
-                icon_path = new_icon_path
-                icon_report['placeholders_created'][focus_id] = {
-                    'icon_path': new_icon_path,
-                    'source_image': args.default_image
-                }
-                log_message(2, f"Created placeholder for {focus_id} at {new_icon_path}", args)
+        if not focus_ids:
+            log_message(1, f"No focus definitions to write to {output}", args)
+            if args.strict:
+                sys.exit(1)
+            continue
         
-        # Format sprite definition
-        sprite_def = format_sprite(focus_id, icon_path, args)
-        output_lines.append(sprite_def)
+        if args.check_registry:
+            check_registry(output, focus_ids, args)
         
-        log_message(3, f"Processed focus: {focus_id} -> {icon_path}", args)
+        # Write output or show dry-run preview
+        if args.dry_run:
+            print("\n=== DRY RUN - No files will be written ===\n")
+            write_sprites(sys.stdout, sprites, args, header, limit=args.preview)
+            print(f"\nWould write {len(focus_ids)} focus definitions to {output}")
+        else:
+            previous_metrics = activate_metrics(metrics)
+            try:
+                with Timer(metrics, 'write', output=output):
+                    # Sprites are rendered into a temporary file that only replaces
+                    # the output (after backing it up) when the content changed
+                    writer = AtomicWriter(output, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE,
+                                          backup_path=None if args.no_backup else f"{output}.backup")
+                    with writer as f:
+                        write_sprites(f, sprites, args, header)
+                        size = f.tell()
+                
+                if writer.changed:
+                    count('bytes_written', size)
+                    if writer.backup_method:
+                        log_message(2, f"Created backup: {output}.backup ({writer.backup_method})", args)
+                    log_message(2, f"Successfully wrote {len(focus_ids)} focus definitions to {output}", args)
+                else:
+                    log_message(2, f"{output} is unchanged, not rewriting it", args)
+            except Exception as e:
+                log_message(0, f"Error writing output file: {e}", args)
+                sys.exit(1)
+            finally:
+                activate_metrics(previous_metrics)
+            
+            if report_writer:
+                with Timer(metrics, 'report', output=output):
+                    report_writer.add_output(output, sprites, icon_report)
+    
+    if not total_focuses:
+        if report_writer:
+            report_writer.close(all_icon_report, metrics)
+        return
     
-    output_lines.append('}\n')
+    icon_report = all_icon_report
+    found_count = len(icon_report['found_icons'])
+    missing_count = len(icon_report['missing_icons'])
     
-    # Write output or show dry-run preview
     if args.dry_run:
-        print("\n=== DRY RUN - No files will be written ===\n")
-        print(''.join(output_lines))
-        print(f"\nWould write {len(focus_ids)} focus definitions to {args.output}")
-        
         # Show icon statistics even in dry run
-        found_count = len(icon_report['found_icons'])
-        missing_count = len(icon_report['missing_icons'])
         print(f"\nIcon Statistics (dry run):")
         print(f"  Icons found: {found_count}")
         print(f"  Icons missing: {missing_count}")
@@ -793,37 +1993,35 @@ def main(args):
                 print(f"  - {focus_id}")
     else:
         try:
-            # Ensure output directory exists
-            os.makedirs(os.path.dirname(args.output) if os.path.dirname(args.output) else '.', exist_ok=True)
-            
-            with open(args.output, 'w', encoding='utf-8') as f:
-                f.writelines(output_lines)
-            
-            log_message(2, f"Successfully wrote {len(focus_ids)} focus definitions to {args.output}", args)
-            
             # Show icon statistics
-            found_count = len(icon_report['found_icons'])
-            missing_count = len(icon_report['missing_icons'])
             placeholder_count = len(icon_report['placeholders_created'])
             
             log_message(2, f"Icon Statistics:", args)
             log_message(2, f"  Icons found: {found_count}", args)
             log_message(2, f"  Icons missing: {missing_count}", args)
+            if args.check_textures:
+                log_message(2, f"  Invalid icons: {len(icon_report['invalid_icons'])}", args)
             if args.generate_placeholder:
-                log_message(2, f"  Placeholders created: {placeholder_count}", args)
+                bytes_saved = sum(info.get('bytes_saved', 0) for info in icon_report['placeholders_created'].values())
+                log_message(2, f"  Placeholders created: {placeholder_count} ({bytes_saved} bytes saved by linking)", args)
             
             # Log missing icons if any
             if missing_count > 0 and args.verbose >= 1:
                 log_message(1, f"Missing icons for {missing_count} focuses. Check report for details.", args)
             
             # Generate report if requested
-            if args.report:
-                report = generate_report(focus_ids, args, start_time, icon_report)
-                save_report(report, args)
+            if report_writer:
+                report_writer.close(icon_report, metrics)
                 log_message(2, f"Report saved to {args.report}", args)
+            
+            log_message(3, f"Phase timings:", args)
+            for phase, data in metrics['phases'].items():
+                log_message(3, f"  {phase}: {data['seconds'] * 1000:.2f} ms ({data['calls']} calls)", args)
+            for counter, value in metrics['counters'].items():
+                log_message(3, f"  {counter}: {value}", args)
                 
         except Exception as e:
-            log_message(0, f"Error writing output file: {e}", args)
+            log_message(0, f"Error writing report: {e}", args)
             sys.exit(1)
     
     # Final summary
@@ -845,6 +2043,7 @@ if __name__ == "__main__":
         parser.error("--mod-root is required when using --icons-path or --generate-placeholder")
     
     # Run main function
+    install_audit_hook()
     try:
         main(args)
     except KeyboardInterrupt:
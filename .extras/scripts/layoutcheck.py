@@ -0,0 +1,209 @@
+"""Find focuses that overlap in the focus tree layout.
+
+A focus is drawn at its ``x``/``y`` plus any ``offset`` blocks, relative to
+the focus named by ``relative_position_id`` if it has one.  Positions are
+resolved per tree by following those chains once, with every resolved
+position memoized, so each focus is visited a constant number of times;
+unknown ids and cycles in the chains are reported.  Offsets with a
+``trigger`` only apply in some games, so they are ignored unless
+--conditional-offsets is given.
+
+Overlaps are found with a spatial hash: each focus goes into the bucket of
+its grid cell and is only compared with the focuses in the surrounding
+cells, instead of with every other focus of the tree.  Two focuses overlap
+when they are less than OVERLAP_DISTANCE apart on both axes.  Mutually
+exclusive focuses may share a cell, and so may focuses of which one is on
+an optional branch (it or a prerequisite has ``allow_branch``), since those
+are usually alternatives for different DLCs or game rules; --all-branches
+reports them too.
+
+usage: layoutcheck.py [-h] [-m MOD_ROOT] [-j N] [--cache-dir PATH] [--no-cache]
+                      [--conditional-offsets] [--all-branches] [--json FILE] [-v] [-q] [tree ...]
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from focustrees import cache_path_for, load_trees
+from fsutil import log
+
+OVERLAP_DISTANCE = 1
+NEIGHBOURS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+
+def local_position(focus: Dict, conditional_offsets: bool = False) -> Tuple[float, float]:
+    """A focus's own x/y plus its offsets, before relative positioning."""
+    x, y = focus['x'] or 0, focus['y'] or 0
+    for offset in focus['offset']:
+        if conditional_offsets or not offset['conditional']:
+            x += offset['x']
+            y += offset['y']
+    return x, y
+
+
+def resolve_positions(focuses: Dict[str, Dict], conditional_offsets: bool = False
+                      ) -> Tuple[Dict[str, Tuple[float, float]], List[Dict]]:
+    """Return ({focus id: absolute position}, [problems]) for the focuses of one tree.
+
+    Chains of relative_position_id are walked up to the first focus with a
+    known position and unwound from there, so every focus is resolved once.
+    A focus positioned relative to an unknown focus or inside a cycle is
+    placed at its own coordinates.
+    """
+    positions = {}
+    problems = []
+    for start in focuses:
+        chain = []
+        on_chain = set()
+        focus_id = start
+        while focus_id not in positions:
+            focus = focuses[focus_id]
+            chain.append(focus_id)
+            on_chain.add(focus_id)
+            parent = focus['relative_position_id']
+            if parent is None:
+                break
+            if parent not in focuses:
+                problems.append({'type': 'unknown_relative_position', 'focus': focus_id, 'target': parent})
+                break
+            if parent in on_chain:
+                cycle = chain[chain.index(parent):]
+                problems.append({'type': 'relative_position_cycle', 'focus': focus_id, 'cycle': cycle})
+                break
+            focus_id = parent
+
+        # Unwind: the last focus of the chain is a root, is resolved already or ends a broken chain
+        base = positions.get(focus_id) if focus_id not in on_chain else None
+        for focus_id in reversed(chain):
+            x, y = local_position(focuses[focus_id], conditional_offsets)
+            if base is not None:
+                x, y = x + base[0], y + base[1]
+            positions[focus_id] = base = (x, y)
+    return positions, problems
+
+
+def optional_branches(focuses: Dict[str, Dict]) -> set:
+    """Ids of focuses that have allow_branch or require a focus that is optional."""
+    optional = {}
+    for start in focuses:
+        stack = [(start, False)]
+        while stack:
+            focus_id, expanded = stack.pop()
+            parents = [p for group in focuses[focus_id]['prerequisite'] for p in group if p in focuses]
+            if expanded:
+                optional[focus_id] = focuses[focus_id]['allow_branch'] or any(optional[p] for p in parents)
+            elif focus_id not in optional:
+                optional[focus_id] = False  # until resolved, so prerequisite cycles end here
+                stack.append((focus_id, True))
+                stack.extend((p, False) for p in parents if p not in optional)
+    return {focus_id for focus_id, is_optional in optional.items() if is_optional}
+
+
+def find_overlaps(positions: Dict[str, Tuple[float, float]], focuses: Dict[str, Dict],
+                  skip: Optional[set] = None) -> List[Dict]:
+    """Pairs of focuses closer than OVERLAP_DISTANCE on both axes, via a spatial hash.
+
+    Pairs with a focus in skip are not reported.
+    """
+    skip = skip or set()
+    buckets = {}
+    for focus_id, (x, y) in positions.items():
+        buckets.setdefault((int(x // OVERLAP_DISTANCE), int(y // OVERLAP_DISTANCE)), []).append(focus_id)
+
+    overlaps = []
+    for (bx, by), members in buckets.items():
+        for dx, dy in NEIGHBOURS:
+            others = buckets.get((bx + dx, by + dy))
+            if others is None or (dx, dy) < (0, 0):
+                continue  # each pair of cells is compared once
+            for i, a in enumerate(members):
+                ax, ay = positions[a]
+                for b in (members[i + 1:] if others is members else others):
+                    bx_, by_ = positions[b]
+                    if abs(ax - bx_) >= OVERLAP_DISTANCE or abs(ay - by_) >= OVERLAP_DISTANCE:
+                        continue
+                    if b in focuses[a]['mutually_exclusive'] or a in focuses[b]['mutually_exclusive']:
+                        continue
+                    if a in skip or b in skip:
+                        continue
+                    overlaps.append({'type': 'overlap', 'focus': a, 'other': b, 'position': [ax, ay]})
+    return overlaps
+
+
+def check_tree(tree: Dict, conditional_offsets: bool = False, all_branches: bool = False) -> List[Dict]:
+    """Layout problems of one tree, each with the file and line of the focus."""
+    focuses = tree['focuses']
+    positions, problems = resolve_positions(focuses, conditional_offsets)
+    problems.extend(find_overlaps(positions, focuses, None if all_branches else optional_branches(focuses)))
+    for problem in problems:
+        focus = focuses[problem['focus']]
+        problem['location'] = f"{focus['file']}:{focus['line']}"
+    return problems
+
+
+def describe(problem: Dict) -> str:
+    if problem['type'] == 'overlap':
+        x, y = problem['position']
+        return f"{problem['focus']} overlaps {problem['other']} at ({x:g}, {y:g})"
+    if problem['type'] == 'unknown_relative_position':
+        return f"{problem['focus']} is positioned relative to unknown focus {problem['target']}"
+    return f"{problem['focus']} is in a relative_position_id cycle: {' -> '.join(problem['cycle'])}"
+
+
+def run(args) -> int:
+    start = time.perf_counter()
+    cache_path = '' if args.no_cache else cache_path_for(args.mod_root, args.cache_dir)
+    trees, errors = load_trees(args.mod_root, cache_path, args.jobs)
+    for error in errors:
+        log(f"WARNING: {error}", args, 0)
+    if args.trees:
+        trees = [tree for tree in trees if tree['id'] in args.trees]
+
+    report = {}
+    focus_count = 0
+    for tree in trees:
+        focus_count += len(tree['focuses'])
+        problems = check_tree(tree, args.conditional_offsets, args.all_branches)
+        if problems:
+            report[tree['id']] = problems
+            log(f"{tree['id']} ({tree['file']}): {len(problems)} problems", args)
+            for problem in problems:
+                log(f"  {problem['location']}: {describe(problem)}", args)
+        else:
+            log(f"{tree['id']}: ok", args, 2)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    total = sum(len(problems) for problems in report.values())
+    log(f"{len(trees)} trees, {focus_count} focuses checked in {time.perf_counter() - start:.2f}s: "
+        f"{total} problems in {len(report)} trees", args, 0 if total else 1)
+    return 1 if total or errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='layoutcheck',
+        description='Report overlapping focuses and broken relative positions in focus trees.'
+    )
+    parser.add_argument('trees', nargs='*', metavar='tree', help='Focus tree ids to check (default: all)')
+    parser.add_argument('-m', '--mod-root', default='.', help='Mod root folder (default: %(default)s)')
+    parser.add_argument('-j', '--jobs', type=int, metavar='N', help='Worker processes for parsing')
+    parser.add_argument('--cache-dir', metavar='PATH', help='Directory for the focus tree cache')
+    parser.add_argument('--no-cache', action='store_true', help='Re-read every focus file')
+    parser.add_argument('--conditional-offsets', action='store_true',
+                        help='Also apply offsets that have a trigger')
+    parser.add_argument('--all-branches', action='store_true',
+                        help='Also report overlaps with focuses on optional (allow_branch) branches')
+    parser.add_argument('--json', metavar='FILE', help='Also write the problems per tree to FILE as JSON')
+    parser.add_argument('-v', '--verbose', action='count', default=0, help='More output (-v lists clean trees)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Only print errors')
+    args = parser.parse_args()
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
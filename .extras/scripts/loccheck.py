@@ -0,0 +1,307 @@
+"""Check that every focus has localisation and optionally add stubs.
+
+Every focus in common/national_focus and common/continuous_focus needs a
+``<id>`` and an ``<id>_desc`` key in the chosen language.  All .yml files
+under the mod's localisation folder (localisation/replace included) and,
+with --game-root, the game's are indexed into one key -> definition map.
+Files are parsed in parallel and their keys cached by mtime and size under
+.extras/.cache, as are the focus ids of each focus file, so a re-check only
+reads what changed.
+
+Reported are missing keys per focus file and orphaned keys: ``<key>`` /
+``<key>_desc`` pairs in the mod's focus localisation files (files with
+"focus" in their name) that no focus uses any more.
+
+With --add-stubs, missing keys are appended to the yml file that already
+holds most of the tree's keys, else to ``<TAG>_l_<lang>.yml`` or
+``RJ_<TAG>_l_<lang>.yml`` of the focus's country tag, else a new
+``<TAG>_l_<lang>.yml`` is created.  Files keep (or get) the UTF-8 BOM the
+game requires.  --add-stubs needs --game-root: without the game's keys
+every focus of a vanilla tree looks missing, and stubs for them would
+shadow the game's localisation.
+
+usage: loccheck.py [-h] [-m MOD_ROOT] [-g GAME_ROOT] [-l LANG] [-j N]
+                   [--add-stubs] [--dry-run] [--no-orphans] [-v] [-q]
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from fsutil import AtomicWriter, cache_file, log
+from pdxscript import ScriptError, iter_focus_file
+
+FOCUS_PATTERNS = ('common/national_focus/*.txt', 'common/continuous_focus/*.txt')
+LOC_PATTERN = 'localisation/**/*.yml'
+CACHE_VERSION = 1
+
+BOM = b'\xef\xbb\xbf'
+_HEADER_RE = re.compile(r'^l_([a-z_]+):')
+_KEY_RE = re.compile(r'^[ \t]*([^\s:#"]+):[0-9]*[ \t]*"')
+_TAG_RE = re.compile(r'^(?:RJ_)?([A-Z][A-Z0-9]{2})_')
+
+
+def scan_loc_file(path: str) -> Tuple[str, Optional[str], Dict[str, int], Optional[str]]:
+    """Return (path, language, {key: line}, error) for a localisation file. Runs in a worker."""
+    language = None
+    keys = {}
+    try:
+        with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+            for line_no, line in enumerate(f, 1):
+                if language is None:
+                    m = _HEADER_RE.match(line)
+                    if m:
+                        language = m.group(1)
+                        continue
+                m = _KEY_RE.match(line)
+                if m:
+                    keys.setdefault(m.group(1), line_no)
+    except OSError as e:
+        return path, None, {}, str(e)
+    return path, language, keys, None
+
+
+def scan_focus_file(path: str) -> Tuple[str, List[Tuple[str, Optional[str], int]], Optional[str]]:
+    """Return (path, [(focus id, tree id, line)], error) for a focus file. Runs in a worker."""
+    focuses = []
+    try:
+        for record in iter_focus_file(path):
+            if record['kind'] in ('focus', 'shared_focus', 'joint_focus') and record['id']:
+                focuses.append((record['id'], record['tree'], record['line']))
+    except (OSError, ScriptError) as e:
+        return path, [], str(e)
+    return path, focuses, None
+
+
+class Scanner:
+    """Runs a scan function over files, reusing cached results of unchanged files."""
+
+    def __init__(self, cache: Dict, jobs: Optional[int]):
+        self.cache = cache
+        self.jobs = jobs
+        self.scanned = 0
+
+    def run(self, section: str, paths: List[str], func) -> Dict[str, tuple]:
+        entries = self.cache.setdefault(section, {})
+        results = {}
+        stale = []
+        for path in paths:
+            st = os.stat(path)
+            entry = entries.get(path)
+            if entry and entry['stat'] == [st.st_mtime_ns, st.st_size]:
+                results[path] = tuple(entry['result'])
+            else:
+                stale.append((path, [st.st_mtime_ns, st.st_size]))
+
+        jobs = self.jobs or min(len(stale), os.cpu_count() or 1)
+        if jobs > 1 and len(stale) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                fresh = list(executor.map(func, [path for path, _ in stale], chunksize=4))
+        else:
+            fresh = [func(path) for path, _ in stale]
+
+        for (path, stat), result in zip(stale, fresh):
+            results[path] = result
+            if result[-1] is None:  # no error
+                entries[path] = {'stat': stat, 'result': list(result)}
+        for path in [p for p in entries if p not in results]:
+            del entries[path]
+        self.scanned += len(stale)
+        return {path: results[path] for path in paths}
+
+
+def cache_path_for(mod_root: str, args) -> str:
+    return cache_file('loccheck', mod_root, '.json', args.cache_dir)
+
+
+def load_cache(path: str) -> Dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if cache.get('version') == CACHE_VERSION else {}
+
+
+def save_cache(path: str, cache: Dict):
+    cache['version'] = CACHE_VERSION
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with AtomicWriter(path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, separators=(',', ':'))
+
+
+def build_loc_index(scanned: Dict[str, tuple], language: str) -> Dict[str, Tuple[str, int]]:
+    """Map every key of the language to its first (file, line) definition."""
+    index = {}
+    for path, (_, file_language, keys, _) in scanned.items():
+        if file_language == language:
+            for key, line in keys.items():
+                index.setdefault(key, (path, line))
+    return index
+
+
+def country_tag(focus_id: str) -> Optional[str]:
+    m = _TAG_RE.match(focus_id)
+    return m.group(1) if m else None
+
+
+def stub_title(focus_id: str) -> str:
+    """USA_the_new_deal -> The New Deal"""
+    tag = country_tag(focus_id)
+    name = focus_id[focus_id.index(tag) + len(tag) + 1:] if tag else focus_id
+    return name.replace('_', ' ').strip().title() or focus_id
+
+
+def stub_target(tree_keys: List[str], focus_id: str, mod_index: Dict[str, Tuple[str, int]],
+                loc_dir: str, language: str) -> str:
+    """Choose the yml file a focus's stub keys go to."""
+    counts = {}
+    for key in tree_keys:
+        if key in mod_index:
+            path = mod_index[key][0]
+            counts[path] = counts.get(path, 0) + 1
+    if counts:
+        return max(counts, key=counts.get)
+
+    tag = country_tag(focus_id) or 'RJ'
+    for name in (f"{tag}_l_{language}.yml", f"RJ_{tag}_l_{language}.yml"):
+        path = os.path.join(loc_dir, name)
+        if os.path.exists(path):
+            return path
+    return os.path.join(loc_dir, f"{tag}_l_{language}.yml")
+
+
+def append_stubs(path: str, keys: List[str], language: str):
+    """Append ``key:0 "..."`` lines to a yml file, keeping or adding its UTF-8 BOM."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        data = BOM + f"l_{language}:\n".encode('utf-8')
+    if not data.startswith(BOM):
+        data = BOM + data
+    if not data.endswith(b'\n'):
+        data += b'\n'
+
+    lines = []
+    for key in keys:
+        text = '' if key.endswith('_desc') else stub_title(key)
+        lines.append(f' {key}:0 "{text}"\n')
+    with AtomicWriter(path, 'wb') as f:
+        f.write(data)
+        f.write(''.join(lines).encode('utf-8'))
+
+
+def run(args) -> int:
+    mod_root = args.mod_root
+    cache_path = cache_path_for(mod_root, args)
+    cache = {} if args.no_cache else load_cache(cache_path)
+    scanner = Scanner(cache, args.jobs)
+
+    focus_paths = sorted(p for pattern in FOCUS_PATTERNS for p in glob.glob(os.path.join(mod_root, pattern)))
+    mod_loc = sorted(glob.glob(os.path.join(mod_root, LOC_PATTERN), recursive=True))
+    game_loc = sorted(glob.glob(os.path.join(args.game_root, LOC_PATTERN), recursive=True)) if args.game_root else []
+
+    focus_files = scanner.run('focus', focus_paths, scan_focus_file)
+    mod_files = scanner.run('loc', mod_loc, scan_loc_file)
+    game_files = scanner.run('game_loc', game_loc, scan_loc_file) if args.game_root else {}
+    if not args.no_cache and scanner.scanned:
+        save_cache(cache_path, cache)
+
+    errors = [r[-1] for r in list(focus_files.values()) + list(mod_files.values()) + list(game_files.values())
+              if r[-1]]
+    for error in errors:
+        log(f"ERROR: {error}", args, 0)
+    if errors:
+        return 1
+
+    mod_index = build_loc_index(mod_files, args.language)
+    index = dict(build_loc_index(game_files, args.language))
+    index.update(mod_index)  # mod keys override the game's
+    log(f"Indexed {len(index)} {args.language} keys from {len(mod_files) + len(game_files)} files "
+        f"({scanner.scanned} re-read)", args, 2)
+
+    # Missing keys, per focus file
+    focus_ids = set()
+    missing = {}  # path -> [(focus id, tree, line, [missing keys])]
+    trees = {}  # tree id -> [keys of its focuses]
+    for path, (_, focuses, _) in focus_files.items():
+        for focus_id, tree, line in focuses:
+            focus_ids.add(focus_id)
+            keys = [focus_id, f"{focus_id}_desc"]
+            trees.setdefault(tree or path, []).extend(keys)
+            absent = [key for key in keys if key not in index]
+            if absent:
+                missing.setdefault(path, []).append((focus_id, tree or path, line, absent))
+
+    missing_count = sum(len(entry[3]) for entries in missing.values() for entry in entries)
+    for path, entries in missing.items():
+        log(f"{os.path.relpath(path, mod_root)}: {sum(len(e[3]) for e in entries)} missing keys", args)
+        for focus_id, _, line, absent in entries:
+            log(f"  line {line}: {focus_id}: {', '.join(absent)}", args, 2)
+
+    # Orphaned name/_desc pairs in focus localisation files
+    orphans = []
+    if not args.no_orphans:
+        for path, (_, language, keys, _) in mod_files.items():
+            if language != args.language or 'focus' not in os.path.basename(path).lower():
+                continue
+            for key, line in keys.items():
+                if key.endswith('_desc') and key[:-5] in keys and key[:-5] not in focus_ids:
+                    orphans.append((path, keys[key[:-5]], key[:-5]))
+        for path, line, key in sorted(orphans):
+            log(f"{os.path.relpath(path, mod_root)}:{line}: {key} is not used by any focus", args)
+
+    log(f"{missing_count} missing keys for {len(focus_ids)} focuses, {len(orphans)} orphaned keys", args)
+
+    if args.add_stubs and missing:
+        loc_dir = os.path.join(mod_root, 'localisation', args.language)
+        stubs = {}
+        targets = {}  # (tree, tag) -> file
+        for entries in missing.values():
+            for focus_id, tree, _, absent in entries:
+                key = (tree, country_tag(focus_id))
+                if key not in targets:
+                    targets[key] = stub_target(trees[tree], focus_id, mod_index, loc_dir, args.language)
+                stubs.setdefault(targets[key], []).extend(absent)
+        for target, keys in sorted(stubs.items()):
+            log(f"{'Would add' if args.dry_run else 'Adding'} {len(keys)} stubs to "
+                f"{os.path.relpath(target, mod_root)}", args)
+            if not args.dry_run:
+                append_stubs(target, keys, args.language)
+        return 1 if orphans else 0
+
+    return 1 if missing_count or orphans else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='loccheck',
+        description='Report focuses without localisation keys and orphaned focus keys.'
+    )
+    parser.add_argument('-m', '--mod-root', default='.', help='Mod root folder (default: %(default)s)')
+    parser.add_argument('-g', '--game-root', help='HOI4 installation; its localisation counts as defined')
+    parser.add_argument('-l', '--language', default='english', help='Language to check (default: %(default)s)')
+    parser.add_argument('-j', '--jobs', type=int, metavar='N', help='Worker processes for parsing')
+    parser.add_argument('--cache-dir', metavar='PATH', help='Directory for the key index cache')
+    parser.add_argument('--no-cache', action='store_true', help='Re-read every file')
+    parser.add_argument('--add-stubs', action='store_true', help='Append stub keys for missing localisation')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='With --add-stubs, only show what would change')
+    parser.add_argument('--no-orphans', action='store_true', help='Do not report orphaned keys')
+    parser.add_argument('-v', '--verbose', action='count', default=0, help='More output (-v lists every key)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Only print errors')
+    args = parser.parse_args()
+    if args.add_stubs and not args.game_root:
+        parser.error("--add-stubs requires --game-root, or stubs would shadow the game's localisation")
+    if args.game_root and not os.path.isdir(os.path.join(args.game_root, 'localisation')):
+        parser.error(f"{args.game_root} has no localisation folder")
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""Package the mod as a zip archive and register it with the HOI4 launcher.
+
+Every file under the mod root except EXCLUDE_PATTERNS (.extras/, .git*,
+backups and editor leftovers) goes into the archive; in a git checkout the
+file list comes from ``git ls-files``, so anything .gitignore'd is left out
+too.  Files are hashed and deflated in a process pool; each compressed blob is stored under
+.extras/.cache by content hash and deflate level, and a manifest maps
+every file's path, size and mtime to its hash.  A rebuild only reads files whose size or
+mtime changed and only compresses content that has no blob yet, then
+streams the blobs into the archive.  Entries are sorted and carry a fixed
+timestamp, so unchanged content gives a byte-identical archive that is not
+rewritten.
+
+With --install (or --launcher-dir), ``<launcher>/mod/<name>.mod`` is written
+from descriptor.mod plus a ``path=`` line pointing at the mod root, or an
+``archive=`` line pointing at the archive with --use-archive.  This replaces
+genmod.sh.
+
+usage: modpack.py [-h] [-m MOD_ROOT] [-o ARCHIVE] [--no-archive] [--install]
+                  [--launcher-dir DIR] [--use-archive] [--name NAME] [-x PATTERN]
+                  [-j N] [-l LEVEL] [--cache-dir PATH] [--force] [-v] [-q]
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import time
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fsutil import DEFAULT_CACHE_DIR, AtomicWriter, cache_file, hash_bytes, log
+
+DEFAULT_DIST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'dist')
+EXCLUDE_PATTERNS = ('.extras', '.git*', '*.backup', '*.bak', '*.orig', '*.tmp', '*~', '__pycache__', '*.py[cod]')
+DESCRIPTOR = 'descriptor.mod'
+DEFAULT_NAME = 'Rejuvinated'  # what genmod.sh named the launcher descriptor
+MANIFEST_VERSION = 1
+DEFAULT_LEVEL = 6
+
+# Zip format constants
+_DEFLATED = 8
+_STORED = 0
+_ZIP_TIME, _ZIP_DATE = 0, (1980 - 1980) << 9 | 1 << 5 | 1  # 1980-01-01 00:00, for reproducible archives
+_UTF8_FLAG = 0x800
+_ZIP32_LIMIT = 0xFFFFFFFF
+
+
+def default_launcher_dir() -> str:
+    """The HOI4 user directory that holds the launcher's mod/ folder."""
+    if sys.platform.startswith('linux'):
+        base = os.path.join(os.path.expanduser('~'), '.local', 'share')
+    else:
+        base = os.path.join(os.path.expanduser('~'), 'Documents')
+    return os.path.join(base, 'Paradox Interactive', 'Hearts of Iron IV')
+
+
+def excluded(relpath: str, patterns: Sequence[str]) -> bool:
+    """True if the path or one of its folders matches an exclude pattern."""
+    return any(fnmatch.fnmatch(part, pattern) for part in relpath.split('/') for pattern in patterns)
+
+
+def git_files(mod_root: str) -> Optional[List[str]]:
+    """Tracked and untracked-but-not-ignored files under the mod root, or None outside a git checkout."""
+    try:
+        result = subprocess.run(['git', 'ls-files', '-z', '--cached', '--others', '--exclude-standard'],
+                                cwd=mod_root, capture_output=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    paths = result.stdout.decode('utf-8', 'surrogateescape').split('\0')
+    # --cached still lists tracked files that were deleted from the work tree
+    return [path for path in paths if path and os.path.isfile(os.path.join(mod_root, path))]
+
+
+def discover(mod_root: str, patterns: Sequence[str], skip: Sequence[str] = ()) -> List[str]:
+    """Mod-relative paths of all files to package, sorted."""
+    skip = {os.path.abspath(path) for path in skip}
+    tracked = git_files(mod_root)
+    if tracked is not None:
+        return sorted(path for path in set(tracked)
+                      if not excluded(path, patterns) and os.path.abspath(os.path.join(mod_root, path)) not in skip)
+
+    found = []
+    for folder, dirs, files in os.walk(mod_root):
+        rel_folder = os.path.relpath(folder, mod_root).replace('\\', '/')
+        rel_folder = '' if rel_folder == '.' else f"{rel_folder}/"
+        dirs[:] = [d for d in dirs if not excluded(d, patterns)]
+        for name in files:
+            path = os.path.join(folder, name)
+            if not excluded(name, patterns) and os.path.abspath(path) not in skip:
+                found.append(rel_folder + name)
+    return sorted(found)
+
+
+def compress_file(path: str, blob_dir: str, level: int) -> Dict:
+    """Hash a file and store its compressed blob unless one exists. Runs in a worker."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    digest = hash_bytes(data)
+    entry = {'hash': digest, 'crc': zlib.crc32(data), 'size': len(data)}
+    for method, blob in ((_DEFLATED, f"{digest}-{level}.z"), (_STORED, f"{digest}.raw")):
+        if os.path.exists(os.path.join(blob_dir, blob)):
+            entry.update(method=method, blob=blob, csize=os.path.getsize(os.path.join(blob_dir, blob)),
+                         compressed=False)
+            return entry
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    packed = compressor.compress(data) + compressor.flush()
+    method, blob = _DEFLATED, f"{digest}-{level}.z"
+    if len(packed) >= len(data):  # already compressed (png, ogg, ...)
+        packed, method, blob = data, _STORED, f"{digest}.raw"
+    tmp = os.path.join(blob_dir, f"{blob}.{os.getpid()}.tmp")
+    with open(tmp, 'wb') as f:
+        f.write(packed)
+    os.replace(tmp, os.path.join(blob_dir, blob))
+    entry.update(method=method, blob=blob, csize=len(packed), compressed=True)
+    return entry
+
+
+def load_manifest(path: str) -> Dict[str, Dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest.get('files', {}) if manifest.get('version') == MANIFEST_VERSION else {}
+
+
+def save_manifest(path: str, files: Dict[str, Dict]):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with AtomicWriter(path, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'files': files}, f, separators=(',', ':'))
+
+
+def write_zip(stream, entries: List[Tuple[str, Dict]], blob_dir: str):
+    """Write a zip archive of precompressed blobs, in the given order."""
+    central = []
+    offset = 0
+    for name, entry in entries:
+        encoded = name.encode('utf-8')
+        if offset > _ZIP32_LIMIT or entry['size'] > _ZIP32_LIMIT:
+            raise ValueError(f"{name}: archive too large for a zip without zip64")
+        fields = (20, _UTF8_FLAG, entry['method'], _ZIP_TIME, _ZIP_DATE,
+                  entry['crc'], entry['csize'], entry['size'], len(encoded))
+        header = struct.pack('<IHHHHHIIIHH', 0x04034b50, *fields, 0)
+        stream.write(header)
+        stream.write(encoded)
+        with open(os.path.join(blob_dir, entry['blob']), 'rb') as blob:
+            shutil.copyfileobj(blob, stream, 1 << 20)
+        central.append(struct.pack('<IH', 0x02014b50, 20) + struct.pack('<HHHHHIIIHHHHHII', *fields, 0, 0, 0, 0, 0,
+                                                                        offset) + encoded)
+        offset += len(header) + len(encoded) + entry['csize']
+
+    if len(central) > 0xFFFF or offset > _ZIP32_LIMIT:
+        raise ValueError("archive too large for a zip without zip64")
+    size = 0
+    for record in central:
+        stream.write(record)
+        size += len(record)
+    stream.write(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, len(central), len(central), size, offset, 0))
+
+
+def build_archive(mod_root: str, archive: str, files: List[str], cache_dir: str, jobs: Optional[int] = None,
+                  level: int = DEFAULT_LEVEL, force: bool = False) -> Dict:
+    """Compress changed files and write the archive; returns build statistics."""
+    manifest_path = cache_file('modpack', mod_root, '.json', cache_dir)
+    blob_dir = os.path.join(cache_dir, 'modpack-blobs')
+    os.makedirs(blob_dir, exist_ok=True)
+    manifest = {} if force else load_manifest(manifest_path)
+
+    entries = {}
+    stale = []
+    for relpath in files:
+        st = os.stat(os.path.join(mod_root, relpath))
+        entry = manifest.get(relpath)
+        if (entry and entry['stat'] == [st.st_mtime_ns, st.st_size]
+                and entry['blob'] in (f"{entry['hash']}-{level}.z", f"{entry['hash']}.raw")
+                and os.path.exists(os.path.join(blob_dir, entry['blob']))):
+            entries[relpath] = entry
+        else:
+            stale.append((relpath, [st.st_mtime_ns, st.st_size]))
+
+    jobs = jobs or min(len(stale), os.cpu_count() or 1)
+    paths = [os.path.join(mod_root, relpath) for relpath, _ in stale]
+    if jobs > 1 and len(stale) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            fresh = list(executor.map(compress_file, paths, [blob_dir] * len(paths), [level] * len(paths),
+                                      chunksize=16))
+    else:
+        fresh = [compress_file(path, blob_dir, level) for path in paths]
+    compressed = 0
+    for (relpath, stat), entry in zip(stale, fresh):
+        compressed += entry.pop('compressed')
+        entries[relpath] = dict(entry, stat=stat)
+
+    os.makedirs(os.path.dirname(os.path.abspath(archive)), exist_ok=True)
+    writer = AtomicWriter(archive, 'wb')
+    with writer as stream:
+        write_zip(stream, [(relpath, entries[relpath]) for relpath in files], blob_dir)
+    save_manifest(manifest_path, entries)
+
+    # Drop blobs of content no longer packaged by this or any other manifest
+    live = set()
+    for manifest_name in os.listdir(cache_dir):
+        if manifest_name.startswith('modpack-') and manifest_name.endswith('.json'):
+            live.update(e['blob'] for e in load_manifest(os.path.join(cache_dir, manifest_name)).values())
+    removed = 0
+    for blob in os.listdir(blob_dir):
+        if blob not in live:
+            os.remove(os.path.join(blob_dir, blob))
+            removed += 1
+
+    return {'files': len(files), 'read': len(stale), 'compressed': compressed, 'pruned': removed,
+            'size': sum(e['size'] for e in entries.values()), 'archive_size': os.path.getsize(archive),
+            'changed': writer.changed}
+
+
+def write_descriptor(mod_root: str, launcher_dir: str, name: str, archive: Optional[str] = None) -> Tuple[str, bool]:
+    """Write <launcher_dir>/mod/<name>.mod for the mod folder (or archive); returns (path, changed)."""
+    with open(os.path.join(mod_root, DESCRIPTOR), 'r', encoding='utf-8-sig') as f:
+        lines = [line.rstrip('\r\n') for line in f]
+    lines = [line for line in lines if not line.lstrip().startswith(('path=', 'path =', 'archive=', 'archive ='))]
+    while lines and not lines[-1].strip():
+        lines.pop()
+    if archive:
+        lines.append(f'archive="{os.path.abspath(archive)}"'.replace('\\', '/'))
+    else:
+        lines.append(f'path="{os.path.abspath(mod_root)}"'.replace('\\', '/'))
+
+    path = os.path.join(launcher_dir, 'mod', f"{name}.mod")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    writer = AtomicWriter(path, 'w', encoding='utf-8', newline='\n')
+    with writer as f:
+        f.write('\n'.join(lines) + '\n')
+    return path, writer.changed
+
+
+def run(args) -> int:
+    start = time.perf_counter()
+    mod_root = os.path.abspath(args.mod_root)
+    if not os.path.isfile(os.path.join(mod_root, DESCRIPTOR)):
+        log(f"ERROR: {mod_root} has no {DESCRIPTOR}", args, 0)
+        return 2
+    name = args.name
+    archive = args.output or os.path.join(DEFAULT_DIST_DIR, f"{name}.zip")
+
+    if not args.no_archive:
+        files = discover(mod_root, EXCLUDE_PATTERNS + tuple(args.exclude), skip=[archive])
+        log(f"Packaging {len(files)} files from {mod_root}", args, 2)
+        stats = build_archive(mod_root, archive, files, args.cache_dir or DEFAULT_CACHE_DIR, args.jobs,
+                              args.level, args.force)
+        log(f"{'Wrote' if stats['changed'] else 'Unchanged'} {archive}: {stats['files']} files, "
+            f"{stats['size'] / 2**20:.1f} MiB -> {stats['archive_size'] / 2**20:.1f} MiB "
+            f"({stats['read']} read, {stats['compressed']} compressed, {stats['pruned']} stale blobs removed) "
+            f"in {time.perf_counter() - start:.2f}s", args)
+
+    if args.install or args.launcher_dir:
+        if args.use_archive and args.no_archive and not os.path.exists(archive):
+            log(f"ERROR: {archive} does not exist", args, 0)
+            return 2
+        path, changed = write_descriptor(mod_root, args.launcher_dir or default_launcher_dir(), name,
+                                         archive if args.use_archive else None)
+        log(f"{'Wrote' if changed else 'Unchanged'} {path}", args)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='modpack',
+        description='Build a zip of the mod and write its .mod descriptor for the launcher.'
+    )
+    parser.add_argument('-m', '--mod-root', default='.', help='Mod root folder (default: %(default)s)')
+    parser.add_argument('-o', '--output', metavar='ARCHIVE', help='Archive to write (default: .extras/dist/<name>.zip)')
+    parser.add_argument('--no-archive', action='store_true', help='Do not build the archive')
+    parser.add_argument('--install', action='store_true', help='Write the .mod descriptor into the launcher folder')
+    parser.add_argument('--launcher-dir', metavar='DIR',
+                        help='HOI4 user folder holding mod/ (implies --install; default: the platform\'s)')
+    parser.add_argument('--use-archive', action='store_true',
+                        help='Point the .mod descriptor at the archive instead of the mod folder')
+    parser.add_argument('--name', default=DEFAULT_NAME,
+                        help='Name of the archive and .mod file (default: %(default)s)')
+    parser.add_argument('-x', '--exclude', action='append', default=[], metavar='PATTERN',
+                        help='Also leave out files or folders matching PATTERN (repeatable)')
+    parser.add_argument('-j', '--jobs', type=int, metavar='N', help='Worker processes for compression')
+    parser.add_argument('-l', '--level', type=int, default=DEFAULT_LEVEL, choices=range(0, 10), metavar='LEVEL',
+                        help='Deflate level 0-9 (default: %(default)s)')
+    parser.add_argument('--cache-dir', metavar='PATH', help='Directory for the manifest and compressed blobs')
+    parser.add_argument('--force', action='store_true', help='Ignore the manifest and re-read every file')
+    parser.add_argument('-v', '--verbose', action='count', default=0, help='More output')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Only print errors')
+    args = parser.parse_args()
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
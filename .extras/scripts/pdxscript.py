@@ -0,0 +1,445 @@
+"""Streaming tokenizer and parser for Clausewitz (Paradox) script files.
+
+The tokenizer works line by line over an open text stream, so memory stays
+bounded by the longest line rather than the size of the file.  On top of it
+sit a small recursive parser for materializing blocks and an extractor that
+yields focus records lazily from focus tree files.
+"""
+
+import io
+import os
+import re
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+# Token kinds
+WORD = 'word'
+STRING = 'string'
+OP = 'op'
+LBRACE = '{'
+RBRACE = '}'
+
+Token = Tuple[str, str, int, int]  # (kind, value, line, column)
+Source = Union[str, os.PathLike, io.TextIOBase]
+
+_TOKEN_RE = re.compile(r'''
+    (?P<ws>\s+)
+  | (?P<comment>\#.*)
+  | (?P<string>"(?:[^"\\]|\\.)*")
+  | (?P<open_string>"(?:[^"\\]|\\.)*$)
+  | (?P<op>[<>!?]=|[<>=])
+  | (?P<brace>[{}])
+  | (?P<word>(?:[^\s{}="\#<>!?]|[!?](?!=))+)
+''', re.VERBOSE)
+
+_STRING_END_RE = re.compile(r'(?:[^"\\]|\\.)*"')
+
+FOCUS_KINDS = ('focus', 'shared_focus', 'joint_focus')
+TREE_KINDS = ('focus_tree', 'continuous_focus_palette')
+
+
+class ScriptError(ValueError):
+    """Raised on malformed script input."""
+
+    def __init__(self, message: str, line: int = 0, filename: Optional[str] = None):
+        location = filename or '<script>'
+        if line:
+            location += f":{line}"
+        super().__init__(f"{location}: {message}")
+        self.line = line
+        self.filename = filename
+
+
+def open_script(path, encoding: str = 'utf-8-sig'):
+    """Open a script file for tokenizing, tolerating stray non-UTF-8 bytes."""
+    return open(path, 'r', encoding=encoding, errors='replace')
+
+
+def tokenize(stream) -> Iterator[Token]:
+    """Yield (kind, value, line, column) tokens from a text stream.
+
+    Comments are dropped, quoted strings are unquoted (kind STRING) and
+    strings that run over a line break are joined back together.
+    """
+    pending = None  # (parts, line, column) of a string spanning lines
+    for line_no, line in enumerate(stream, 1):
+        pos = 0
+        if pending is not None:
+            m = _STRING_END_RE.match(line)
+            if not m:
+                pending[0].append(line)
+                continue
+            parts, start_line, start_col = pending
+            parts.append(m.group()[:-1])
+            yield STRING, ''.join(parts), start_line, start_col
+            pending = None
+            pos = m.end()
+
+        for m in _TOKEN_RE.finditer(line, pos):
+            kind = m.lastgroup
+            if kind == 'ws' or kind == 'comment':
+                continue
+            col = m.start() + 1
+            if kind == 'word':
+                yield WORD, m.group(), line_no, col
+            elif kind == 'brace':
+                yield m.group(), m.group(), line_no, col
+            elif kind == 'string':
+                yield STRING, m.group()[1:-1], line_no, col
+            elif kind == 'op':
+                yield OP, m.group(), line_no, col
+            else:  # open_string
+                pending = ([m.group()[1:]], line_no, col)
+
+    if pending is not None:
+        raise ScriptError("Unterminated string", pending[1])
+
+
+class TokenStream:
+    """Token iterator with single-token lookahead."""
+
+    __slots__ = ('_tokens', '_peeked', 'filename')
+
+    def __init__(self, tokens: Iterator[Token], filename: Optional[str] = None):
+        self._tokens = tokens
+        self._peeked = None
+        self.filename = filename
+
+    def peek(self) -> Optional[Token]:
+        if self._peeked is None:
+            self._peeked = next(self._tokens, None)
+        return self._peeked
+
+    def next(self) -> Optional[Token]:
+        if self._peeked is not None:
+            tok, self._peeked = self._peeked, None
+            return tok
+        return next(self._tokens, None)
+
+    def error(self, message: str, tok: Optional[Token] = None) -> ScriptError:
+        return ScriptError(message, tok[2] if tok else 0, self.filename)
+
+
+def token_stream(source: Source) -> Tuple[TokenStream, Optional[io.TextIOBase]]:
+    """Create a TokenStream for a path or an open text stream.
+
+    Returns the stream and the file handle the caller must close (or None).
+    """
+    if isinstance(source, (str, os.PathLike)):
+        f = open_script(source)
+        return TokenStream(tokenize(f), os.fspath(source)), f
+    return TokenStream(tokenize(source), getattr(source, 'name', None)), None
+
+
+def read_statement(ts: TokenStream) -> Optional[Tuple[Optional[str], Optional[str], Token]]:
+    """Read the head of one statement.
+
+    Returns (key, op, value_token) for ``key op value`` statements, or
+    (None, None, token) for a bare value.  Returns None at the end of the
+    enclosing block (the closing brace is consumed) or at end of input.
+    """
+    tok = ts.next()
+    if tok is None or tok[0] == RBRACE:
+        return None
+    nxt = ts.peek()
+    if tok[0] in (WORD, STRING) and nxt is not None and nxt[0] == OP:
+        ts.next()
+        value = ts.next()
+        if value is None:
+            raise ts.error(f"Missing value after '{tok[1]} {nxt[1]}'", nxt)
+        if value[0] in (OP, RBRACE):
+            raise ts.error(f"Unexpected '{value[1]}' after '{tok[1]} {nxt[1]}'", value)
+        return tok[1], nxt[1], value
+    if tok[0] == OP:
+        raise ts.error(f"Unexpected operator '{tok[1]}'", tok)
+    return None, None, tok
+
+
+def skip_block(ts: TokenStream):
+    """Consume tokens up to and including the brace closing the current block."""
+    depth = 1
+    while depth:
+        tok = ts.next()
+        if tok is None:
+            return
+        if tok[0] == LBRACE:
+            depth += 1
+        elif tok[0] == RBRACE:
+            depth -= 1
+
+
+def parse_block(ts: TokenStream) -> List[Tuple[Optional[str], Optional[str], object]]:
+    """Materialize the current block as a list of (key, op, value) entries.
+
+    Nested blocks become nested lists; bare values have key and op None.
+    """
+    entries = []
+    while True:
+        stmt = read_statement(ts)
+        if stmt is None:
+            return entries
+        key, op, tok = stmt
+        value = parse_block(ts) if tok[0] == LBRACE else tok[1]
+        entries.append((key, op, value))
+
+
+def parse(source: Source) -> List[Tuple[Optional[str], Optional[str], object]]:
+    """Parse a whole script into nested (key, op, value) lists."""
+    ts, f = token_stream(source)
+    try:
+        return parse_block(ts)
+    finally:
+        if f is not None:
+            f.close()
+
+
+def to_number(value):
+    """Convert a scalar to int or float where possible, else return it unchanged."""
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    return value
+
+
+def _read_focus_refs(ts: TokenStream) -> List[str]:
+    """Read the focus ids out of a prerequisite/mutually_exclusive block."""
+    refs = []
+    while True:
+        stmt = read_statement(ts)
+        if stmt is None:
+            return refs
+        key, _, tok = stmt
+        if tok[0] == LBRACE:
+            skip_block(ts)
+        elif key == 'focus':
+            refs.append(tok[1])
+
+
+def _read_icon(ts: TokenStream) -> Tuple[Optional[str], bool]:
+    """Read a dynamic ``icon = { value = ... trigger = {...} }`` block."""
+    value, conditional = None, False
+    while True:
+        stmt = read_statement(ts)
+        if stmt is None:
+            return value, conditional
+        key, _, tok = stmt
+        if tok[0] == LBRACE:
+            conditional = conditional or key == 'trigger'
+            skip_block(ts)
+        elif key == 'value':
+            value = tok[1]
+
+
+def _read_offset(ts: TokenStream) -> Dict:
+    offset = {'x': 0, 'y': 0, 'conditional': False}
+    while True:
+        stmt = read_statement(ts)
+        if stmt is None:
+            return offset
+        key, _, tok = stmt
+        if tok[0] == LBRACE:
+            offset['conditional'] = offset['conditional'] or key == 'trigger'
+            skip_block(ts)
+        elif key in ('x', 'y'):
+            offset[key] = to_number(tok[1])
+
+
+def read_focus(ts: TokenStream, kind: str, tree: Optional[str], line: int) -> Dict:
+    """Read one focus block into a record, skipping effect and trigger blocks."""
+    record = {
+        'id': None,
+        'kind': kind,
+        'tree': tree,
+        'icon': None,
+        'icons': [],
+        'x': None,
+        'y': None,
+        'cost': None,
+        'relative_position_id': None,
+        'prerequisite': [],
+        'mutually_exclusive': [],
+        'offset': [],
+        'allow_branch': False,
+        'file': ts.filename,
+        'line': line,
+    }
+    while True:
+        stmt = read_statement(ts)
+        if stmt is None:
+            break
+        key, _, tok = stmt
+        if tok[0] == LBRACE:
+            if key == 'prerequisite':
+                record['prerequisite'].append(_read_focus_refs(ts))
+            elif key == 'mutually_exclusive':
+                record['mutually_exclusive'].extend(_read_focus_refs(ts))
+            elif key == 'icon':
+                value, conditional = _read_icon(ts)
+                if value:
+                    record['icons'].append(value)
+                    if not conditional and record['icon'] is None:
+                        record['icon'] = value
+            elif key == 'offset':
+                record['offset'].append(_read_offset(ts))
+            else:
+                record['allow_branch'] = record['allow_branch'] or key == 'allow_branch'
+                skip_block(ts)
+        elif key == 'id' or key == 'relative_position_id':
+            record[key] = tok[1]
+        elif key == 'icon':
+            record['icons'].append(tok[1])
+            if record['icon'] is None:
+                record['icon'] = tok[1]
+        elif key in ('x', 'y', 'cost'):
+            record[key] = to_number(tok[1])
+
+    if record['icon'] is None and record['icons']:
+        record['icon'] = record['icons'][-1]
+    return record
+
+
+def iter_focus_file(source: Source) -> Iterator[Dict]:
+    """Yield focus and focus tree records from a focus file in one pass.
+
+    Focus records have ``kind`` in FOCUS_KINDS; a tree record (``kind`` in
+    TREE_KINDS) is yielded after all of its focuses.
+    """
+    ts, f = token_stream(source)
+    try:
+        while True:
+            stmt = read_statement(ts)
+            if stmt is None:
+                if ts.peek() is None:
+                    return
+                continue  # stray closing brace at top level
+            key, _, tok = stmt
+            if tok[0] != LBRACE:
+                continue
+            if key in FOCUS_KINDS and key != 'focus':
+                yield read_focus(ts, key, None, tok[2])
+            elif key in TREE_KINDS:
+                yield from _iter_tree(ts, key, tok[2])
+            else:
+                skip_block(ts)
+    finally:
+        if f is not None:
+            f.close()
+
+
+def _iter_tree(ts: TokenStream, kind: str, line: int) -> Iterator[Dict]:
+    tree = {
+        'id': None,
+        'kind': kind,
+        'focuses': [],
+        'shared_focus': [],
+        'file': ts.filename,
+        'line': line,
+    }
+    while True:
+        stmt = read_statement(ts)
+        if stmt is None:
+            break
+        key, _, tok = stmt
+        if tok[0] == LBRACE:
+            if key == 'focus':
+                focus = read_focus(ts, 'focus', tree['id'], tok[2])
+                tree['focuses'].append(focus['id'])
+                yield focus
+            else:
+                skip_block(ts)
+        elif key == 'id':
+            tree['id'] = tok[1]
+        elif key == 'shared_focus':
+            tree['shared_focus'].append(tok[1])
+    yield tree
+
+
+def read_directives(path) -> Dict[str, List[str]]:
+    """Read ``#!key:value`` directives from the leading comment lines of a file.
+
+    Reading stops at the first line that is neither blank nor a comment,
+    e.g. ``#!gfx:interface/RJ_goals.gfx`` gives {'gfx': ['interface/RJ_goals.gfx']}.
+    """
+    directives = {}
+    with open_script(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if not line.startswith('#'):
+                break
+            if line.startswith('#!') and ':' in line:
+                key, value = line[2:].split(':', 1)
+                directives.setdefault(key.strip(), []).append(value.strip())
+    return directives
+
+
+def iter_focuses(source: Source) -> Iterator[Dict]:
+    """Yield only the focus records of a focus file."""
+    for record in iter_focus_file(source):
+        if record['kind'] in FOCUS_KINDS:
+            yield record
+
+
+def _read_sprite(ts: TokenStream, sprite_type: str, line: int) -> Dict:
+    sprite = {
+        'name': None,
+        'texturefile': None,
+        'type': sprite_type,
+        'file': ts.filename,
+        'line': line,
+    }
+    while True:
+        stmt = read_statement(ts)
+        if stmt is None:
+            return sprite
+        key, _, tok = stmt
+        if tok[0] == LBRACE:
+            skip_block(ts)
+            continue
+        key = (key or '').lower()
+        if key == 'name':
+            sprite['name'] = tok[1]
+        elif key.startswith('texturefile') and sprite['texturefile'] is None:
+            sprite['texturefile'] = tok[1]
+
+
+def iter_sprites(source: Source) -> Iterator[Dict]:
+    """Yield sprite definitions from a .gfx file.
+
+    Every block directly inside a ``spriteTypes`` block whose key ends in
+    "type" (spriteType, frameAnimatedSpriteType, corneredTileSpriteType,
+    ...) is yielded as a dict with name, texturefile, type, file and line.
+    """
+    ts, f = token_stream(source)
+    try:
+        while True:
+            stmt = read_statement(ts)
+            if stmt is None:
+                if ts.peek() is None:
+                    return
+                continue
+            key, _, tok = stmt
+            if tok[0] != LBRACE:
+                continue
+            if (key or '').lower() != 'spritetypes':
+                skip_block(ts)
+                continue
+            while True:
+                inner = read_statement(ts)
+                if inner is None:
+                    break
+                inner_key, _, inner_tok = inner
+                if inner_tok[0] != LBRACE:
+                    continue
+                if (inner_key or '').lower().endswith('type'):
+                    yield _read_sprite(ts, inner_key, inner_tok[2])
+                else:
+                    skip_block(ts)
+    finally:
+        if f is not None:
+            f.close()
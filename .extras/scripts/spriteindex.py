@@ -0,0 +1,270 @@
+"""Persistent registry of every sprite defined in a mod's interface/*.gfx files.
+
+The registry lives in an SQLite database and is refreshed incrementally:
+files whose mtime and size are unchanged are skipped, files whose content
+hash is unchanged only get their stat data updated, and only the rest are
+re-parsed.
+
+usage: spriteindex.py [-m MOD_ROOT] [--db PATH] {update,lookup,duplicates,texture} ...
+"""
+
+import argparse
+import glob
+import os
+import sqlite3
+import sys
+from typing import Dict, List, Optional, Sequence
+
+from fsutil import cache_file, hash_file
+from pdxscript import ScriptError, iter_sprites
+
+DEFAULT_PATTERNS = ('interface/*.gfx',)
+
+SCHEMA_VERSION = 1
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sprites (
+    name TEXT NOT NULL,
+    texture TEXT,
+    texture_key TEXT,
+    type TEXT NOT NULL,
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    line INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sprites_name ON sprites(name);
+CREATE INDEX IF NOT EXISTS sprites_texture ON sprites(texture_key);
+CREATE INDEX IF NOT EXISTS sprites_path ON sprites(path);
+'''
+
+
+def default_db_path(mod_root: str, cache_dir: Optional[str] = None) -> str:
+    """Registry database for a mod root; each mod root gets its own file."""
+    return cache_file('sprites', mod_root, '.sqlite3', cache_dir)
+
+
+def texture_key(texture: Optional[str]) -> Optional[str]:
+    """Normalize a texture path the way the game compares them."""
+    if not texture:
+        return None
+    return texture.replace('\\', '/').lower()
+
+
+class SpriteRegistry:
+    """SQLite-backed index of spriteType names, textures and their definitions."""
+
+    def __init__(self, mod_root: str = '.', db_path: Optional[str] = None,
+                 patterns: Sequence[str] = DEFAULT_PATTERNS):
+        self.mod_root = os.path.abspath(mod_root)
+        self.patterns = tuple(patterns)
+        self.db_path = db_path or default_db_path(self.mod_root)
+        if self.db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self.db = sqlite3.connect(self.db_path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA foreign_keys = ON')
+        self._init_schema()
+
+    def _init_schema(self):
+        self.db.executescript(SCHEMA)
+        meta = dict(self.db.execute('SELECT key, value FROM meta').fetchall())
+        expected = {'schema': str(SCHEMA_VERSION), 'mod_root': self.mod_root}
+        if meta and meta != expected:
+            # Different layout or a different mod: start over
+            with self.db:
+                self.db.execute('DELETE FROM sprites')
+                self.db.execute('DELETE FROM files')
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)', expected.items())
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def relpath(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), self.mod_root).replace('\\', '/')
+
+    def discover(self) -> List[str]:
+        """Return the mod-relative paths of all .gfx files covered by the registry."""
+        paths = set()
+        for pattern in self.patterns:
+            for path in glob.glob(os.path.join(self.mod_root, pattern), recursive=True):
+                if os.path.isfile(path):
+                    paths.add(self.relpath(path))
+        return sorted(paths)
+
+    def update(self, paths: Optional[Sequence[str]] = None) -> Dict[str, int]:
+        """Bring the registry up to date and return counts of what changed.
+
+        With ``paths``, only those files (mod-relative or absolute) are
+        checked; otherwise every file matching the patterns is, and rows for
+        files that disappeared are dropped.
+        """
+        stats = {'parsed': 0, 'touched': 0, 'unchanged': 0, 'removed': 0}
+        known = {row['path']: row for row in self.db.execute('SELECT * FROM files')}
+        if paths is None:
+            current = self.discover()
+            current_set = set(current)
+            removed = [path for path in known if path not in current_set]
+        else:
+            current = [self.relpath(os.path.join(self.mod_root, path)) for path in paths]
+            removed = [path for path in current if not os.path.isfile(os.path.join(self.mod_root, path))]
+            current = [path for path in current if path not in removed]
+
+        with self.db:
+            for path in removed:
+                self.db.execute('DELETE FROM files WHERE path = ?', (path,))
+                stats['removed'] += 1
+
+            for path in current:
+                full_path = os.path.join(self.mod_root, path)
+                st = os.stat(full_path)
+                row = known.get(path)
+                if row and row['mtime_ns'] == st.st_mtime_ns and row['size'] == st.st_size:
+                    stats['unchanged'] += 1
+                    continue
+                digest = hash_file(full_path)
+                if row and row['hash'] == digest:
+                    self.db.execute('UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?',
+                                    (st.st_mtime_ns, st.st_size, path))
+                    stats['touched'] += 1
+                    continue
+                self._index_file(path, full_path, st, digest)
+                stats['parsed'] += 1
+        return stats
+
+    def _index_file(self, path: str, full_path: str, st: os.stat_result, digest: str):
+        try:
+            sprites = [
+                (s['name'], s['texturefile'], texture_key(s['texturefile']), s['type'], path, s['line'])
+                for s in iter_sprites(full_path) if s['name']
+            ]
+        except ScriptError as e:
+            print(f"WARNING: {e}", file=sys.stderr)
+            sprites = []
+        self.db.execute('DELETE FROM files WHERE path = ?', (path,))
+        self.db.execute('INSERT INTO files VALUES (?, ?, ?, ?)', (path, st.st_mtime_ns, st.st_size, digest))
+        self.db.executemany('INSERT INTO sprites VALUES (?, ?, ?, ?, ?, ?)', sprites)
+
+    def lookup(self, name: str) -> List[Dict]:
+        """Return every definition of a sprite name."""
+        rows = self.db.execute(
+            'SELECT name, texture, type, path, line FROM sprites WHERE name = ? ORDER BY path, line', (name,))
+        return [dict(row) for row in rows]
+
+    def names(self) -> set:
+        """Return the set of all defined sprite names."""
+        return {row[0] for row in self.db.execute('SELECT DISTINCT name FROM sprites')}
+
+    def names_by_file(self) -> Dict[str, List[str]]:
+        """Map every indexed .gfx file to the sprite names it defines."""
+        files = {row[0]: [] for row in self.db.execute('SELECT path FROM files')}
+        for row in self.db.execute('SELECT path, name FROM sprites ORDER BY path, line'):
+            files[row[0]].append(row[1])
+        return files
+
+    def defined_in(self, names: Sequence[str], exclude_path: Optional[str] = None) -> Dict[str, List[Dict]]:
+        """Map each of ``names`` that is already defined to its definitions.
+
+        Definitions in ``exclude_path`` (e.g. the file being regenerated) are ignored.
+        """
+        exclude = self.relpath(exclude_path) if exclude_path else None
+        found = {}
+        for name in names:
+            defs = [d for d in self.lookup(name) if d['path'] != exclude]
+            if defs:
+                found[name] = defs
+        return found
+
+    def duplicates(self) -> Dict[str, List[Dict]]:
+        """Return sprite names defined more than once, with all their definitions."""
+        rows = self.db.execute('''
+            SELECT name, texture, type, path, line FROM sprites
+            WHERE name IN (SELECT name FROM sprites GROUP BY name HAVING COUNT(*) > 1)
+            ORDER BY name, path, line''')
+        dups = {}
+        for row in rows:
+            dups.setdefault(row['name'], []).append(dict(row))
+        return dups
+
+    def sprites_for_texture(self, texture: str) -> List[Dict]:
+        """Return the sprites whose texture file is ``texture`` (case-insensitive)."""
+        rows = self.db.execute(
+            'SELECT name, texture, type, path, line FROM sprites WHERE texture_key = ? ORDER BY path, line',
+            (texture_key(texture),))
+        return [dict(row) for row in rows]
+
+    def textures(self) -> Dict[str, List[str]]:
+        """Map every normalized texture path to the sprite names using it."""
+        textures = {}
+        for row in self.db.execute('SELECT texture_key, name FROM sprites WHERE texture_key IS NOT NULL'):
+            textures.setdefault(row[0], []).append(row[1])
+        return textures
+
+
+def format_definition(definition: Dict) -> str:
+    return f"{definition['path']}:{definition['line']}: {definition['name']} -> {definition['texture']}"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='spriteindex',
+        description='Query the sprite registry built from interface/*.gfx files.'
+    )
+    parser.add_argument('-m', '--mod-root', default='.', help='Mod root folder (default: %(default)s)')
+    parser.add_argument('--db', help='Registry database (default: one per mod root under .extras/.cache)')
+    parser.add_argument('--pattern', action='append', metavar='GLOB',
+                        help='Glob of .gfx files to index, relative to the mod root; repeatable '
+                             f'(default: {" ".join(DEFAULT_PATTERNS)})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('update', help='Refresh the registry and print what changed')
+    lookup_parser = subparsers.add_parser('lookup', help='Show where sprite names are defined')
+    lookup_parser.add_argument('names', nargs='+', metavar='NAME')
+    subparsers.add_parser('duplicates', help='List sprite names defined more than once')
+    texture_parser = subparsers.add_parser('texture', help='List sprites using a texture file')
+    texture_parser.add_argument('textures', nargs='+', metavar='PATH')
+
+    args = parser.parse_args()
+
+    with SpriteRegistry(args.mod_root, args.db, args.pattern or DEFAULT_PATTERNS) as registry:
+        stats = registry.update()
+        status = 0
+        if args.command == 'update':
+            print(', '.join(f"{count} {what}" for what, count in stats.items()))
+        elif args.command == 'lookup':
+            for name in args.names:
+                definitions = registry.lookup(name)
+                if not definitions:
+                    print(f"{name}: not defined")
+                    status = 1
+                for definition in definitions:
+                    print(format_definition(definition))
+        elif args.command == 'duplicates':
+            dups = registry.duplicates()
+            for name, definitions in dups.items():
+                print(f"{name} ({len(definitions)} definitions):")
+                for definition in definitions:
+                    print(f"  {format_definition(definition)}")
+            status = 1 if dups else 0
+        elif args.command == 'texture':
+            for texture in args.textures:
+                sprites = registry.sprites_for_texture(texture)
+                if not sprites:
+                    print(f"{texture}: no sprites")
+                for definition in sprites:
+                    print(format_definition(definition))
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
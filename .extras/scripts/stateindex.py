@@ -0,0 +1,397 @@
+"""Columnar index of history/states for fast bulk queries.
+
+Every state file is parsed (in a process pool) with the shared script
+parser and the states are stored as NumPy columns, one row per state:
+
+    id, file, name, manpower, category, owner, controller, local_supplies,
+    building:<type>   state buildings plus the sum of province buildings
+    resource:<type>
+
+Tags and categories are stored as codes into vocabulary arrays (-1 for
+none).  Cores, provinces and victory points are ragged, so they are stored
+CSR-style as a flat value array plus per-state offsets.  Only the undated,
+unconditional part of a state's history is indexed.
+
+The tables are cached in an .npz file under .extras/.cache together with
+the mtime and size of every state file; an update re-parses only changed
+files and replaces their rows.
+
+Unlike the other scripts, which only need the standard library, this one
+needs NumPy (pip install -r .extras/scripts/requirements.txt).
+
+usage: stateindex.py [-h] [-m MOD_ROOT] [--rebuild] {summary,manpower,with,owned,cores,top} ...
+"""
+
+import argparse
+import glob
+import os
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError as e:
+    NUMPY_HINT = "stateindex needs NumPy: pip install -r .extras/scripts/requirements.txt"
+    if __name__ == "__main__":
+        sys.exit(NUMPY_HINT)
+    raise ImportError(NUMPY_HINT) from e
+
+from fsutil import cache_file
+from pdxscript import ScriptError, parse, to_number
+
+STATE_PATTERN = 'history/states/*.txt'
+CACHE_VERSION = 1
+
+# Ragged columns: name -> value columns sharing one offsets array
+RAGGED = {'cores': ('cores',), 'provinces': ('provinces',), 'victory_points': ('vp_province', 'vp_value')}
+VOCABS = ('tags', 'categories')
+
+
+def _scalar(value, default=None):
+    return value if isinstance(value, str) else default
+
+
+def parse_state_file(path: str) -> Tuple[str, List[Dict], Optional[str]]:
+    """Return (path, [state records], error) for one state file. Runs in a worker."""
+    states = []
+    try:
+        entries = parse(path)
+    except (OSError, ScriptError) as e:
+        return path, [], str(e)
+
+    for key, _, body in entries:
+        if key != 'state' or not isinstance(body, list):
+            continue
+        state = {'id': -1, 'name': '', 'manpower': 0, 'category': None, 'owner': None, 'controller': None,
+                 'local_supplies': 0.0, 'buildings': {}, 'resources': {}, 'cores': [], 'provinces': [],
+                 'victory_points': []}
+        for k, _, v in body:
+            if k == 'id':
+                state['id'] = int(to_number(v))
+            elif k == 'name':
+                state['name'] = _scalar(v, '')
+            elif k == 'manpower':
+                state['manpower'] = int(to_number(v))
+            elif k == 'state_category':
+                state['category'] = _scalar(v)
+            elif k == 'local_supplies':
+                state['local_supplies'] = float(to_number(v))
+            elif k == 'provinces' and isinstance(v, list):
+                state['provinces'] = [int(p) for _, _, p in v if isinstance(p, str) and p.isdigit()]
+            elif k == 'resources' and isinstance(v, list):
+                for res, _, amount in v:
+                    if res and isinstance(amount, str):
+                        state['resources'][res] = state['resources'].get(res, 0.0) + float(to_number(amount))
+            elif k == 'history' and isinstance(v, list):
+                _read_history(v, state)
+        states.append(state)
+    return path, states, None
+
+
+def _read_history(entries, state: Dict):
+    for k, _, v in entries:
+        if k in ('owner', 'controller'):
+            state[k] = _scalar(v)
+        elif k == 'add_core_of' and isinstance(v, str):
+            state['cores'].append(v)
+        elif k == 'victory_points' and isinstance(v, list):
+            values = [to_number(x) for _, _, x in v if isinstance(x, str)]
+            for province, points in zip(values[::2], values[1::2]):
+                state['victory_points'].append((int(province), float(points)))
+        elif k == 'buildings' and isinstance(v, list):
+            buildings = state['buildings']
+            for building, _, level in v:
+                if isinstance(level, list):  # province buildings: <province> = { naval_base = 3 }
+                    for province_building, _, province_level in level:
+                        if province_building and isinstance(province_level, str):
+                            buildings[province_building] = (
+                                buildings.get(province_building, 0) + int(to_number(province_level)))
+                elif building and isinstance(level, str):
+                    buildings[building] = buildings.get(building, 0) + int(to_number(level))
+    if state['controller'] is None:
+        state['controller'] = state['owner']
+
+
+def _vocab_code(vocab: List[str], lookup: Dict[str, int], value: Optional[str]) -> int:
+    if value is None:
+        return -1
+    code = lookup.get(value)
+    if code is None:
+        code = lookup[value] = len(vocab)
+        vocab.append(value)
+    return code
+
+
+class StateIndex:
+    """NumPy-backed tables of every state in a mod, cached on disk."""
+
+    def __init__(self, mod_root: str = '.', cache_path: Optional[str] = None):
+        self.mod_root = os.path.abspath(mod_root)
+        self.cache_path = cache_path or cache_file('stateindex', self.mod_root, '.npz')
+        self._clear()
+        if os.path.exists(self.cache_path):
+            self._load()
+
+    def _clear(self):
+        self.files = np.array([], dtype=str)
+        self.file_stats = np.zeros((0, 2), dtype=np.int64)  # mtime_ns, size
+        self.tags: List[str] = []
+        self.categories: List[str] = []
+        self.columns: Dict[str, np.ndarray] = {
+            'id': np.zeros(0, np.int32), 'file': np.zeros(0, np.int32), 'name': np.array([], dtype=str),
+            'manpower': np.zeros(0, np.int64), 'category': np.zeros(0, np.int16),
+            'owner': np.zeros(0, np.int16), 'controller': np.zeros(0, np.int16),
+            'local_supplies': np.zeros(0, np.float32),
+        }
+        self.ragged: Dict[str, np.ndarray] = {
+            'cores': np.zeros(0, np.int16), 'provinces': np.zeros(0, np.int32),
+            'vp_province': np.zeros(0, np.int32), 'vp_value': np.zeros(0, np.float32),
+        }
+        self.offsets: Dict[str, np.ndarray] = {name: np.zeros(1, np.int64) for name in RAGGED}
+
+    def _load(self):
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as data:
+                if int(data['version']) != CACHE_VERSION or str(data['mod_root']) != self.mod_root:
+                    return
+                self.files = data['files']
+                self.file_stats = data['file_stats']
+                self.tags = data['tags'].tolist()
+                self.categories = data['categories'].tolist()
+                self.columns = {k[4:]: data[k] for k in data.files if k.startswith('col_')}
+                self.ragged = {k[4:]: data[k] for k in data.files if k.startswith('rag_')}
+                self.offsets = {k[4:]: data[k] for k in data.files if k.startswith('off_')}
+        except (OSError, ValueError, KeyError):
+            self._clear()
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        arrays = {'version': np.array(CACHE_VERSION), 'mod_root': np.array(self.mod_root),
+                  'files': self.files, 'file_stats': self.file_stats,
+                  'tags': np.array(self.tags, dtype=str), 'categories': np.array(self.categories, dtype=str)}
+        arrays.update({f"col_{k}": v for k, v in self.columns.items()})
+        arrays.update({f"rag_{k}": v for k, v in self.ragged.items()})
+        arrays.update({f"off_{k}": v for k, v in self.offsets.items()})
+        tmp_path = f"{self.cache_path}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, self.cache_path)
+
+    def __len__(self) -> int:
+        return len(self.columns['id'])
+
+    def update(self, jobs: Optional[int] = None) -> Dict[str, int]:
+        """Re-parse state files whose mtime or size changed and drop removed ones."""
+        paths = sorted(glob.glob(os.path.join(self.mod_root, STATE_PATTERN)))
+        relpaths = [os.path.relpath(p, self.mod_root).replace('\\', '/') for p in paths]
+        stats = np.array([[st.st_mtime_ns, st.st_size] for st in map(os.stat, paths)], dtype=np.int64)
+        stats = stats.reshape(-1, 2)
+
+        known = {name: i for i, name in enumerate(self.files.tolist())}
+        changed = [i for i, name in enumerate(relpaths)
+                   if name not in known or not np.array_equal(self.file_stats[known[name]], stats[i])]
+        current = set(relpaths)
+        removed = [name for name in known if name not in current]
+        if not changed and not removed:
+            return {'parsed': 0, 'removed': 0, 'states': len(self)}
+
+        jobs = jobs or min(len(changed), os.cpu_count() or 1)
+        if jobs > 1 and len(changed) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                parsed = list(executor.map(parse_state_file, [paths[i] for i in changed], chunksize=32))
+        else:
+            parsed = [parse_state_file(paths[i]) for i in changed]
+        for path, _, error in parsed:
+            if error:
+                print(f"WARNING: {error}", file=sys.stderr)
+
+        # Keep rows of unchanged files, then append the re-parsed ones
+        stale = {known[relpaths[i]] for i in changed if relpaths[i] in known} | {known[n] for n in removed}
+        keep = ~np.isin(self.columns['file'], np.fromiter(stale, dtype=np.int32, count=len(stale)))
+        self._filter_rows(keep)
+
+        # Renumber files to the current file list
+        file_map = np.full(max(len(self.files), 1), -1, dtype=np.int32)
+        new_index = {name: i for i, name in enumerate(relpaths)}
+        for name, old in known.items():
+            if name in new_index:
+                file_map[old] = new_index[name]
+        self.columns['file'] = file_map[self.columns['file']] if len(self) else self.columns['file']
+        self.files = np.array(relpaths, dtype=str)
+        self.file_stats = stats
+
+        self._append([(new_index[relpaths[i]], states) for i, (_, states, _) in zip(changed, parsed)])
+        return {'parsed': len(changed), 'removed': len(removed), 'states': len(self)}
+
+    def _filter_rows(self, keep: np.ndarray):
+        for name, column in self.columns.items():
+            self.columns[name] = column[keep]
+        for name, value_columns in RAGGED.items():
+            offsets = self.offsets[name]
+            lengths = np.diff(offsets)
+            value_keep = np.repeat(keep, lengths)
+            for value_column in value_columns:
+                self.ragged[value_column] = self.ragged[value_column][value_keep]
+            self.offsets[name] = np.concatenate(([0], np.cumsum(lengths[keep]))).astype(np.int64)
+
+    def _append(self, parsed: Sequence[Tuple[int, List[Dict]]]):
+        states = [(file_index, state) for file_index, file_states in parsed for state in file_states]
+        if not states:
+            return
+        tag_lookup = {tag: i for i, tag in enumerate(self.tags)}
+        category_lookup = {category: i for i, category in enumerate(self.categories)}
+
+        def tag(value):
+            return _vocab_code(self.tags, tag_lookup, value)
+
+        new = {
+            'id': np.array([s['id'] for _, s in states], np.int32),
+            'file': np.array([f for f, _ in states], np.int32),
+            'name': np.array([s['name'] for _, s in states], dtype=str),
+            'manpower': np.array([s['manpower'] for _, s in states], np.int64),
+            'category': np.array([_vocab_code(self.categories, category_lookup, s['category'])
+                                  for _, s in states], np.int16),
+            'owner': np.array([tag(s['owner']) for _, s in states], np.int16),
+            'controller': np.array([tag(s['controller']) for _, s in states], np.int16),
+            'local_supplies': np.array([s['local_supplies'] for _, s in states], np.float32),
+        }
+        for prefix, field, dtype in (('building:', 'buildings', np.int16), ('resource:', 'resources', np.float32)):
+            names = {name for _, s in states for name in s[field]}
+            names |= {k[len(prefix):] for k in self.columns if k.startswith(prefix)}
+            for name in names:
+                new[prefix + name] = np.array([s[field].get(name, 0) for _, s in states], dtype)
+
+        old_rows = len(self)
+        for name, column in new.items():
+            existing = self.columns.get(name)
+            if existing is None:  # a building or resource not seen before
+                existing = np.zeros(old_rows, column.dtype)
+            self.columns[name] = np.concatenate((existing, column))
+
+        ragged_values = {
+            'cores': [[tag(c) for c in s['cores']] for _, s in states],
+            'provinces': [s['provinces'] for _, s in states],
+            'victory_points': [s['victory_points'] for _, s in states],
+        }
+        for name, rows in ragged_values.items():
+            lengths = np.array([len(r) for r in rows], np.int64)
+            offsets = self.offsets[name]
+            self.offsets[name] = np.concatenate((offsets, offsets[-1] + np.cumsum(lengths)))
+            flat = [v for r in rows for v in r]
+            if name == 'victory_points':
+                self.ragged['vp_province'] = np.concatenate(
+                    (self.ragged['vp_province'], np.array([p for p, _ in flat], np.int32)))
+                self.ragged['vp_value'] = np.concatenate(
+                    (self.ragged['vp_value'], np.array([v for _, v in flat], np.float32)))
+            else:
+                self.ragged[name] = np.concatenate((self.ragged[name], np.array(flat, self.ragged[name].dtype)))
+
+    # Queries
+
+    def tag_code(self, tag: str) -> int:
+        return self.tags.index(tag) if tag in self.tags else -2  # -2 never matches, -1 is "none"
+
+    def column(self, name: str) -> np.ndarray:
+        """A column by name; buildings and resources may be given without their prefix."""
+        for key in (name, f"building:{name}", f"resource:{name}"):
+            if key in self.columns:
+                return self.columns[key]
+        raise KeyError(name)
+
+    def rows_of_values(self, ragged: str) -> np.ndarray:
+        """Row index of every value of a ragged column."""
+        lengths = np.diff(self.offsets[ragged])
+        return np.repeat(np.arange(len(self)), lengths)
+
+    def owned_by(self, tag: str) -> np.ndarray:
+        return self.columns['owner'] == self.tag_code(tag)
+
+    def cored_by(self, tag: str) -> np.ndarray:
+        mask = np.zeros(len(self), bool)
+        mask[self.rows_of_values('cores')[self.ragged['cores'] == self.tag_code(tag)]] = True
+        return mask
+
+    def with_building(self, building: str, min_level: int = 1) -> np.ndarray:
+        return self.column(building) >= min_level
+
+    def total_by_owner(self, name: str = 'manpower') -> Dict[str, float]:
+        """Sum a column per owner tag in one bincount."""
+        owners = self.columns['owner']
+        owned = owners >= 0
+        sums = np.bincount(owners[owned], weights=self.column(name)[owned], minlength=len(self.tags))
+        return {self.tags[i]: sums[i] for i in np.flatnonzero(sums)}
+
+    def victory_points_of(self, mask: np.ndarray) -> float:
+        rows = self.rows_of_values('victory_points')
+        return float(self.ragged['vp_value'][mask[rows]].sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='stateindex',
+        description='Query a columnar index of history/states.'
+    )
+    parser.add_argument('-m', '--mod-root', default='.', help='Mod root folder (default: %(default)s)')
+    parser.add_argument('--cache', metavar='FILE', help='Index file (default: one per mod root under .extras/.cache)')
+    parser.add_argument('--rebuild', action='store_true', help='Re-parse every state file')
+    parser.add_argument('-j', '--jobs', type=int, metavar='N', help='Worker processes for parsing')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('summary', help='Row counts, columns and totals')
+    manpower_parser = subparsers.add_parser('manpower', help='Total manpower per owner')
+    manpower_parser.add_argument('tags', nargs='*', metavar='TAG')
+    with_parser = subparsers.add_parser('with', help='States with a building (e.g. naval_base)')
+    with_parser.add_argument('building')
+    with_parser.add_argument('--min', type=int, default=1, help='Minimum level (default: %(default)s)')
+    owned_parser = subparsers.add_parser('owned', help='States owned by a tag')
+    owned_parser.add_argument('tag')
+    cores_parser = subparsers.add_parser('cores', help='States with a core of a tag')
+    cores_parser.add_argument('tag')
+    top_parser = subparsers.add_parser('top', help='States with the highest value of a column')
+    top_parser.add_argument('column')
+    top_parser.add_argument('-n', type=int, default=10)
+    args = parser.parse_args()
+
+    index = StateIndex(args.mod_root, args.cache)
+    if args.rebuild:
+        index._clear()
+    stats = index.update(args.jobs)
+    if stats['parsed'] or stats['removed']:
+        index.save()
+        print(f"Indexed {stats['states']} states ({stats['parsed']} files parsed, {stats['removed']} removed)",
+              file=sys.stderr)
+
+    ids = index.columns['id']
+    names = index.columns['name']
+
+    def print_states(mask: np.ndarray, extra: Optional[np.ndarray] = None):
+        for row in np.flatnonzero(mask):
+            owner = index.columns['owner'][row]
+            suffix = f" {extra[row]}" if extra is not None else ''
+            print(f"{ids[row]:>5} {names[row]:<12} {index.tags[owner] if owner >= 0 else '-':<4}{suffix}")
+        print(f"{int(mask.sum())} states, {int(index.columns['manpower'][mask].sum())} manpower, "
+              f"{index.victory_points_of(mask):g} victory points")
+
+    if args.command == 'summary':
+        print(f"{len(index)} states in {len(index.files)} files, {len(index.tags)} tags")
+        for name, column in sorted(index.columns.items()):
+            if column.dtype.kind in 'if' and name not in ('id', 'file', 'category', 'owner', 'controller'):
+                print(f"  {name:<32} total {column.sum():g}")
+    elif args.command == 'manpower':
+        totals = index.total_by_owner('manpower')
+        for tag in args.tags or sorted(totals, key=totals.get, reverse=True):
+            print(f"{tag:<4} {int(totals.get(tag, 0)):>12}")
+    elif args.command == 'with':
+        print_states(index.with_building(args.building, args.min), index.column(args.building))
+    elif args.command == 'owned':
+        print_states(index.owned_by(args.tag))
+    elif args.command == 'cores':
+        print_states(index.cored_by(args.tag))
+    elif args.command == 'top':
+        values = index.column(args.column)
+        order = np.argsort(values, kind='stable')[::-1][:args.n]
+        for row in order:
+            print(f"{ids[row]:>5} {names[row]:<12} {values[row]:g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""Validate DDS, TGA and PNG textures from their headers.
+
+Only the first bytes of each file are read (at most HEADER_SIZE), so a
+full check of gfx/interface stays fast.  Every texture is checked for a
+readable header, a supported pixel format, DXT dimensions that are
+multiples of 4 and a file size that holds all of its declared mip levels.
+Focus icons (under gfx/interface/goals) must also follow the goal-icon
+conventions: at most GOAL_ICON_MAX_SIZE pixels wide and high, an alpha
+channel (32-bit BGRA or DXT3/DXT5) and no mipmaps.
+
+Headers are read from a thread pool and results are cached under
+.extras/.cache by path, size and mtime.
+
+usage: texcheck.py [-h] [-m MOD_ROOT] [-j N] [--no-cache] [-v] [path ...]
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+from typing import Dict, List, Optional, Sequence
+
+from fsutil import AtomicWriter, cache_file
+
+DEFAULT_PATHS = ('gfx/interface',)
+TEXTURE_EXTENSIONS = ('.dds', '.tga', '.png')
+CACHE_VERSION = 1
+
+HEADER_SIZE = 148  # DDS magic + header + DX10 extension
+GOAL_ICON_DIR = 'gfx/interface/goals/'
+GOAL_ICON_MIN_SIZE = 32
+GOAL_ICON_MAX_SIZE = 128
+
+# DDS pixel format flags
+_DDPF_ALPHAPIXELS = 0x1
+_DDPF_FOURCC = 0x4
+_DDPF_RGB = 0x40
+_DDSD_MIPMAPCOUNT = 0x20000
+
+# Bytes per 4x4 block of block-compressed formats
+_BLOCK_SIZES = {'DXT1': 8, 'DXT3': 16, 'DXT5': 16, 'ATI2': 16, 'BC4U': 8, 'BC5U': 16}
+# DXGI formats of DX10 headers the game loads: name, bytes per block or pixel, compressed
+_DXGI_FORMATS = {
+    28: ('R8G8B8A8', 4, False), 87: ('B8G8R8A8', 4, False), 88: ('B8G8R8X8', 4, False),
+    71: ('DXT1', 8, True), 74: ('DXT3', 16, True), 77: ('DXT5', 16, True),
+}
+_ALPHA_FORMATS = {'DXT3', 'DXT5', 'B8G8R8A8', 'R8G8B8A8'}
+
+
+def _dds_data_size(width: int, height: int, mips: int, block_size: int, compressed: bool) -> int:
+    size = 0
+    for _ in range(max(mips, 1)):
+        if compressed:
+            size += max(1, (width + 3) // 4) * max(1, (height + 3) // 4) * block_size
+        else:
+            size += width * height * block_size
+        width, height = max(1, width // 2), max(1, height // 2)
+    return size
+
+
+def read_dds_header(data: bytes, file_size: int) -> Dict:
+    info = {'format': 'dds'}
+    if len(data) < 128 or data[:4] != b'DDS ' or struct.unpack_from('<I', data, 4)[0] != 124:
+        info['problems'] = ['not a valid DDS header']
+        return info
+    flags, height, width = struct.unpack_from('<3I', data, 8)
+    mips = struct.unpack_from('<I', data, 28)[0] if flags & _DDSD_MIPMAPCOUNT else 1
+    pf_flags, fourcc, bits = struct.unpack_from('<I4sI', data, 80)
+    info.update(width=width, height=height, mips=max(mips, 1), problems=[])
+    header_size = 128
+
+    if pf_flags & _DDPF_FOURCC:
+        name = fourcc.decode('ascii', 'replace').rstrip('\0')
+        if name == 'DX10':
+            header_size += 20
+            dxgi = struct.unpack_from('<I', data, 128)[0] if len(data) >= 132 else None
+            if dxgi not in _DXGI_FORMATS:
+                info['pixel_format'] = f"DXGI {dxgi}"
+                info['problems'].append(f"unsupported DXGI format {dxgi}")
+                return info
+            name, block_size, compressed = _DXGI_FORMATS[dxgi]
+        elif name in _BLOCK_SIZES:
+            block_size, compressed = _BLOCK_SIZES[name], True
+        else:
+            info['pixel_format'] = name
+            info['problems'].append(f"unsupported compression {name!r}")
+            return info
+        info['pixel_format'] = name
+        if width % 4 or height % 4:
+            info['problems'].append(f"{name} texture is {width}x{height}, not a multiple of 4")
+    elif pf_flags & _DDPF_RGB and bits in (24, 32):
+        has_alpha = bits == 32 and pf_flags & _DDPF_ALPHAPIXELS
+        info['pixel_format'] = 'B8G8R8A8' if has_alpha else f"B8G8R8{'X8' if bits == 32 else ''}"
+        block_size, compressed = bits // 8, False
+    else:
+        info['pixel_format'] = f"flags {pf_flags:#x}, {bits} bits"
+        info['problems'].append('unsupported pixel format')
+        return info
+
+    expected = header_size + _dds_data_size(width, height, info['mips'], block_size, compressed)
+    if file_size < expected:
+        info['problems'].append(f"truncated: {file_size} bytes, header needs {expected}")
+    return info
+
+
+def read_tga_header(data: bytes, file_size: int) -> Dict:
+    info = {'format': 'tga'}
+    if len(data) < 18 or data[2] not in (2, 10):
+        info['problems'] = ['not an uncompressed or RLE true-color TGA']
+        return info
+    width, height, bits, descriptor = struct.unpack_from('<HHBB', data, 12)
+    info.update(width=width, height=height, mips=1, problems=[],
+                pixel_format='B8G8R8A8' if bits == 32 and descriptor & 0x0f else f"{bits}-bit")
+    if bits not in (24, 32):
+        info['problems'].append(f"unsupported {bits}-bit TGA")
+    elif data[2] == 2 and file_size < 18 + data[0] + width * height * bits // 8:
+        info['problems'].append('truncated')
+    return info
+
+
+def read_png_header(data: bytes, file_size: int) -> Dict:
+    info = {'format': 'png'}
+    if len(data) < 33 or data[:8] != b'\x89PNG\r\n\x1a\n' or data[12:16] != b'IHDR':
+        info['problems'] = ['not a valid PNG header']
+        return info
+    width, height, depth, color_type = struct.unpack_from('>IIBB', data, 16)
+    info.update(width=width, height=height, mips=1, problems=[],
+                pixel_format='B8G8R8A8' if color_type in (4, 6) else f"color type {color_type}")
+    return info
+
+
+_READERS = {'.dds': read_dds_header, '.tga': read_tga_header, '.png': read_png_header}
+
+
+def check_texture(path: str, relpath: str, file_size: int) -> Dict:
+    """Read one texture header and list its problems."""
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(HEADER_SIZE)
+    except OSError as e:
+        return {'format': ext[1:], 'problems': [f"unreadable: {e}"]}
+    info = _READERS[ext](data, file_size)
+
+    if relpath.lower().startswith(GOAL_ICON_DIR) and 'width' in info:
+        width, height = info['width'], info['height']
+        if not (GOAL_ICON_MIN_SIZE <= width <= GOAL_ICON_MAX_SIZE
+                and GOAL_ICON_MIN_SIZE <= height <= GOAL_ICON_MAX_SIZE):
+            info['problems'].append(f"goal icon is {width}x{height}, expected "
+                                    f"{GOAL_ICON_MIN_SIZE}-{GOAL_ICON_MAX_SIZE} pixels per side")
+        if info['mips'] > 1:
+            info['problems'].append(f"goal icon has {info['mips']} mip levels, expected none")
+        if info.get('pixel_format') not in _ALPHA_FORMATS:
+            info['problems'].append(f"goal icon has no alpha channel ({info.get('pixel_format')})")
+    return info
+
+
+def cache_path_for(mod_root: str, cache_dir: Optional[str] = None) -> str:
+    """Header cache file for a mod root under cache_dir (default: .extras/.cache)."""
+    return cache_file('texcheck', mod_root, '.json', cache_dir)
+
+
+class TextureChecker:
+    """Header checks for the textures of one mod, cached by path, size and mtime."""
+
+    def __init__(self, mod_root: str = '.', cache_path: Optional[str] = None, jobs: Optional[int] = None):
+        self.mod_root = os.path.abspath(mod_root)
+        # An empty cache_path disables the cache
+        self.cache_path = cache_path if cache_path is not None else cache_path_for(self.mod_root)
+        self.jobs = jobs
+        self.entries = {}
+        self.checked = 0
+        if self.cache_path:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return
+        if cache.get('version') == CACHE_VERSION:
+            self.entries = cache['entries']
+
+    def save(self):
+        if not self.cache_path or not self.checked:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        with AtomicWriter(self.cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'entries': self.entries}, f, separators=(',', ':'))
+
+    def relpath(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), self.mod_root).replace('\\', '/')
+
+    def discover(self, paths: Sequence[str] = DEFAULT_PATHS) -> List[str]:
+        """Return every texture file under the given (mod-relative) files or folders."""
+        found = []
+        for path in paths:
+            full_path = os.path.join(self.mod_root, path)
+            if os.path.isfile(full_path):
+                found.append(full_path)
+            for folder, _, files in os.walk(full_path):
+                found.extend(os.path.join(folder, name) for name in files
+                             if os.path.splitext(name)[1].lower() in TEXTURE_EXTENSIONS)
+        return sorted(found)
+
+    def check(self, paths: Sequence[str]) -> Dict[str, Dict]:
+        """Check texture files and map their mod-relative paths to results."""
+        results = {}
+        stale = []
+        for path in paths:
+            relpath = self.relpath(path)
+            try:
+                st = os.stat(path)
+            except OSError as e:
+                results[relpath] = {'format': '', 'problems': [f"unreadable: {e}"]}
+                continue
+            entry = self.entries.get(relpath)
+            if entry and entry['stat'] == [st.st_size, st.st_mtime_ns]:
+                results[relpath] = entry['result']
+            else:
+                stale.append((path, relpath, st))
+
+        if stale:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=self.jobs or min(32, (os.cpu_count() or 1) * 4)) as executor:
+                fresh = executor.map(lambda item: check_texture(item[0], item[1], item[2].st_size), stale)
+                for (path, relpath, st), result in zip(stale, fresh):
+                    results[relpath] = result
+                    self.entries[relpath] = {'stat': [st.st_size, st.st_mtime_ns], 'result': result}
+            self.checked += len(stale)
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='texcheck',
+        description='Check texture headers under gfx/interface against the goal-icon conventions.'
+    )
+    parser.add_argument('paths', nargs='*', default=list(DEFAULT_PATHS), metavar='path',
+                        help='Mod-relative files or folders to check (default: %(default)s)')
+    parser.add_argument('-m', '--mod-root', default='.', help='Mod root folder (default: %(default)s)')
+    parser.add_argument('-j', '--jobs', type=int, metavar='N', help='Reader threads')
+    parser.add_argument('--no-cache', action='store_true', help='Re-read every header')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Also list valid textures')
+    args = parser.parse_args()
+
+    checker = TextureChecker(args.mod_root, '' if args.no_cache else None, args.jobs)
+    results = checker.check(checker.discover(args.paths))
+    checker.save()
+
+    invalid = 0
+    for relpath, result in sorted(results.items()):
+        if result['problems']:
+            invalid += 1
+            print(f"{relpath}: {'; '.join(result['problems'])}")
+        elif args.verbose:
+            print(f"{relpath}: {result.get('width')}x{result.get('height')} {result.get('pixel_format')}")
+    print(f"{len(results)} textures checked ({checker.checked} read), {invalid} with problems", file=sys.stderr)
+    sys.exit(1 if invalid else 0)
+
+
+if __name__ == "__main__":
+    main()
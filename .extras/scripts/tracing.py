@@ -0,0 +1,114 @@
+"""Span tracing for the .extras scripts, exportable as Chrome trace JSON.
+
+A Tracer collects complete ("X") and instant ("i") events in the format read
+by chrome://tracing, Perfetto and speedscope.  Tracing is off unless a Tracer
+is activated; span() then returns a shared no-op context manager, so
+instrumented code costs almost nothing in normal runs.
+
+Worker processes trace into their own Tracer and hand its events back with
+their results; merging them into the parent's Tracer keeps each process on
+its own track (events carry the process id).
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+_active: Optional['Tracer'] = None
+
+
+def _now_us() -> float:
+    return time.perf_counter_ns() / 1000
+
+
+class Tracer:
+    """Collects trace events of one process."""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.events: List[Dict] = []
+
+    def complete(self, name: str, start_us: float, end_us: float, cat: str = '', args: Optional[Dict] = None):
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': start_us, 'dur': end_us - start_us,
+                 'pid': self.pid, 'tid': threading.get_ident()}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def instant(self, name: str, cat: str = '', args: Optional[Dict] = None):
+        event = {'name': name, 'cat': cat, 'ph': 'i', 's': 't', 'ts': _now_us(),
+                 'pid': self.pid, 'tid': threading.get_ident()}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def merge(self, events: List[Dict]):
+        """Add events recorded by another process."""
+        self.events.extend(events)
+
+    def export(self, path: str, process_name: str = ''):
+        """Write the events as a Chrome trace JSON file."""
+        events = list(self.events)
+        if process_name:
+            for pid in sorted({event['pid'] for event in events} | {self.pid}):
+                name = process_name if pid == self.pid else f"{process_name} worker"
+                events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': name}})
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'cat', 'args', 'start')
+
+    def __init__(self, tracer: Tracer, name: str, cat: str, args: Optional[Dict]):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.complete(self.name, self.start, _now_us(), self.cat, self.args)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def activate(tracer: Optional[Tracer]) -> Optional[Tracer]:
+    """Make tracer the target of span() and instant(); returns the previous one."""
+    global _active
+    previous, _active = _active, tracer
+    return previous
+
+
+def active() -> Optional[Tracer]:
+    return _active
+
+
+def span(name: str, cat: str = '', **args):
+    """Context manager recording a span; a no-op while tracing is off."""
+    if _active is None:
+        return _NULL_SPAN
+    return _Span(_active, name, cat, args or None)
+
+
+def instant(name: str, cat: str = '', **args):
+    """Record an instant event; a no-op while tracing is off."""
+    if _active is not None:
+        _active.instant(name, cat, args or None)